@@ -3,22 +3,27 @@
 import argparse
 import bisect
 import collections
-import copy
 import json
 import os
 import pickle
 import time
-from multiprocessing import Pool
-from functools import partial
 
 import numpy as np
 from tqdm import tqdm
 from os.path import join
 
+import executors
+import instrumentation
+import optimizers
+import telemetry
 import utils as utils
 from utils import Triplet
+from workspace import Workspace
 
 DIVIDER = "区"
+CHECKPOINT_FILE = "checkpoint.pickle"
+MAPPED_MODEL_FILE = "svm_mapped.pickle"
+MAPPED_WEIGHT_FILE = "weight.npy"
 
 
 class FeatureFucntion:
@@ -28,6 +33,7 @@ class FeatureFucntion:
         function_keys : list :
             function_keys is list of feature.
             feature like: "id区((||区i"
+            hashing.HashedFeatureKeys can be used to bound memory.
 
         weight : np.ndarray :
             weight is weight to be learned.
@@ -38,10 +44,16 @@ class FeatureFucntion:
 
         candidates : LB :
             candidates of variable name.
+
+        label_seq_dict : dictionary :
+            "name区seq" -> list of (index, label), sorted with weight.
+            object which has sort_by_weight (e.g. hashing.HashedLabelSeqIndex,
+            compact.CompactLabelSeqDict) can be used instead.
     """
 
     NUM_PATH = 20  # the number of iterations of inference
     TOP_CANDIDATES = 16  # the number of candidates to regard
+    BEAM_WIDTH = 8  # the number of partial labellings in beam_inference
 
     def __init__(self, function_keys, candidates, label_seq_dict):
         self.function_keys = function_keys
@@ -61,6 +73,10 @@ class FeatureFucntion:
 
     def _update_label_seq_dict(self):
         # sort __label_seq_dict with weight value
+        if hasattr(self.label_seq_dict, "sort_by_weight"):
+            # index other than dict sorts itself
+            self.label_seq_dict.sort_by_weight(self.weight)
+            return
         for key, value in self.label_seq_dict.items():
             # each value is (index, label)
             value.sort(key=lambda x: self.weight[x[0]], reverse=True)
@@ -80,6 +96,30 @@ class FeatureFucntion:
             self.weight[index] = value
             self._update_label_seq_dict()
 
+    def extend(self, input_path, BETA=0.5, init_weight_proportion=0.5):
+        """extend model with new programs without parsing whole corpus.
+
+        New features get fresh IDs, and weight is extended with the
+        initial value used by subgrad. label_seq_dict and candidates are
+        updated incrementally.
+
+        Args:
+            input_path (str or list) : new JSON files.
+            BETA, init_weight_proportion : same as subgrad.
+
+        Returns:
+            programs (utils.program_gen) : new programs.
+        """
+        if not isinstance(self.function_keys, dict) or not isinstance(self.label_seq_dict, dict):
+            raise TypeError("extend supports only function_keys and label_seq_dict built by parse_JSON")
+
+        programs, num_new = utils.extend_JSON(
+            self.function_keys, self.candidates, self.label_seq_dict, input_path
+        )
+        init_weight = np.ones(num_new) * (BETA * init_weight_proportion)
+        self.weight = np.concatenate([self.weight, init_weight])
+        return programs
+
     def _build_edges(self, program, variable):
         """Build edges from program, variable
 
@@ -131,79 +171,45 @@ class FeatureFucntion:
                     )
         return edges, connected_edges
 
-    def _score_candidate(self, x, y, i, edges, candidate, best_score, loss):
-        pre_label = y[i]
-        pre_name = utils.get_varname(pre_label)
-        var_scope_id = int(utils.get_scopeid(pre_label))
-        # relabel edges with new label
-        utils.relabel_edges(
-            edges, pre_name, var_scope_id, candidate)
+    def score_workspace_edges(self, ws, edges):
+        """score_edge for edges of Workspace, with its current labels.
+        """
+        res = 0
+        for e in edges:
+            val = ws.edge_weight(e, self.eval)
+            if val is not None:
+                res += val
+        return res
 
+    def _score_candidate(self, ws, i, edges, candidate, best_score, loss):
+        pre_name = ws.names[i]
         # temporaly relabel infered labels
-        y[i] = str(var_scope_id) + DIVIDER + candidate
-        x["y_names"][i] = y[i]
-        assert not utils.duplicate_any(x["y_names"]), f'{x["y_names"]}:{y}'
+        ws.set_name(i, candidate)
+        assert not utils.duplicate_any(ws.y), f"{ws.y}"
 
         # score = score_edge + loss
-        new_score_v = self.score_edge(
-            edges) + loss(x["y_names"], y)
+        # (program's y_names is the infered labels themselves while inferring)
+        new_score_v = self.score_workspace_edges(ws, edges) + loss(ws.y, ws.y)
 
         if new_score_v < best_score:  # when score is not improved
-            y[i] = pre_label
-            x["y_names"][i] = pre_label
-            utils.relabel_edges(edges, candidate, var_scope_id, pre_name)
-            assert not utils.duplicate_any(x["y_names"]), f'{x["y_names"]}:{y}'
+            ws.set_name(i, pre_name)
             return None
         else:  # when score is improved, update best score
             return new_score_v
 
-    def _score_dup_candidate(self, x, y, i, edges, candidate, best_score, loss, dup):
-        DUMMY_VAR_NAME = "ダミー"
-        pre_label = y[i]
-        var_scope_id = int(utils.get_scopeid(pre_label))
-
-        # target's pre_name
-        pre_name = utils.get_varname(pre_label)
-        candidate_name = str(var_scope_id) + DIVIDER + candidate
-
-        # build duplicate element's edges
-        # duplicate element is replaced element in advance
-        dup_edges, dup_connected_edges = self._build_edges(x, candidate_name)
-
-        # if recursively search, this is needed.
-        # dup_candidates = self._build_candidates(dup_connected_edges)
-
-        for n0, n1 in ((candidate, DUMMY_VAR_NAME), (pre_name, candidate), (DUMMY_VAR_NAME, pre_name)):
-            for target in (edges, dup_edges):
-                utils.relabel_edges(
-                        target, n0, var_scope_id, n1
-                        )
-        # print(f"edges -> {edges[:3]}")
-        # print(f"dup_edges -> {dup_edges[:3]}")
-
-        # temporaly relabel infered labels
-        y[i] = candidate_name
-        x["y_names"][i] = y[i]
-        y[dup] = pre_label
-        x["y_names"][dup] = y[dup]
-        assert not utils.duplicate_any(x["y_names"]), f'{x["y_names"]}:{y}'
+    def _score_dup_candidate(self, ws, i, edges, candidate, best_score, loss, dup):
+        # swap labels of i and dup, which has candidate in same scope
+        pre_name = ws.names[i]
+        ws.set_name(i, candidate)
+        ws.set_name(dup, pre_name)
+        assert not utils.duplicate_any(ws.y), f"{ws.y}"
 
         # score = score_edge + loss
-        new_score_v = self.score_edge(
-            edges) + loss(x["y_names"], y)
+        new_score_v = self.score_workspace_edges(ws, edges) + loss(ws.y, ws.y)
 
         if new_score_v < best_score:  # when score is not improved
-            y[i] = pre_label
-            x["y_names"][i] = y[i]
-            y[dup] = candidate_name
-            x["y_names"][dup] = y[dup]
-            assert not utils.duplicate_any(x["y_names"]), f'{x["y_names"]}:{y}'
-
-            for n0, n1 in ((pre_name, DUMMY_VAR_NAME), (candidate, pre_name), (DUMMY_VAR_NAME, candidate)):
-                for target in (edges, dup_edges):
-                    utils.relabel_edges(
-                            target, n0, var_scope_id, n1
-                            )
+            ws.set_name(i, pre_name)
+            ws.set_name(dup, candidate)
             return None
         else:
             return new_score_v
@@ -211,58 +217,257 @@ class FeatureFucntion:
     def _build_candidates(self, connected_edges, TOP_CANDIDATES=TOP_CANDIDATES):
         candidates = set()
         for edge in connected_edges:
-            if edge in self.label_seq_dict.keys():
+            if edge in self.label_seq_dict:
                 for v in self.label_seq_dict[edge][:TOP_CANDIDATES]:
                     candidates.add(v[1])
         return candidates
 
-    def inference(self, x, loss=utils.dummy_loss, NUM_PATH=NUM_PATH, TOP_CANDIDATES=TOP_CANDIDATES):
+    @staticmethod
+    def _variable_edges(x):
+        """edges of each variable, found by index instead of name.
+
+        Args:
+            x (dict) : program.
+
+        Returns:
+            scope_ids (list) : scope id (str) of each variable.
+            neighbors (list) : for each variable, list of
+                (neighbor index or None, literal or None, sequence, is_x).
+                is_x is True when the variable is xName of the edge.
+        """
+        y_names = x["y_names"]
+        scope_ids = [utils.get_scopeid(v) for v in y_names]
+        index_of = {v: i for i, v in enumerate(y_names)}
+
+        neighbors = [[] for _ in y_names]
+        for key, edge in x.items():
+            if key == "y_names":
+                continue
+            xi = index_of.get(str(edge["xScopeId"]) + DIVIDER + edge["xName"])
+            if edge["type"] == "var-var":
+                yi = index_of.get(str(edge["yScopeId"]) + DIVIDER + edge["yName"])
+                if xi is not None:
+                    neighbors[xi].append((yi, None, edge["sequence"], True))
+                if yi is not None and yi != xi:
+                    neighbors[yi].append((xi, None, edge["sequence"], False))
+            elif xi is not None:
+                neighbors[xi].append((None, edge["yName"], edge["sequence"], True))
+        return scope_ids, neighbors
+
+    def initial_labels(self, x, seed=None, TOP_CANDIDATES=TOP_CANDIDATES):
+        """cheap initial labelling from contexts in label_seq_dict.
+
+        Each variable gets top label of its strongest context, i.e. label
+        whose feature has the largest weight, unless the label is already
+        used in the same scope. Contexts with literals are used first, then
+        contexts with variables labelled before. Others get placeholders.
+
+        Args:
+            x (dict) : program.
+            seed (list) : initial labels like "1区name" given from outside
+                (e.g. context2name). None in it means no prediction.
+
+        Returns:
+            list : labels aligned with x["y_names"].
+        """
+        y_names = x["y_names"]
+        scope_ids, neighbors = self._variable_edges(x)
+
+        y = [None] * len(y_names)
+        used = set()
+        if seed is not None:
+            for i, label in enumerate(seed):
+                if label is not None and label not in used:
+                    y[i] = label
+                    used.add(label)
+
+        while True:
+            proposals = []
+            for i, var_neighbors in enumerate(neighbors):
+                if y[i] is not None:
+                    continue
+                best = None
+                for j, literal, seq, _ in var_neighbors:
+                    if j is None:
+                        name = literal
+                    elif y[j] is not None:
+                        name = utils.get_varname(y[j])
+                    else:
+                        continue
+                    context = name + DIVIDER + seq
+                    if context not in self.label_seq_dict:
+                        continue
+                    # list is sorted with weight, so first free label is best
+                    for index, label in self.label_seq_dict[context][:TOP_CANDIDATES]:
+                        if scope_ids[i] + DIVIDER + label in used:
+                            continue
+                        if best is None or self.weight[index] > best[0]:
+                            best = (self.weight[index], label)
+                        break
+                if best is not None:
+                    proposals.append((best[0], i, best[1]))
+
+            assigned = False
+            for _, i, label in sorted(proposals, key=lambda p: p[0], reverse=True):
+                candidate_name = scope_ids[i] + DIVIDER + label
+                if candidate_name in used:
+                    continue
+                y[i] = candidate_name
+                used.add(candidate_name)
+                assigned = True
+            if not assigned:
+                break
+
+        gen = utils.token_generator()
+        for i in range(len(y)):
+            while y[i] is None:
+                candidate_name = scope_ids[i] + DIVIDER + next(gen)
+                if candidate_name not in used:
+                    y[i] = candidate_name
+                    used.add(candidate_name)
+        return y
+
+    def inference(self, x, loss=utils.dummy_loss, NUM_PATH=NUM_PATH, TOP_CANDIDATES=TOP_CANDIDATES, init_y=None):
         """inference program properties.
-        x : program
+        x : program. not modified, so it can be shared between threads.
         loss : loss function
+        init_y : initial labels.
+            None: placeholders from utils.token_generator.
+            "context": initial_labels from contexts.
+            list: given labels like "1区name" (e.g. context2name predictions).
         """
         # initialize y:answer
-        y = []
-        pre_y = copy.deepcopy(x["y_names"])
-        gen = utils.token_generator()
-
-        y = [f"{utils.get_scopeid(st)}{DIVIDER}{next(gen)}" for st in x["y_names"]]
-        utils.relabel(y, x)
+        if init_y is None:
+            gen = utils.token_generator()
+            y = [f"{utils.get_scopeid(st)}{DIVIDER}{next(gen)}" for st in x["y_names"]]
+        elif isinstance(init_y, str):
+            if init_y != "context":
+                raise ValueError("init_y should be None, \"context\" or list")
+            y = self.initial_labels(x, TOP_CANDIDATES=TOP_CANDIDATES)
+        else:
+            y = self.initial_labels(x, seed=init_y, TOP_CANDIDATES=TOP_CANDIDATES)
+        # labels are changed in workspace, x is not modified
+        ws = Workspace(x, y)
+        y = ws.y
+        instrumentation.count("inference.calls")
 
-        length_y_names = len(x["y_names"])
+        length_y_names = len(y)
         for iter_n in range(NUM_PATH):
+            instrumentation.count("inference.passes")
+            pre_pass_y = list(y)
             # each node with unknown property in the G^x
             for i in range(length_y_names):
-                variable = y[i]
+                var_scope_id = ws.scope_ids[i]
 
-                edges, connected_edges = self._build_edges(x, variable)
+                with instrumentation.timer("inference.build_edges"):
+                    edges = ws.incident[i]
+                    connected_edges = ws.connected(i)
+                instrumentation.count("inference.edges_built", len(edges))
 
                 # score = score_edge + loss function(if not provided, loss=0)
-                score_v = self.score_edge(edges) + loss(x["y_names"], y)
+                score_v = self.score_workspace_edges(ws, edges) + loss(y, y)
 
-                candidates = self._build_candidates(connected_edges)
+                with instrumentation.timer("inference.build_candidates"):
+                    candidates = self._build_candidates(connected_edges, TOP_CANDIDATES)
+                instrumentation.count("inference.candidates_generated", len(candidates))
 
                 if not candidates:
                     continue
 
-                for candidate in candidates:
-                    var_scope_id = int(utils.get_scopeid(variable))
-                    candidate_name = str(var_scope_id) + DIVIDER + candidate
-
-                    # check duplicate
-                    dup = utils.duplicate_check(y, candidate_name, i)
-                    assert dup is None or isinstance(dup, int), f"dup should be int or None dup is:{type(dup)}"
-                    if dup is not None:
-                        new_score_v = self._score_dup_candidate(x, y, i, edges, candidate, score_v, loss, dup)
-                    else:
-                        new_score_v = self._score_candidate(x, y, i, edges, candidate, score_v, loss)
+                with instrumentation.timer("inference.score_candidates"):
+                    for candidate in candidates:
+                        candidate_name = str(var_scope_id) + DIVIDER + candidate
+
+                        # check duplicate
+                        dup = utils.duplicate_check(y, candidate_name, i)
+                        assert dup is None or isinstance(dup, int), f"dup should be int or None dup is:{type(dup)}"
+                        if dup is not None:
+                            instrumentation.count("inference.dup_swaps")
+                            new_score_v = self._score_dup_candidate(ws, i, edges, candidate, score_v, loss, dup)
+                        else:
+                            new_score_v = self._score_candidate(ws, i, edges, candidate, score_v, loss)
+                        instrumentation.count("inference.candidates_evaluated")
 
-                    if new_score_v:
-                        score_v = new_score_v
+                        if new_score_v:
+                            instrumentation.count("inference.accepts")
+                            score_v = new_score_v
+
+            # nothing changed in this pass, so next passes change nothing
+            if y == pre_pass_y:
+                break
 
-        utils.relabel(pre_y, x)
         return y
 
+    def beam_inference(self, x, loss=utils.dummy_loss, BEAM_WIDTH=BEAM_WIDTH, TOP_CANDIDATES=TOP_CANDIDATES):
+        """inference program properties by beam search.
+
+        Variables are labelled one by one in order of degree, keeping top
+        BEAM_WIDTH partial labellings. Candidates of a variable come from
+        contexts with literals and with labelled neighbors, and score of a
+        partial labelling is the sum of weight of edges whose both ends are
+        labelled. x is not modified.
+
+        Args:
+            x (dict) : program.
+            loss : loss function, added to score of complete labellings.
+            BEAM_WIDTH (int) : the number of partial labellings to keep.
+
+        Returns:
+            list : labels aligned with x["y_names"].
+        """
+        scope_ids, neighbors = self._variable_edges(x)
+        order = sorted(range(len(scope_ids)), key=lambda i: len(neighbors[i]), reverse=True)
+
+        def name_of(y, j, literal, label):
+            if j is None:
+                return literal
+            return label if y[j] is None else utils.get_varname(y[j])
+
+        instrumentation.count("beam_inference.calls")
+        # (score, labels, used labels)
+        beam = [(0, [None] * len(scope_ids), frozenset())]
+        for i in order:
+            new_beam = []
+            for score_v, y, used in beam:
+                contexts = []
+                for j, literal, seq, _ in neighbors[i]:
+                    if j is None or (y[j] is not None and j != i):
+                        contexts.append(name_of(y, j, literal, None) + DIVIDER + seq)
+                candidates = [
+                    c for c in sorted(self._build_candidates(contexts, TOP_CANDIDATES))
+                    if scope_ids[i] + DIVIDER + c not in used
+                ]
+                if not candidates:
+                    # placeholder as inference does
+                    gen = utils.token_generator()
+                    candidate = next(gen)
+                    while scope_ids[i] + DIVIDER + candidate in used:
+                        candidate = next(gen)
+                    candidates = [candidate]
+                instrumentation.count("beam_inference.candidates_evaluated", len(candidates))
+
+                for candidate in candidates:
+                    delta = 0
+                    for j, literal, seq, is_x in neighbors[i]:
+                        if j is not None and j != i and y[j] is None:
+                            continue
+                        other = name_of(y, j, literal, candidate)
+                        if is_x:
+                            key_name = Triplet(candidate, seq, other)
+                        else:
+                            key_name = Triplet(other, seq, candidate)
+                        val = self.eval(key_name)
+                        if val is not None:
+                            delta += val
+                    new_y = list(y)
+                    new_y[i] = scope_ids[i] + DIVIDER + candidate
+                    new_beam.append((score_v + delta, new_y, used | {new_y[i]}))
+
+            new_beam.sort(key=lambda b: b[0], reverse=True)
+            beam = new_beam[:BEAM_WIDTH]
+
+        return max(beam, key=lambda b: b[0] + loss(b[1], x["y_names"]))[1]
+
     def inference_only_correct_number(self, program, **kwrags):
         y = self.inference(program, **kwrags)
         val = 0
@@ -277,21 +482,13 @@ class FeatureFucntion:
         ), "two length should be equal, but len(y):{0}, len(x):{1}".format(
             len(y), len(x["y_names"])
         )
-        pre_y = copy.deepcopy(x["y_names"])
-        utils.relabel(y, x)
+        ws = Workspace(x, y)
         if without_weight:
             res = np.zeros(len(self.function_keys))
         else:
             res = 0
-        for key in x:
-            if key == "y_names":
-                continue
-            obj = x[key]
-            x_name = obj["xName"]
-            y_name = obj["yName"]
-            seq = obj["sequence"]
-            key_name = Triplet(x_name, seq, y_name)
-            val = self.eval(key_name, without_weight=without_weight)
+        for e in range(len(ws.edges)):
+            val = self.eval(ws.key(e), without_weight=without_weight)
 
             if val is None:
                 continue
@@ -300,7 +497,6 @@ class FeatureFucntion:
                 res[val] += 1
             else:
                 res += val
-        utils.relabel(pre_y, x)
         return res
 
     def score_edge(self, edges):
@@ -312,55 +508,240 @@ class FeatureFucntion:
             key_name = Triplet(x_name, seq, y_name)
             val = self.eval(key_name)
             if val is not None:
-                res += self.eval(key_name)
+                res += val
         return res
 
     def subgrad_mmsc(self, program, loss, only_loss=False):
         # this default g value may be wrong
         y_i = program["y_names"]
-        y_star = self.inference(program, loss)
-        sum_loss = (
-            self.score(y_star, program) + loss(y_star, y_i) -
-            self.score(y_i, program)
-        )
+        with instrumentation.timer("subgrad_mmsc.inference"):
+            y_star = self.inference(program, loss)
+        with instrumentation.timer("subgrad_mmsc.score"):
+            sum_loss = (
+                self.score(y_star, program) + loss(y_star, y_i) -
+                self.score(y_i, program)
+            )
         if only_loss:
             return sum_loss
 
-        g = (self.score(y_star, program, without_weight=True) - self.score(y_i, program, without_weight=True))
+        with instrumentation.timer("subgrad_mmsc.feature_count"):
+            g = (self.score(y_star, program, without_weight=True) - self.score(y_i, program, without_weight=True))
         label_loss = loss(y_star, y_i)
         return g, sum_loss, label_loss, len(y_i)
 
-    def subgrad(self, programs, stepsize_sequence, loss_function, *, using_norm=False, iterations=30, save_dir=None, LAMBDA=0.5, BETA=0.5, init_weight_proportion=0.5, verbose=True):
+    def weighted_subgrad_mmsc(self, item, loss, only_loss=False):
+        """subgrad_mmsc for (program, multiplicity) of deduplicated corpus.
+        """
+        program, weight = item
+        res = self.subgrad_mmsc(program, loss, only_loss=only_loss)
+        if only_loss:
+            return weight * res
+        return tuple(weight * v for v in res)
+
+    def gold_feature_matrix(self, programs):
+        """feature counts of correct labels of every program.
+
+        Correct labels never change during training, so subgrad counts
+        them once here instead of every iteration.
+
+        Args:
+            programs (utils.program_gen or list) : programs.
+
+        Returns:
+            scipy.sparse.csr_matrix : (the number of programs, the number of features).
+                row i is score(y_names, x, without_weight=True) of i-th program.
+        """
+        # scipy is slow to import, and only training needs it
+        from scipy import sparse
+
+        rows = []
+        cols = []
+        num_programs = 0
+        for i, program in enumerate(programs):
+            num_programs += 1
+            for key, obj in program.items():
+                if key == "y_names":
+                    continue
+                index = self.eval(Triplet(obj["xName"], obj["sequence"], obj["yName"]), without_weight=True)
+                if index is not None:
+                    rows.append(i)
+                    cols.append(index)
+        # duplicated (row, col) are summed
+        return sparse.csr_matrix(
+            (np.ones(len(rows)), (rows, cols)), shape=(num_programs, len(self.function_keys))
+        )
+
+    def weighted_star_mmsc(self, item, loss, only_loss=False):
+        """y* side of weighted_subgrad_mmsc.
+
+        Feature counts of correct labels come from gold_feature_matrix, so
+        only inference and feature counts of y* are computed here.
+
+        Returns:
+            (phi(y*), score(y*) + loss(y*, y), loss(y*, y), len(y)) multiplied
+            with multiplicity, or only second one if only_loss.
+        """
+        program, weight = item
+        y_i = program["y_names"]
+        with instrumentation.timer("subgrad_mmsc.inference"):
+            y_star = self.inference(program, loss)
+        label_loss = loss(y_star, y_i)
+        if only_loss:
+            with instrumentation.timer("subgrad_mmsc.score"):
+                return weight * (self.score(y_star, program) + label_loss)
+
+        with instrumentation.timer("subgrad_mmsc.feature_count"):
+            phi = self.score(y_star, program, without_weight=True)
+        # score is inner product of feature counts and weight
+        score_star = phi @ self.weight
+        return weight * phi, weight * (score_star + label_loss), weight * label_loss, weight * len(y_i)
+
+    def weighted_star_mmsc_batch(self, task, loss):
+        """weighted_star_mmsc summed over chunk of mini-batch.
+
+        Args:
+            task (tuple) : (list of (program, multiplicity), weight of batch).
+                weight is set bypassing setter, so label_seq_dict keeps
+                its order.
+
+        Returns:
+            sums of returns of weighted_star_mmsc.
+        """
+        chunk, weight = task
+        self.__weight = weight
+        res = [self.weighted_star_mmsc(item, loss) for item in chunk]
+        return tuple(sum(x) for x in zip(*res))
+
+    def subgrad(self, programs, stepsize_sequence, loss_function, *, using_norm=False, iterations=30, save_dir=None, LAMBDA=0.5, BETA=0.5, init_weight_proportion=0.5, verbose=True, warm_start=False, optimizer=None, checkpoint_dir=None, checkpoint_interval=1, resume=False, processes=None, backend="process", telemetry_path=None, coordinator=None):
+        """subgradient method over whole corpus.
+
+        Args:
+            programs (utils.program_gen or list) : programs to train.
+            stepsize_sequence (generator) : learning rate, advanced when
+                the number of wrong labels increases. Not used if optimizer is given.
+            loss_function : loss for two label sequences.
+            optimizer (optimizers.StepSequence) : optimizer for projected update.
+                if None, optimizers.StepSequence(stepsize_sequence) is used.
+            checkpoint_dir (str) : directory to save checkpoint in.
+            checkpoint_interval (int) : save checkpoint every this iterations.
+            resume (bool) : if True and checkpoint exists in checkpoint_dir,
+                continue from it. stepsize_sequence (or optimizer) must be
+                fresh one, same as the interrupted run. label_seq_dict is
+                saved in checkpoint, since order of candidates with tied
+                weight depends on earlier sorts, so resumed run gives the
+                same weight as uninterrupted one.
+            processes (int) : the number of workers. if None, os.cpu_count().
+            backend (str) : executor of workers, "process", "thread" or "serial".
+                see executors.get_executor.
+            telemetry_path (str) : if given, one JSON line per iteration is
+                appended with time of each phase (pool startup, inference,
+                reduction, projection, label_seq re-sort), peak RSS, loss
+                and learning rate. IPC bytes estimated from a sample of
+                tasks and results are added only for "process" backend.
+            coordinator (distributed.Coordinator) : if given, gradient is
+                computed by its workers instead of local Pool.
+
+        Returns:
+            np.ndarray : weight with minimum loss.
+        """
         def calc_l2_norm(weight):
             return np.linalg.norm(weight, ord=2) / 2 * LAMBDA
 
         # initialize
-        weight_zero = np.ones(len(self.function_keys)) * (BETA * init_weight_proportion)
+        if warm_start:
+            # continue from current weight, e.g. after extend
+            weight_zero = self.weight.copy()
+        else:
+            weight_zero = np.ones(len(self.function_keys)) * (BETA * init_weight_proportion)
         self.weight = weight_zero
         weight_t = weight_zero
-        learning_rate = next(stepsize_sequence)
+        if optimizer is None:
+            optimizer = optimizers.StepSequence(stepsize_sequence)
+        optimizer.reset(weight_zero, 0, BETA)
         pre_sum_wrong_label = None
 
         # best loss, weight
         best_loss = float('inf')
         best_weight = weight_zero
-
-        for i in tqdm(range(iterations)):
+        start = 0
+
+        if resume and checkpoint_dir and os.path.exists(join(checkpoint_dir, CHECKPOINT_FILE)):
+            checkpoint = self.load_checkpoint(checkpoint_dir)
+            start = checkpoint["iteration"]
+            weight_t = checkpoint["weight"]
+            if checkpoint.get("label_seq_dict") is not None:
+                # keep order of ties left by stable sorts before.
+                # sorting it again with same weight does not change it
+                self.label_seq_dict = checkpoint["label_seq_dict"]
+            self.weight = weight_t
+            best_weight = checkpoint["best_weight"]
+            best_loss = checkpoint["best_loss"]
+            pre_sum_wrong_label = checkpoint["pre_sum_wrong_label"]
+            optimizer.load_state_dict(checkpoint["optimizer"])
+            print(f"resume from iteration {start}")
+
+        # deduplicated corpus carries multiplicity of each program
+        program_weights = getattr(programs, "weights", None)
+        if program_weights is None:
+            program_weights = [1] * len(programs)
+        num_programs = sum(program_weights)
+
+        # correct side of subgradient is fixed, so sum it once:
+        # score(y_i) summed over corpus is gold_counts @ weight
+        gold_counts = self.gold_feature_matrix(programs).T @ np.asarray(program_weights, dtype=float)
+
+        recorder = telemetry.Telemetry(telemetry_path) if telemetry_path else None
+        # estimated bytes sent to Pool workers in an iteration, for telemetry
+        ipc_sent = None
+
+        for i in tqdm(range(start, iterations)):
             # get newest weight
             sum_loss = 0
-
-            # calculate grad
-            subgrad_with_loss = partial(self.subgrad_mmsc, loss=loss_function)
-
-            with Pool() as pool:
-                res = list(tqdm(pool.imap_unordered(subgrad_with_loss, programs), total=len(programs)))
+            learning_rate = optimizer.learning_rate
+            times = {}
+            iteration_start = time.perf_counter()
+
+            # calculate y* side of grad
+            # model is sent to each worker once, not with every task
+            subgrad_with_loss = executors.ModelMethod(self, "weighted_star_mmsc", loss=loss_function)
+            tasks = zip(programs, program_weights)
+
+            ipc = {}
+            if recorder is not None and coordinator is None and backend == "process":
+                # sizes of model and programs do not change, so estimate once
+                if ipc_sent is None:
+                    ipc_sent = telemetry.pickled_size(self) * (processes or os.cpu_count())
+                    ipc_sent += telemetry.pickled_size(subgrad_with_loss) * len(programs)
+                    ipc_sent += telemetry.sampled_size(zip(programs, program_weights), len(programs))
+                ipc["ipc_bytes_sent"] = ipc_sent
+
+            t0 = time.perf_counter()
+            if coordinator is not None:
+                t1 = t0
+                res = [coordinator.compute(weight_t, loss_function, method="weighted_star_mmsc")]
+                t2 = time.perf_counter()
+            else:
+                with executors.get_executor(backend, processes, model=self) as pool:
+                    t1 = time.perf_counter()
+                    res = list(tqdm(
+                        instrumentation.absorb(pool.imap_unordered(instrumentation.collected(subgrad_with_loss), tasks)),
+                        total=len(programs),
+                    ))
+                    t2 = time.perf_counter()
+            t3 = time.perf_counter()
+            times["pool_startup"] = t1 - t0
+            times["inference"] = t2 - t1
+            times["pool_shutdown"] = t3 - t2
 
             grad, sum_loss, sum_wrong_label, sum_label = (sum(x) for x in zip(*res))
+            grad = grad - gold_counts
+            sum_loss -= gold_counts @ weight_t
             print(f"sum_wrong_label -> {sum_wrong_label}")
             print(f"correct percentage -> {1.0 * (sum_label - sum_wrong_label) / sum_label}")
 
-            grad /= len(programs)
-            sum_loss /= len(programs)
+            grad /= num_programs
+            sum_loss /= num_programs
+            times["reduction"] = time.perf_counter() - t3
 
             if using_norm:
                 sum_loss += calc_l2_norm(weight_t)
@@ -369,31 +750,72 @@ class FeatureFucntion:
                 best_loss = sum_loss
                 best_weight = weight_t
 
-            new_weight = utils.projection(
-                weight_t - learning_rate * grad, 0, BETA
-            )
+            t4 = time.perf_counter()
+            new_weight = optimizer.step(weight_t, grad)
+            times["projection"] = time.perf_counter() - t4
 
             if pre_sum_wrong_label and pre_sum_wrong_label < sum_wrong_label:
                 print("not improvement! iteration={}".format(i))
-                learning_rate = next(stepsize_sequence)
+                optimizer.advance()
             pre_sum_wrong_label = sum_wrong_label
 
+            # setting weight re-sorts label_seq_dict
+            t5 = time.perf_counter()
             self.weight = new_weight
+            times["resort"] = time.perf_counter() - t5
             weight_t = new_weight
 
             if verbose:
                 print(best_weight[:100])
 
+            if checkpoint_dir and (i + 1) % checkpoint_interval == 0:
+                self._save_checkpoint(checkpoint_dir, {
+                    "iteration": i + 1,
+                    "weight": weight_t,
+                    "best_weight": best_weight,
+                    "best_loss": best_loss,
+                    "pre_sum_wrong_label": pre_sum_wrong_label,
+                    "optimizer": optimizer.state_dict(),
+                    # order of tied weights depends on sorts before
+                    "label_seq_dict": self.label_seq_dict,
+                })
+
+            if recorder is not None:
+                if ipc:
+                    ipc["ipc_bytes_received"] = telemetry.sampled_size(res, len(res))
+                recorder.record(
+                    iteration=i,
+                    time=times,
+                    iteration_time=time.perf_counter() - iteration_start,
+                    **ipc,
+                    loss=float(sum_loss),
+                    best_loss=float(best_loss),
+                    sum_wrong_label=float(sum_wrong_label),
+                    sum_label=float(sum_label),
+                    learning_rate=float(learning_rate),
+                    num_programs=len(programs),
+                    processes=processes or os.cpu_count(),
+                )
+
         sum_loss = 0
-        # calculate loss for last weight
-        subgrad_with_only_loss = partial(self.subgrad_mmsc, loss=loss_function, only_loss=True)
-        with Pool() as pool:
-            res = pool.map(subgrad_with_only_loss, programs)
+        # calculate loss for last weight (average of iterates if averaging)
+        weight_t = optimizer.result(weight_t)
+        self.weight = weight_t
+        subgrad_with_only_loss = executors.ModelMethod(self, "weighted_star_mmsc", loss=loss_function, only_loss=True)
+        tasks = zip(programs, program_weights)
+        if coordinator is not None:
+            res = [coordinator.compute(weight_t, loss_function, only_loss=True, method="weighted_star_mmsc")]
+        else:
+            with executors.get_executor(backend, processes, model=self) as pool:
+                res = list(instrumentation.absorb(pool.map(instrumentation.collected(subgrad_with_only_loss), tasks)))
 
-        sum_loss = sum(res)
-        sum_loss /= len(programs)
+        sum_loss = sum(res) - gold_counts @ weight_t
+        sum_loss /= num_programs
         if using_norm:
             sum_loss += calc_l2_norm(self.weight)
+        if recorder is not None:
+            recorder.record(iteration="final", loss=float(sum_loss), best_loss=float(best_loss))
+            recorder.close()
 
         # return weight for min loss
         if sum_loss < best_loss:
@@ -405,6 +827,117 @@ class FeatureFucntion:
             self._make_pickles(save_dir)
         return best_weight
 
+    def subgrad_minibatch(self, programs, stepsize_sequence, loss_function, *, batch_size=32, epochs=5, averaging=False, seed=None, save_dir=None, BETA=0.5, init_weight_proportion=0.5, verbose=True, warm_start=False, optimizer=None, processes=None, backend="process"):
+        """stochastic subgradient method with shuffled mini-batches.
+
+        Weight is updated after every batch instead of whole corpus, and
+        learning rate advances at every update. label_seq_dict is
+        re-sorted with weight once per epoch, not after every batch, so
+        candidates of an epoch are ranked by weight at its start. Model
+        is sent to workers once per epoch, and weight with each chunk of
+        a batch.
+
+        Args:
+            programs (utils.program_gen or list) : programs to train.
+            stepsize_sequence (generator) : learning rate for each update.
+            loss_function : loss for two label sequences.
+            batch_size (int) : the number of programs in a batch.
+            epochs (int) : the number of passes over corpus.
+            averaging (bool) : if True, return average of iterates.
+                Not used if optimizer is given.
+            seed (int) : seed for shuffling.
+            optimizer (optimizers.StepSequence) : optimizer for projected update.
+            processes (int) : the number of workers. if None, os.cpu_count().
+            backend (str) : executor of workers, "process", "thread" or "serial".
+                see executors.get_executor.
+
+        Returns:
+            np.ndarray : learned weight.
+        """
+        if warm_start:
+            weight_t = self.weight.copy()
+        else:
+            weight_t = np.ones(len(self.function_keys)) * (BETA * init_weight_proportion)
+        self.weight = weight_t
+        if optimizer is None:
+            optimizer = optimizers.StepSequence(stepsize_sequence, averaging=averaging)
+        optimizer.reset(weight_t, 0, BETA)
+
+        if hasattr(programs, "program_paths"):
+            items = programs.program_paths
+        else:
+            items = list(programs)
+        program_weights = getattr(programs, "weights", None)
+        if program_weights is None:
+            program_weights = [1] * len(items)
+
+        def load(item):
+            if isinstance(item, str):
+                with open(item, "r") as f:
+                    return json.load(f)
+            return item
+
+        # row j is feature counts of correct labels of items[j]
+        gold = self.gold_feature_matrix(load(item) for item in items)
+        program_weights = np.asarray(program_weights, dtype=float)
+
+        rng = np.random.RandomState(seed)
+        num_chunks = processes or os.cpu_count()
+        # model is sent to each worker once, and weight with each batch
+        subgrad_with_loss = executors.ModelMethod(self, "weighted_star_mmsc_batch", loss=loss_function)
+
+        for epoch in tqdm(range(epochs)):
+            sum_wrong_label = 0
+            sum_label = 0
+            order = rng.permutation(len(items))
+            # workers copy model at start of epoch, with label_seq_dict sorted
+            with executors.get_executor(backend, processes, model=self) as pool:
+                for start in range(0, len(items), batch_size):
+                    batch = order[start:start + batch_size]
+                    tasks = [
+                        ([(load(items[j]), program_weights[j]) for j in chunk], weight_t)
+                        for chunk in np.array_split(batch, min(num_chunks, len(batch)))
+                    ]
+                    res = list(instrumentation.absorb(pool.map(instrumentation.collected(subgrad_with_loss), tasks)))
+
+                    grad, _, wrong_label, label = (sum(x) for x in zip(*res))
+                    grad = grad - gold[batch].T @ program_weights[batch]
+                    grad /= program_weights[batch].sum()
+                    sum_wrong_label += wrong_label
+                    sum_label += label
+
+                    weight_t = optimizer.step(weight_t, grad)
+                    optimizer.advance()
+                    # bypass setter, re-sorting label_seq_dict costs as
+                    # much as whole corpus
+                    self.__weight = weight_t
+
+            self.weight = weight_t
+            if verbose:
+                print(f"epoch {epoch}: sum_wrong_label -> {sum_wrong_label}")
+                print(f"correct percentage -> {1.0 * (sum_label - sum_wrong_label) / sum_label}")
+                print(weight_t[:100])
+
+        self.weight = optimizer.result(weight_t)
+        if save_dir:
+            self._make_pickles(save_dir)
+        return self.weight
+
+    @staticmethod
+    def _save_checkpoint(checkpoint_dir, checkpoint):
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        path = join(checkpoint_dir, CHECKPOINT_FILE)
+        # write to temporary file first not to break checkpoint when interrupted
+        with open(path + ".tmp", mode="wb") as f:
+            pickle.dump(checkpoint, f)
+        os.replace(path + ".tmp", path)
+
+    @staticmethod
+    def load_checkpoint(checkpoint_dir):
+        with open(join(checkpoint_dir, CHECKPOINT_FILE), mode="rb") as f:
+            checkpoint = pickle.load(f)
+        return checkpoint
+
     def _make_pickles(self, save_dir):
         with open(join(save_dir, "svm.pickle"), mode="wb") as f:
             pickle.dump(self, f)
@@ -415,6 +948,40 @@ class FeatureFucntion:
             svm = pickle.load(f)
         return svm
 
+    def save_mapped(self, save_dir):
+        """save model for load_mapped, as weight.npy and model without weight.
+
+        label_seq_dict is saved already sorted with weight. With feature
+        store, model pickle holds only path of sqlite file.
+        """
+        os.makedirs(save_dir, exist_ok=True)
+        np.save(join(save_dir, MAPPED_WEIGHT_FILE), np.asarray(self.weight))
+        state = self.__dict__.copy()
+        state["_FeatureFucntion__weight"] = None
+        with open(join(save_dir, MAPPED_MODEL_FILE), mode="wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load_mapped(save_dir):
+        """load model saved by save_mapped.
+
+        weight is memory-mapped read-only, so only pages of features which
+        are looked up are read, and label_seq_dict is not sorted again.
+        The model can be used for inference, not for training.
+        """
+        with open(join(save_dir, MAPPED_MODEL_FILE), mode="rb") as f:
+            state = pickle.load(f)
+        svm = FeatureFucntion.__new__(FeatureFucntion)
+        svm.__dict__.update(state)
+        svm.__weight = np.load(join(save_dir, MAPPED_WEIGHT_FILE), mmap_mode="r")
+        return svm
+
+    @staticmethod
+    def has_mapped(save_dir):
+        return os.path.exists(join(save_dir, MAPPED_MODEL_FILE)) and os.path.exists(
+            join(save_dir, MAPPED_WEIGHT_FILE)
+        )
+
 
 def main(args):
     function_keys, programs, candidates, label_seq_dict = utils.parse_JSON(args.input_dir)
@@ -0,0 +1,90 @@
+import argparse
+import json
+import time
+
+import utils as utils
+from benchmark import machine_info
+from executors import get_executor
+from inference_cache import infer_with_cache
+from SVM import FeatureFucntion
+from telemetry import peak_rss, pickled_size
+from utils import parse_JSON
+
+
+def bench_backend(svm, programs, backend, workers, iterations=1):
+    """time inference over programs and subgrad with one executor.
+
+    Returns:
+        dict : inference seconds and programs/sec, subgrad seconds per
+            iteration, and peak RSS of this process and children (KB).
+    """
+    program_list = list(programs)
+    start = time.perf_counter()
+    with get_executor(backend, workers, model=svm) as pool:
+        infer_with_cache(svm, program_list, pool=pool)
+    inference_time = time.perf_counter() - start
+
+    res = {
+        "backend": backend,
+        "workers": workers,
+        "inference": inference_time,
+        "programs_per_sec": len(program_list) / inference_time,
+    }
+    if iterations:
+        weight = svm.weight
+        start = time.perf_counter()
+        svm.subgrad(
+            programs,
+            utils.sqrt_sequence(0.1),
+            utils.naive_loss,
+            iterations=iterations,
+            verbose=False,
+            processes=workers,
+            backend=backend,
+        )
+        res["subgrad"] = (time.perf_counter() - start) / iterations
+        svm.weight = weight
+    res["peak_rss_kb"], res["peak_rss_children_kb"] = peak_rss()
+    return res
+
+
+def main(args):
+    if args.pickles_dir:
+        svm = FeatureFucntion.load_pickles(args.pickles_dir)
+        _, programs, _, _ = parse_JSON(args.json_file)
+    else:
+        function_keys, programs, candidates, label_seq_dict = parse_JSON(args.json_file)
+        svm = FeatureFucntion(function_keys, candidates, label_seq_dict)
+
+    report = {
+        "machine": machine_info(),
+        "num_programs": len(programs),
+        "num_features": len(svm.function_keys),
+        "model_pickled_bytes": pickled_size(svm),
+        "results": [],
+    }
+    for backend in args.backends:
+        for workers in ([1] if backend == "serial" else args.workers):
+            res = bench_backend(svm, programs, backend, workers, iterations=args.iterations)
+            report["results"].append(res)
+            print("{:<8}{:>4} workers  inference {:.3f}s ({:.1f} programs/s)  subgrad {}".format(
+                backend, workers, res["inference"], res["programs_per_sec"],
+                "{:.3f}s".format(res["subgrad"]) if "subgrad" in res else "-",
+            ))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="compare process and thread executors")
+    parser.add_argument("-j", "--json", required=True, dest="json_file")
+    parser.add_argument("-p", "--pickles", default=None, dest="pickles_dir", help="trained model. if not given, built from -j")
+    parser.add_argument("--backends", nargs="+", default=["serial", "thread", "process"])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--iterations", type=int, default=1, help="iterations of subgrad. 0 skips subgrad")
+    parser.add_argument("-o", "--output", default=None, help="write results into this json file")
+    args = parser.parse_args()
+
+    main(args)
@@ -0,0 +1,242 @@
+import argparse
+import glob
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+from benchmark import machine_info, measure, run_benchmark
+from utils import parse_JSON
+
+
+def git_commit():
+    try:
+        res = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+    except OSError:
+        return None
+    commit = res.stdout.decode().strip()
+    return commit or None
+
+
+def engine_metrics(sizes, num_programs, repeat, iterations, processes):
+    """seconds of SVM entry points on synthetic corpora, from benchmark.run_benchmark.
+    """
+    report = run_benchmark(
+        sizes, num_programs=num_programs, repeat=repeat, iterations=iterations, processes=processes
+    )
+    metrics = {}
+    for result in report["results"]:
+        for name in ("parse_JSON", "score", "inference", "subgrad"):
+            if name in result:
+                key = "engine.vars{}.{}".format(result["num_vars"], name)
+                metrics[key] = {"samples": result[name]["samples"], "better": "lower"}
+    return metrics
+
+
+def corpus_metrics(json_files, repeat):
+    """seconds of parse_JSON on real corpus.
+    """
+    timing, _ = measure(lambda: parse_JSON(json_files), repeat)
+    return {"corpus.parse_JSON": {"samples": timing["samples"], "better": "lower"}}
+
+
+def c2n_metrics(url, tests_path, batch_size=32, repeat=10, timeout=60):
+    """latency and throughput of running c2n_server.
+
+    Args:
+        url (str) : url of server, e.g. http://localhost:8080.
+        tests_path (str) : file of lines posted as {"tests": [...]}.
+        batch_size (int) : the number of lines per request.
+        repeat (int) : the number of requests.
+    """
+    with open(tests_path, "r") as f:
+        lines = [line.rstrip("\n") for line in f if line.strip()]
+    latencies = []
+    throughputs = []
+    for i in range(repeat):
+        start = (i * batch_size) % len(lines)
+        batch = (lines[start:] + lines[:start])[:batch_size]
+        body = json.dumps({"tests": batch}).encode("utf-8")
+        request = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+        begin = time.perf_counter()
+        with urllib.request.urlopen(request, timeout=timeout) as res:
+            res.read()
+        elapsed = time.perf_counter() - begin
+        latencies.append(elapsed)
+        throughputs.append(len(batch) / elapsed)
+    return {
+        "c2n.request": {"samples": latencies, "better": "lower"},
+        "c2n.lines_per_sec": {"samples": throughputs, "better": "higher"},
+    }
+
+
+def spread(samples):
+    """robust standard deviation from median absolute deviation.
+    """
+    if len(samples) < 2:
+        return 0.0
+    center = statistics.median(samples)
+    return 1.4826 * statistics.median(abs(v - center) for v in samples)
+
+
+def compare_metric(base, current, threshold=0.1, noise=3.0):
+    """compare samples of one metric.
+
+    Change counts as significant only if it is larger than both threshold
+    (relative) and noise times the spread of samples, so that noisy
+    metrics need larger change.
+
+    Returns:
+        dict : base and current median, relative change (positive is worse),
+            limit and status ("slower", "faster" or "same").
+    """
+    base_median = statistics.median(base["samples"])
+    current_median = statistics.median(current["samples"])
+    change = (current_median - base_median) / base_median if base_median else 0.0
+    if base.get("better", "lower") == "higher":
+        change = -change
+    margin = noise * max(spread(base["samples"]), spread(current["samples"]))
+    limit = max(threshold, margin / base_median if base_median else 0.0)
+    if change > limit:
+        status = "slower"
+    elif change < -limit:
+        status = "faster"
+    else:
+        status = "same"
+    return {
+        "base": base_median,
+        "current": current_median,
+        "change": change,
+        "limit": limit,
+        "status": status,
+    }
+
+
+def compare(base_report, current_report, threshold=0.1, noise=3.0):
+    """compare metrics in both reports.
+
+    Returns:
+        dict : metric name -> result of compare_metric.
+    """
+    res = {}
+    for name, current in sorted(current_report["metrics"].items()):
+        if name in base_report["metrics"]:
+            res[name] = compare_metric(base_report["metrics"][name], current, threshold, noise)
+    return res
+
+
+def print_comparison(comparison, base_report, current_report):
+    if base_report["machine"] != current_report["machine"]:
+        print("WARNING: machine differs from baseline, times may not be comparable")
+    print("{:<36}{:>12}{:>12}{:>10}{:>10}  {}".format("metric", "base", "current", "change", "limit", "status"))
+    for name, res in comparison.items():
+        print("{:<36}{:>12.5f}{:>12.5f}{:>10.1%}{:>10.1%}  {}".format(
+            name, res["base"], res["current"], res["change"], res["limit"], res["status"]
+        ))
+
+
+def load_report(path, results_dir=None):
+    if not os.path.exists(path) and results_dir:
+        path = os.path.join(results_dir, path)
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def latest_report_path(results_dir):
+    paths = sorted(glob.glob(os.path.join(results_dir, "*.json")))
+    return paths[-1] if paths else None
+
+
+def check(comparison):
+    """exit code: 1 if any metric is slower, else 0.
+    """
+    return 1 if any(res["status"] == "slower" for res in comparison.values()) else 0
+
+
+def run(args):
+    os.makedirs(args.results_dir, exist_ok=True)
+    baseline_path = args.baseline
+    if baseline_path == "latest":
+        # resolve before this run is written
+        baseline_path = latest_report_path(args.results_dir)
+        if baseline_path is None:
+            print("no baseline in {}".format(args.results_dir))
+
+    metrics = engine_metrics(args.sizes, args.num_programs, args.repeat, args.iterations, args.processes)
+    if args.json_files:
+        metrics.update(corpus_metrics(args.json_files, args.repeat))
+    if args.c2n_url:
+        metrics.update(c2n_metrics(args.c2n_url, args.c2n_tests, batch_size=args.c2n_batch, repeat=args.c2n_repeat))
+
+    commit = git_commit()
+    report = {
+        "machine": machine_info(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "label": args.label,
+        "metrics": metrics,
+    }
+    name = "{}_{}.json".format(time.strftime("%Y%m%d-%H%M%S"), args.label or (commit or "unknown")[:8])
+    path = os.path.join(args.results_dir, name)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    print("results -> {}".format(path))
+
+    if not baseline_path:
+        return 0
+    base_report = load_report(baseline_path, args.results_dir)
+    comparison = compare(base_report, report, args.threshold, args.noise)
+    print_comparison(comparison, base_report, report)
+    return check(comparison)
+
+
+def compare_command(args):
+    base_report = load_report(args.baseline, args.results_dir)
+    current_report = load_report(args.current, args.results_dir)
+    comparison = compare(base_report, current_report, args.threshold, args.noise)
+    print_comparison(comparison, base_report, current_report)
+    return check(comparison)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="record benchmarks and detect slowdowns against baseline")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    run_parser = subparsers.add_parser("run", help="run benchmarks and save results")
+    run_parser.add_argument("--label", default=None, help="name of run in results file name")
+    run_parser.add_argument("--baseline", default=None, help="result file (or its name in results dir) to compare with, or \"latest\"")
+    run_parser.add_argument("--sizes", type=int, nargs="+", default=[10, 40])
+    run_parser.add_argument("-n", "--num-programs", type=int, default=20, dest="num_programs")
+    run_parser.add_argument("--repeat", type=int, default=5)
+    run_parser.add_argument("--iterations", type=int, default=1, help="iterations of subgrad. 0 skips subgrad")
+    run_parser.add_argument("--processes", type=int, default=None)
+    run_parser.add_argument("-j", "--json", default=None, dest="json_files", help="real corpus to time parse_JSON on")
+    run_parser.add_argument("--c2n-url", default=None, dest="c2n_url", help="url of running c2n_server, e.g. http://localhost:8080")
+    run_parser.add_argument("--c2n-tests", default=None, dest="c2n_tests", help="file of lines to post to c2n_server")
+    run_parser.add_argument("--c2n-batch", type=int, default=32, dest="c2n_batch")
+    run_parser.add_argument("--c2n-repeat", type=int, default=10, dest="c2n_repeat")
+    run_parser.set_defaults(func=run)
+
+    compare_parser = subparsers.add_parser("compare", help="compare two saved results")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.set_defaults(func=compare_command)
+
+    for sub in (run_parser, compare_parser):
+        sub.add_argument("-r", "--results-dir", default="bench_results", dest="results_dir")
+        sub.add_argument("--threshold", type=float, default=0.1, help="minimum relative slowdown to report")
+        sub.add_argument("--noise", type=float, default=3.0, help="slowdown must exceed this many robust deviations")
+
+    args = parser.parse_args()
+    if args.command == "run" and args.c2n_url and not args.c2n_tests:
+        parser.error("--c2n-tests is required with --c2n-url")
+
+    sys.exit(args.func(args))
@@ -0,0 +1,179 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import utils as utils
+from SVM import FeatureFucntion
+from synthetic import generate_corpus
+from utils import parse_JSON
+
+
+def machine_info():
+    return {
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def measure(func, repeat):
+    """run func repeat times.
+
+    Returns:
+        dict : mean, min and max seconds of runs and seconds of each run
+            (samples), and result of last run.
+    """
+    times = []
+    res = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        res = func()
+        times.append(time.perf_counter() - start)
+    return {"mean": statistics.mean(times), "min": min(times), "max": max(times), "samples": times}, res
+
+
+def per_program(timing, num_programs):
+    res = {key: value / num_programs for key, value in timing.items() if key != "samples"}
+    res["samples"] = [value / num_programs for value in timing["samples"]]
+    return res
+
+
+def bench_size(corpus_dir, repeat=3, iterations=1, processes=None):
+    """time each engine entry point on corpus.
+
+    Times of score and inference are per program.
+
+    Args:
+        corpus_dir (str) : directory of JSON files.
+        repeat (int) : the number of runs of each entry point.
+        iterations (int) : iterations of subgrad. if 0, subgrad is skipped.
+        processes (int) : the number of worker processes of subgrad.
+
+    Returns:
+        dict : sizes of corpus and model, and time of each entry point.
+    """
+    timing, (function_keys, programs, candidates, label_seq_dict) = measure(
+        lambda: parse_JSON(corpus_dir), repeat
+    )
+    result = {"parse_JSON": timing}
+    svm = FeatureFucntion(function_keys, candidates, label_seq_dict)
+    program_list = list(programs)
+
+    def score_all():
+        for program in program_list:
+            svm.score(program["y_names"], program)
+
+    def infer_all():
+        for program in program_list:
+            svm.inference(program)
+
+    timing, _ = measure(score_all, repeat)
+    result["score"] = per_program(timing, len(program_list))
+    timing, _ = measure(infer_all, repeat)
+    result["inference"] = per_program(timing, len(program_list))
+
+    if iterations:
+        timing, _ = measure(
+            lambda: svm.subgrad(
+                programs,
+                utils.sqrt_sequence(0.1),
+                utils.naive_loss,
+                iterations=iterations,
+                verbose=False,
+                processes=processes,
+            ),
+            repeat,
+        )
+        result["subgrad"] = timing
+
+    result["num_programs"] = len(program_list)
+    result["num_edges"] = sum(len(program) - 1 for program in program_list)
+    result["num_features"] = len(function_keys)
+    return result
+
+
+def run_benchmark(sizes, num_programs=20, degree=3, num_scopes=3, repeat=3, iterations=1, processes=None, seed=0, work_dir=None):
+    """generate synthetic corpus of each size and time entry points on it.
+
+    Args:
+        sizes (list of int) : the numbers of variables per program.
+        work_dir (str) : directory to keep corpora in. if None, temporary one.
+        others : see synthetic.generate_program and bench_size.
+
+    Returns:
+        dict : machine info, parameters and list of results per size.
+    """
+    report = {
+        "machine": machine_info(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "params": {
+            "num_programs": num_programs,
+            "degree": degree,
+            "num_scopes": num_scopes,
+            "repeat": repeat,
+            "iterations": iterations,
+            "processes": processes,
+            "seed": seed,
+        },
+        "results": [],
+    }
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        base_dir = work_dir or tmp_dir
+        for size in sizes:
+            corpus_dir = os.path.join(base_dir, "vars{}".format(size))
+            generate_corpus(corpus_dir, num_programs, seed=seed, num_vars=size, num_scopes=num_scopes, degree=degree)
+            result = bench_size(corpus_dir, repeat=repeat, iterations=iterations, processes=processes)
+            result["num_vars"] = size
+            report["results"].append(result)
+    return report
+
+
+def main(args):
+    report = run_benchmark(
+        args.sizes,
+        num_programs=args.num_programs,
+        degree=args.degree,
+        num_scopes=args.num_scopes,
+        repeat=args.repeat,
+        iterations=args.iterations,
+        processes=args.processes,
+        seed=args.seed,
+        work_dir=args.work_dir,
+    )
+    for result in report["results"]:
+        print("vars={:<6} parse_JSON {:.4f}s  score {:.6f}s  inference {:.4f}s  subgrad {}".format(
+            result["num_vars"],
+            result["parse_JSON"]["mean"],
+            result["score"]["mean"],
+            result["inference"]["mean"],
+            "{:.4f}s".format(result["subgrad"]["mean"]) if "subgrad" in result else "-",
+        ))
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="time engine entry points on synthetic corpora of growing size")
+    parser.add_argument("-o", "--output", required=True, help="JSON file to write results in")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 20, 40, 80], help="the numbers of variables per program")
+    parser.add_argument("-n", "--num-programs", type=int, default=20, dest="num_programs")
+    parser.add_argument("--degree", type=int, default=3)
+    parser.add_argument("--num-scopes", type=int, default=3, dest="num_scopes")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--iterations", type=int, default=1, help="iterations of subgrad. 0 skips subgrad")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--work-dir", default=None, dest="work_dir", help="keep generated corpora here")
+    args = parser.parse_args()
+
+    main(args)
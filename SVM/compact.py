@@ -0,0 +1,221 @@
+import numpy as np
+
+
+class LabelTable:
+    """interned labels. label ID is index in labels.
+
+    Map from label to ID is built lazily and is not pickled, so that
+    model sent to Pool workers stays small.
+
+    Attributes:
+        labels : list :
+            label of each ID.
+    """
+
+    def __init__(self, labels=()):
+        self.labels = list(labels)
+        self.__index = None
+
+    def __getstate__(self):
+        return {"labels": self.labels}
+
+    def __setstate__(self, state):
+        self.labels = state["labels"]
+        self.__index = None
+
+    def __len__(self):
+        return len(self.labels)
+
+    @property
+    def index(self):
+        if self.__index is None:
+            self.__index = {label: i for i, label in enumerate(self.labels)}
+        return self.__index
+
+    def intern(self, label):
+        label_id = self.index.get(label)
+        if label_id is None:
+            label_id = len(self.labels)
+            self.labels.append(label)
+            self.__index[label] = label_id
+        return label_id
+
+    def id_of(self, label):
+        return self.index.get(label)
+
+
+class LabelSeqEntries:
+    """read-only view of (index, label) list of one context.
+
+    Supports what inference uses: len, iteration, indexing and slicing.
+    Slices are returned as lists of tuples.
+    """
+
+    __slots__ = ("feature_ids", "label_ids", "labels")
+
+    def __init__(self, feature_ids, label_ids, labels):
+        self.feature_ids = feature_ids
+        self.label_ids = label_ids
+        self.labels = labels
+
+    def __len__(self):
+        return len(self.feature_ids)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            labels = self.labels
+            return list(zip(
+                self.feature_ids[key].tolist(),
+                [labels[i] for i in self.label_ids[key].tolist()],
+            ))
+        return int(self.feature_ids[key]), self.labels[int(self.label_ids[key])]
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+
+class CompactLabelSeqDict:
+    """label_seq_dict stored in flat arrays.
+
+    Entries of all contexts are kept in feature_ids and label_ids, and
+    entries of context with slot k are in offsets[k]:offsets[k + 1].
+    Labels are interned in LabelTable.
+
+    Attributes:
+        contexts : list :
+            context ("name区seq") of each slot.
+
+        offsets : np.ndarray :
+            start of entries of each slot, and the number of entries at last.
+
+        feature_ids : np.ndarray :
+            feature index of each entry.
+
+        label_ids : np.ndarray :
+            label ID of each entry.
+
+        table : LabelTable :
+            interned labels.
+    """
+
+    def __init__(self, contexts, offsets, feature_ids, label_ids, table):
+        self.contexts = contexts
+        self.offsets = offsets
+        self.feature_ids = feature_ids
+        self.label_ids = label_ids
+        self.table = table
+        self.__slots = None
+
+    @classmethod
+    def from_dict(cls, label_seq_dict, table=None):
+        """convert label_seq_dict built by parse_JSON, keeping order of lists.
+        """
+        if table is None:
+            table = LabelTable()
+        contexts = list(label_seq_dict)
+        sizes = [len(label_seq_dict[context]) for context in contexts]
+        offsets = np.zeros(len(contexts) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=offsets[1:])
+
+        entries = [v for context in contexts for v in label_seq_dict[context]]
+        max_feature = max((index for index, _ in entries), default=0)
+        feature_dtype = np.int32 if max_feature < 2 ** 31 else np.int64
+        feature_ids = np.fromiter((index for index, _ in entries), dtype=feature_dtype, count=len(entries))
+        label_ids = np.fromiter((table.intern(label) for _, label in entries), dtype=np.int32, count=len(entries))
+        return cls(contexts, offsets, feature_ids, label_ids, table)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # context -> slot map is rebuilt from contexts
+        state["_CompactLabelSeqDict__slots"] = None
+        return state
+
+    @property
+    def slots(self):
+        if self.__slots is None:
+            self.__slots = {context: k for k, context in enumerate(self.contexts)}
+        return self.__slots
+
+    def __len__(self):
+        return len(self.contexts)
+
+    def __contains__(self, context):
+        return context in self.slots
+
+    def __getitem__(self, context):
+        k = self.slots[context]
+        start, end = self.offsets[k], self.offsets[k + 1]
+        return LabelSeqEntries(
+            self.feature_ids[start:end], self.label_ids[start:end], self.table.labels
+        )
+
+    def keys(self):
+        return iter(self.contexts)
+
+    def items(self):
+        for context in self.contexts:
+            yield context, self[context]
+
+    def sort_by_weight(self, weight):
+        """sort entries of each context by weight, descending.
+
+        Sort is stable like list.sort of dict version, so ties keep order.
+        """
+        if len(self.feature_ids) == 0:
+            return
+        segments = np.repeat(np.arange(len(self.contexts)), np.diff(self.offsets))
+        order = np.lexsort((-np.asarray(weight)[self.feature_ids], segments))
+        self.feature_ids = self.feature_ids[order]
+        self.label_ids = self.label_ids[order]
+
+
+class CompactCandidates:
+    """candidates stored as sorted label IDs of LabelTable.
+
+    Attributes:
+        ids : np.ndarray :
+            sorted label IDs of candidates.
+
+        table : LabelTable :
+            interned labels, shared with CompactLabelSeqDict.
+    """
+
+    def __init__(self, ids, table):
+        self.ids = ids
+        self.table = table
+
+    @classmethod
+    def from_names(cls, names, table=None):
+        if table is None:
+            table = LabelTable()
+        ids = np.unique(np.fromiter((table.intern(name) for name in names), dtype=np.int32))
+        return cls(ids, table)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, name):
+        label_id = self.table.id_of(name)
+        if label_id is None:
+            return False
+        pos = np.searchsorted(self.ids, label_id)
+        return pos < len(self.ids) and self.ids[pos] == label_id
+
+    def __iter__(self):
+        labels = self.table.labels
+        return (labels[i] for i in self.ids.tolist())
+
+
+def compact(candidates, label_seq_dict):
+    """convert candidates and label_seq_dict of parse_JSON into compact ones sharing labels.
+
+    Returns:
+        candidates, label_seq_dict
+    """
+    table = LabelTable()
+    label_seq_dict = CompactLabelSeqDict.from_dict(label_seq_dict, table)
+    candidates = CompactCandidates.from_names(candidates, table)
+    return candidates, label_seq_dict
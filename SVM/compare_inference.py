@@ -0,0 +1,64 @@
+import argparse
+import json
+import time
+
+from SVM import FeatureFucntion
+from utils import parse_JSON
+
+
+def evaluate(programs, infer):
+    """accuracy and time of inference function over programs.
+    """
+    val = 0
+    length = 0
+    start = time.time()
+    for program in programs:
+        y = infer(program)
+        for a, b in zip(program["y_names"], y):
+            if a == b:
+                val += 1
+        length += len(y)
+    elapsed = time.time() - start
+    return {
+        "accuracy": val * 1.0 / length if length else 0.0,
+        "time": elapsed,
+        "time_per_program": elapsed / len(programs) if programs else 0.0,
+    }
+
+
+def main(args):
+    print("building SVM ...")
+    svm = FeatureFucntion.load_pickles(args.pickles_dir)
+
+    print("parsing jsons to infer")
+    _, programs, _, _ = parse_JSON(args.json_file)
+    programs = list(programs)[:args.limit]
+
+    results = []
+    res = evaluate(programs, lambda x: svm.inference(x, NUM_PATH=args.num_path))
+    results.append(dict(res, method="greedy", NUM_PATH=args.num_path))
+    for width in args.beam_widths:
+        res = evaluate(programs, lambda x: svm.beam_inference(x, BEAM_WIDTH=width))
+        results.append(dict(res, method="beam", BEAM_WIDTH=width))
+
+    print("{:<8}{:>8}{:>12}{:>16}".format("method", "param", "accuracy", "sec/program"))
+    for res in results:
+        param = res.get("BEAM_WIDTH", res.get("NUM_PATH"))
+        print("{:<8}{:>8}{:>12.2%}{:>16.4f}".format(res["method"], param, res["accuracy"], res["time_per_program"]))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="compare greedy and beam inference")
+    parser.add_argument("-p", "--pickles", required=True, dest="pickles_dir")
+    parser.add_argument("-j", "--json", required=True, dest="json_file")
+    parser.add_argument("--beam-widths", type=int, nargs="+", default=[1, 4, 16], dest="beam_widths")
+    parser.add_argument("--num-path", type=int, default=FeatureFucntion.NUM_PATH, dest="num_path")
+    parser.add_argument("--limit", type=int, default=None, help="the number of programs to use")
+    parser.add_argument("-o", "--output", default=None, help="write results into this json file")
+    args = parser.parse_args()
+
+    main(args)
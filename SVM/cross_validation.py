@@ -0,0 +1,263 @@
+import csv
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from sklearn.model_selection import KFold
+from tqdm import tqdm
+
+import optimizers
+import utils as utils
+from inference_cache import InferenceCache, count_correct, infer_with_cache
+from SVM import FeatureFucntion
+from utils import Triplet
+
+# corpus of job processes, set by _set_corpus
+_CORPUS = None
+
+
+def _set_corpus(corpus):
+    global _CORPUS
+    _CORPUS = corpus
+
+
+class Corpus:
+    """Corpus parsed once, from which vocabulary of any subset is built.
+
+    Attributes:
+        paths : list :
+            paths of JSON files, in order of utils.list_json_files,
+            so folds are the same as KFold over the listed files.
+
+        features : list :
+            for each file, dict of Triplet -> edge obj in order of first
+            appearance. obj is the last one in the file, as parse_JSON.
+
+        names : list :
+            for each file, variable names in y_names.
+    """
+
+    def __init__(self, input_path):
+        self.paths = utils.list_json_files(input_path)
+        self.features = []
+        self.names = []
+        # share same Triplet object between files to save memory
+        interned = {}
+        for path in tqdm(self.paths):
+            with open(path, "r") as f:
+                program = json.load(f)
+            features = {}
+            for key, obj in program.items():
+                if key == "y_names":
+                    continue
+                key_name = Triplet(obj["xName"], obj["sequence"], obj["yName"])
+                key_name = interned.setdefault(key_name, key_name)
+                features[key_name] = {
+                    "type": obj["type"],
+                    "xName": obj["xName"],
+                    "yName": obj["yName"],
+                    "sequence": obj["sequence"],
+                }
+            self.features.append(features)
+            self.names.append([utils.get_varname(val) for val in program["y_names"]])
+
+    def __len__(self):
+        return len(self.paths)
+
+    def build_vocabulary(self, indices):
+        """build function_keys, candidates and label_seq_dict of subset.
+
+        Same as parse_JSON for the files in indices, without reading them.
+
+        Args:
+            indices (list of int) : indices of files.
+
+        Returns:
+            function_keys, candidates, label_seq_dict
+        """
+        function_keys = {}
+        candidates = {}
+        label_seq_dict = {}
+        # temporaly map for obj type
+        tmp_map = {}
+        for index in indices:
+            for key, obj in self.features[index].items():
+                if key not in function_keys:
+                    function_keys[key] = 0
+                tmp_map[key] = obj
+            for name in self.names[index]:
+                if name not in candidates:
+                    candidates[name] = 0
+
+        for i, key in enumerate(function_keys):
+            function_keys[key] = i
+            utils.add_label_seq(label_seq_dict, tmp_map[key], i)
+        return function_keys, candidates, label_seq_dict
+
+    def programs(self, indices):
+        return utils.program_gen([self.paths[i] for i in indices])
+
+
+def config_key(config):
+    """key of config in result table.
+    """
+    return json.dumps(config, sort_keys=True)
+
+
+def run_job(job):
+    """train on one fold with one config and evaluate on its test files.
+
+    Args:
+        job (dict) :
+            config (dict) : sequence, step, init_weight_proportion, BETA.
+            fold (int) : index of fold.
+            train, test (list of int) : indices of files.
+            iterations (int) : the number of iterations of subgrad.
+            processes (int) : the number of worker processes of subgrad.
+            init_weight (np.ndarray) : if given, warm-start from it.
+            num_draws (int) : position in step sequence to continue from,
+                "num_draws" of row of warm-start weight. default 1.
+            cache_dir (str) : directory of inference cache.
+            cache_size (int) : the number of entries of inference cache.
+
+    Returns:
+        dict : row of result table, with "weight" of trained model and
+            "num_draws", the number of learning rates drawn so far.
+    """
+    corpus = _CORPUS
+    config = job["config"]
+    start = time.time()
+
+    function_keys, candidates, label_seq_dict = corpus.build_vocabulary(job["train"])
+    svm = FeatureFucntion(function_keys, candidates, label_seq_dict)
+    if job.get("init_weight") is not None:
+        svm.weight = job["init_weight"]
+    step_seq = utils.get_stepsize_sequence(config.get("sequence", "sqrt"), config.get("step", 0.1))
+    # skip learning rates used before. subgrad draws one more at start,
+    # which is the last one used before
+    skipped = job.get("num_draws", 1) - 1
+    for _ in range(skipped):
+        next(step_seq)
+    optimizer = optimizers.StepSequence(step_seq)
+    svm.subgrad(
+        corpus.programs(job["train"]),
+        step_seq,
+        utils.naive_loss,
+        iterations=job["iterations"],
+        BETA=config.get("BETA", 0.5),
+        init_weight_proportion=config.get("init_weight_proportion", 0.5),
+        verbose=False,
+        warm_start=job.get("init_weight") is not None,
+        processes=job["processes"],
+        optimizer=optimizer,
+    )
+    train_time = time.time() - start
+
+    cache = None
+    if job.get("cache_dir"):
+        cache = InferenceCache(job["cache_dir"], max_entries=job.get("cache_size", 100000))
+    res = infer_with_cache(svm, corpus.programs(job["test"]), cache=cache)
+    if cache is not None:
+        cache.close()
+    correct, total = count_correct(res)
+
+    return {
+        "config": config_key(config),
+        "fold": job["fold"],
+        "iterations": job["iterations"],
+        "correct": correct,
+        "total": total,
+        "accuracy": correct * 1.0 / total if total else 0.0,
+        "train_time": train_time,
+        "time": time.time() - start,
+        "weight": svm.weight,
+        "num_draws": skipped + optimizer.num_draws,
+    }
+
+
+def make_folds(corpus, n_splits=10, max_folds=None):
+    """split corpus into (train, test) indices with KFold.
+    """
+    kf = KFold(n_splits=n_splits)
+    folds = [(list(train), list(test)) for train, test in kf.split(np.arange(len(corpus)))]
+    if max_folds is not None:
+        folds = folds[:max_folds]
+    return folds
+
+
+def run_jobs(corpus, jobs, max_workers=1, mp_context=None):
+    """run jobs concurrently on corpus.
+
+    Args:
+        corpus (Corpus) : corpus shared with workers.
+        jobs (list of dict) : jobs for run_job.
+        max_workers (int) : the number of jobs run at once.
+            total process budget is max_workers * job["processes"].
+        mp_context : multiprocessing context of workers. default one if None.
+
+    Returns:
+        list of dict : rows of result table.
+    """
+    if max_workers == 1:
+        _set_corpus(corpus)
+        return [run_job(job) for job in tqdm(jobs)]
+
+    rows = []
+    # corpus is sent to each worker once, which works with any start method
+    with ProcessPoolExecutor(
+        max_workers=max_workers, mp_context=mp_context, initializer=_set_corpus, initargs=(corpus,)
+    ) as executor:
+        futures = [executor.submit(run_job, job) for job in jobs]
+        for future in tqdm(as_completed(futures), total=len(futures)):
+            rows.append(future.result())
+    return rows
+
+
+def cross_validate(corpus, configs, *, iterations=30, n_splits=10, max_folds=None, max_workers=1, processes=1, cache_dir=None, cache_size=100000):
+    """cross validation of every config over every fold.
+
+    Returns:
+        list of dict : rows of result table.
+    """
+    jobs = []
+    for fold, (train, test) in enumerate(make_folds(corpus, n_splits, max_folds)):
+        for config in configs:
+            jobs.append({
+                "config": config,
+                "fold": fold,
+                "train": train,
+                "test": test,
+                "iterations": iterations,
+                "processes": processes,
+                "cache_dir": cache_dir,
+                "cache_size": cache_size,
+            })
+    return run_jobs(corpus, jobs, max_workers=max_workers)
+
+
+def summarize(rows):
+    """accuracy over folds for each config.
+
+    Returns:
+        dict : config (json str) -> accuracy.
+    """
+    correct = {}
+    total = {}
+    for row in rows:
+        correct[row["config"]] = correct.get(row["config"], 0) + row["correct"]
+        total[row["config"]] = total.get(row["config"], 0) + row["total"]
+    return {config: correct[config] * 1.0 / total[config] for config in correct}
+
+
+TABLE_COLUMNS = ["config", "fold", "rung", "iterations", "correct", "total", "accuracy", "train_time", "time"]
+
+
+def write_table(rows, path):
+    """write rows into csv file.
+    """
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=TABLE_COLUMNS, extrasaction="ignore")
+        writer.writeheader()
+        for row in sorted(rows, key=lambda x: (x["config"], x.get("rung", 0), x["fold"])):
+            writer.writerow(row)
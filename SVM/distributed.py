@@ -0,0 +1,322 @@
+import argparse
+import json
+import os
+import secrets
+import threading
+from functools import partial
+from multiprocessing import Pool
+from multiprocessing.connection import Client, Listener, wait
+
+# environment variable to pass authkey without showing it in process list
+AUTHKEY_ENV = "SVM_AUTHKEY"
+
+
+def get_authkey(authkey=None):
+    """authkey from argument or SVM_AUTHKEY, as bytes.
+
+    Workers and coordinator exchange pickles, so anyone who knows
+    authkey can run code on them. There is no default.
+
+    Raises:
+        ValueError : if authkey is neither given nor set in environment.
+    """
+    if not authkey:
+        authkey = os.environ.get(AUTHKEY_ENV)
+    if not authkey:
+        raise ValueError("authkey is required. give it or set {}".format(AUTHKEY_ENV))
+    if isinstance(authkey, str):
+        authkey = authkey.encode()
+    return authkey
+
+
+def generate_authkey():
+    """random authkey to share with workers.
+    """
+    return secrets.token_hex(16)
+
+
+def parse_address(address):
+    """"host:port" -> (host, port).
+    """
+    host, port = address.rsplit(":", 1)
+    return host, int(port)
+
+
+def make_shards(programs, num_shards):
+    """split corpus into shards of (program or path, multiplicity).
+
+    If programs has program_paths, shards hold paths, so corpus is not
+    loaded here. Programs are read when shard is sent (see Coordinator).
+
+    Args:
+        programs (utils.program_gen or list) : programs to train.
+        num_shards (int) : the number of shards.
+
+    Returns:
+        list of list : shards.
+    """
+    program_weights = getattr(programs, "weights", None)
+    if hasattr(programs, "program_paths"):
+        items = list(programs.program_paths)
+    else:
+        items = list(programs)
+    if program_weights is None:
+        program_weights = [1] * len(items)
+
+    shards = [[] for _ in range(min(num_shards, len(items)))]
+    for i, item in enumerate(zip(items, program_weights)):
+        shards[i % len(shards)].append(item)
+    return shards
+
+
+def reduce_results(results, only_loss=False):
+    """sum results of weighted_subgrad_mmsc (or weighted_star_mmsc).
+    """
+    if only_loss:
+        return sum(results)
+    return tuple(sum(x) for x in zip(*results))
+
+
+class Coordinator:
+    """coordinator of gradient computation on workers connected over TCP.
+
+    Workers (run_worker) can connect at any time, and join from next
+    round. In each round weight is broadcast, shards are handed out one by
+    one to idle workers, and reduced results of shards are summed. If a
+    worker is lost, its shard is handed to other worker.
+
+    Attributes:
+        svm (FeatureFucntion) : model sent to workers. Its weight is
+            overwritten by the one of each round.
+        shards (list of list) : shards from make_shards.
+        timeout (float) : seconds to wait for result of a shard. if a
+            worker takes longer, it is regarded as lost.
+        send_programs (bool) : if True, paths in shards are read when
+            shard is sent. if False, paths are sent, and workers read
+            them from shared file system.
+    """
+
+    def __init__(self, svm, shards, authkey, address=("localhost", 0), timeout=None, send_programs=True):
+        """
+        Args:
+            authkey (bytes or str) : secret shared with workers, see get_authkey.
+
+        Raises:
+            ValueError : if there is no shard or a shard is empty, since
+                sum over no programs has no shape of gradient.
+        """
+        if not shards or not all(shards):
+            raise ValueError("shards should not be empty. is corpus empty?")
+        self.svm = svm
+        self.shards = shards
+        self.timeout = timeout
+        self.send_programs = send_programs
+        self.round = 0
+        self.listener = Listener(address, authkey=get_authkey(authkey))
+        self.workers = []
+        self.lost = 0
+        # shard ids each worker already holds
+        self.__held = {}
+        self.__new = []
+        self.__lock = threading.Lock()
+        self.__joined = threading.Condition(self.__lock)
+        self.__closed = False
+        self.__thread = threading.Thread(target=self._accept, daemon=True)
+        self.__thread.start()
+
+    @property
+    def address(self):
+        return self.listener.address
+
+    def _accept(self):
+        while True:
+            try:
+                conn = self.listener.accept()
+            except (OSError, EOFError):
+                # listener closed, or handshake of a client failed
+                if self.__closed:
+                    return
+                continue
+            with self.__joined:
+                self.__new.append(conn)
+                self.__joined.notify_all()
+
+    def wait_for_workers(self, num_workers, timeout=None):
+        """block until num_workers workers are connected.
+
+        Returns:
+            bool : False if timed out.
+        """
+        with self.__joined:
+            return self.__joined.wait_for(
+                lambda: len(self.workers) + len(self.__new) >= num_workers, timeout
+            )
+
+    def _admit_new_workers(self):
+        with self.__lock:
+            new, self.__new = self.__new, []
+        for conn in new:
+            try:
+                conn.send(("model", self.svm))
+            except OSError:
+                continue
+            self.workers.append(conn)
+            self.__held[conn] = set()
+
+    def _drop(self, conn):
+        self.workers.remove(conn)
+        del self.__held[conn]
+        self.lost += 1
+        try:
+            conn.close()
+        except OSError:
+            pass
+
+    def _assign(self, conn, shard_id, only_loss, method):
+        """send task (and shard itself if needed). False if worker is lost.
+        """
+        try:
+            if shard_id not in self.__held[conn]:
+                shard = self.shards[shard_id]
+                if self.send_programs:
+                    shard = [(_load(item), weight) for item, weight in shard]
+                conn.send(("shard", shard_id, shard))
+                self.__held[conn].add(shard_id)
+            conn.send(("task", self.round, shard_id, only_loss, method))
+        except (OSError, EOFError):
+            return False
+        return True
+
+    def compute(self, weight, loss, only_loss=False, method="weighted_subgrad_mmsc"):
+        """reduced result of method of model over all shards with weight.
+
+        Args:
+            method (str) : "weighted_subgrad_mmsc" or "weighted_star_mmsc".
+
+        Returns:
+            same as sum of method over corpus:
+            (grad, sum_loss, sum_wrong_label, sum_label), or sum_loss if only_loss.
+        """
+        self.round += 1
+        self._admit_new_workers()
+        for conn in list(self.workers):
+            try:
+                conn.send(("weight", self.round, weight, loss))
+            except (OSError, EOFError):
+                self._drop(conn)
+
+        todo = list(range(len(self.shards)))
+        running = {}
+        results = {}
+        while len(results) < len(self.shards):
+            for conn in list(self.workers):
+                if conn in running or not todo:
+                    continue
+                shard_id = todo.pop()
+                if self._assign(conn, shard_id, only_loss, method):
+                    running[conn] = shard_id
+                else:
+                    todo.append(shard_id)
+                    self._drop(conn)
+            if not running:
+                raise RuntimeError("no worker is alive")
+
+            ready = wait(list(running), timeout=self.timeout)
+            if not ready:
+                # every running worker is too slow, give up them
+                ready = list(running)
+            for conn in ready:
+                shard_id = running.pop(conn)
+                try:
+                    if not conn.poll():
+                        raise EOFError("timed out")
+                    message = conn.recv()
+                except (OSError, EOFError):
+                    todo.append(shard_id)
+                    self._drop(conn)
+                    continue
+                _, round_id, result_shard, value = message
+                if round_id != self.round:
+                    # answer of older round, keep waiting for this one
+                    running[conn] = shard_id
+                    continue
+                results[result_shard] = value
+        return reduce_results(results.values(), only_loss)
+
+    def close(self):
+        self.__closed = True
+        for conn in self.workers:
+            try:
+                conn.send(("stop",))
+                conn.close()
+            except OSError:
+                pass
+        self.workers = []
+        self.listener.close()
+
+
+def _load(item):
+    if isinstance(item, str):
+        with open(item, "r") as f:
+            return json.load(f)
+    return item
+
+
+def run_worker(address, authkey, processes=1):
+    """connect to Coordinator and compute gradients until told to stop.
+
+    Args:
+        address (tuple) : (host, port) of coordinator.
+        authkey (bytes or str) : secret of coordinator, see get_authkey.
+        processes (int) : the number of local processes for each shard.
+    """
+    conn = Client(address, authkey=get_authkey(authkey))
+    svm = None
+    shards = {}
+    loss = None
+    pool = Pool(processes) if processes > 1 else None
+    try:
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError:
+                break
+            kind = message[0]
+            if kind == "stop":
+                break
+            elif kind == "model":
+                svm = message[1]
+            elif kind == "shard":
+                shards[message[1]] = [(_load(item), weight) for item, weight in message[2]]
+            elif kind == "weight":
+                # setting weight also sorts label_seq_dict
+                svm.weight = message[2]
+                loss = message[3]
+            elif kind == "task":
+                _, round_id, shard_id, only_loss, method = message
+                func = partial(getattr(svm, method), loss=loss, only_loss=only_loss)
+                if pool is None:
+                    res = list(map(func, shards[shard_id]))
+                else:
+                    res = pool.map(func, shards[shard_id])
+                conn.send(("result", round_id, shard_id, reduce_results(res, only_loss)))
+    finally:
+        if pool is not None:
+            pool.close()
+        conn.close()
+
+
+def main(args):
+    run_worker(parse_address(args.address), args.authkey, processes=args.processes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="worker of distributed gradient computation")
+    parser.add_argument("-a", "--address", required=True, help="host:port of coordinator")
+    parser.add_argument("--authkey", default=os.environ.get(AUTHKEY_ENV), help="secret printed by coordinator. default: ${}".format(AUTHKEY_ENV))
+    parser.add_argument("--processes", type=int, default=1, help="the number of local processes")
+    args = parser.parse_args()
+    if not args.authkey:
+        parser.error("--authkey or {} is required".format(AUTHKEY_ENV))
+
+    main(args)
@@ -0,0 +1,99 @@
+from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
+
+BACKENDS = ["process", "thread", "serial"]
+
+# model of worker process, set by _set_model
+_MODEL = None
+
+
+def _set_model(model):
+    global _MODEL
+    _MODEL = model
+
+
+class ModelMethod:
+    """picklable call of method of model, for map of executor.
+
+    Model is not pickled with tasks. In worker processes of
+    get_executor(model=...), model sent once at start of worker is used.
+
+    Attributes:
+        name : str :
+            name of method.
+
+        kwargs : dict :
+            keyword arguments of method.
+    """
+
+    def __init__(self, model, name, **kwargs):
+        self.model = model
+        self.name = name
+        self.kwargs = kwargs
+
+    def __getstate__(self):
+        return {"name": self.name, "kwargs": self.kwargs}
+
+    def __setstate__(self, state):
+        self.model = None
+        self.name = state["name"]
+        self.kwargs = state["kwargs"]
+
+    def __call__(self, *args):
+        model = _MODEL if self.model is None else self.model
+        return getattr(model, self.name)(*args, **self.kwargs)
+
+
+class SerialExecutor:
+    """executor which runs tasks in calling thread, with same API as Pool.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def map(self, func, iterable):
+        return list(map(func, iterable))
+
+    def imap(self, func, iterable):
+        return map(func, iterable)
+
+    def imap_unordered(self, func, iterable):
+        return map(func, iterable)
+
+    def close(self):
+        pass
+
+    def join(self):
+        pass
+
+
+def get_executor(backend="process", workers=None, model=None):
+    """build executor with map, imap and imap_unordered of Pool.
+
+    "process" pickles (or forks) model into each worker process.
+    "thread" shares model in memory, so it avoids copies of model, but
+    pure Python parts of inference are serialized by GIL.
+
+    Args:
+        backend (str) : one of "process", "thread", "serial".
+        workers (int) : the number of workers. if None, os.cpu_count().
+        model : if given, sent to each worker process once, for
+            ModelMethod mapped with the executor.
+
+    Returns:
+        multiprocessing.Pool, multiprocessing.pool.ThreadPool or SerialExecutor
+    """
+    if backend not in BACKENDS:
+        raise ValueError("backend is wrong. backend should belong to {}".format(BACKENDS))
+
+    if backend == "process":
+        if model is not None:
+            return Pool(workers, initializer=_set_model, initargs=(model,))
+        return Pool(workers)
+    elif backend == "thread":
+        return ThreadPool(workers)
+    else:
+        return SerialExecutor()
@@ -0,0 +1,306 @@
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from tqdm import tqdm
+
+import utils as utils
+from utils import DIVIDER, Triplet
+
+# sentinel for cached lookup which found nothing
+_MISSING = object()
+
+
+class LRUCache:
+    """Small least-recently-used cache, safe to share between threads.
+
+    Attributes:
+        maxsize : int :
+            the number of entries to keep.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.__data = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.__data)
+
+    def get(self, key, default=None):
+        with self.__lock:
+            if key not in self.__data:
+                return default
+            self.__data.move_to_end(key)
+            return self.__data[key]
+
+    def put(self, key, value):
+        with self.__lock:
+            self.__data[key] = value
+            self.__data.move_to_end(key)
+            if len(self.__data) > self.maxsize:
+                self.__data.popitem(last=False)
+
+    def clear(self):
+        with self.__lock:
+            self.__data.clear()
+
+
+class FeatureStore:
+    """sqlite file which keeps feature -> ID map and candidate lists.
+
+    Connection is opened lazily per thread, and is not pickled, so each
+    Pool worker (or thread) opens its own connection instead of holding
+    copy of the map.
+
+    Attributes:
+        path : str :
+            path of sqlite file.
+    """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.__local = threading.local()
+
+    def __getstate__(self):
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        self.path = state["path"]
+        self.__local = threading.local()
+
+    @property
+    def conn(self):
+        conn = getattr(self.__local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path)
+            self.__local.conn = conn
+        return conn
+
+    def create(self):
+        self.conn.executescript(
+            "CREATE TABLE IF NOT EXISTS features (key TEXT PRIMARY KEY, id INTEGER);"
+            "CREATE TABLE IF NOT EXISTS label_seq (context TEXT, id INTEGER, label TEXT);"
+            "CREATE INDEX IF NOT EXISTS label_seq_context ON label_seq (context);"
+            "CREATE TABLE IF NOT EXISTS candidates (name TEXT PRIMARY KEY);"
+        )
+
+    def close(self):
+        """close connection of calling thread.
+        """
+        conn = getattr(self.__local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self.__local.conn = None
+
+
+class SqliteFeatureKeys:
+    """function_keys backed by FeatureStore.
+
+    Attributes:
+        store : FeatureStore :
+            store to look up.
+
+        cache_size : int :
+            the number of lookups kept in memory.
+    """
+
+    def __init__(self, store, cache_size=100000):
+        self.store = store
+        self.cache_size = cache_size
+        self.__cache = LRUCache(cache_size)
+        self.__len = store.conn.execute("SELECT COUNT(*) FROM features").fetchone()[0]
+
+    def __getstate__(self):
+        return {"store": self.store, "cache_size": self.cache_size, "len": self.__len}
+
+    def __setstate__(self, state):
+        self.store = state["store"]
+        self.cache_size = state["cache_size"]
+        self.__len = state["len"]
+        self.__cache = LRUCache(self.cache_size)
+
+    def __len__(self):
+        return self.__len
+
+    def _lookup(self, key):
+        canonical = key.canonical()
+        index = self.__cache.get(canonical, _MISSING)
+        if index is _MISSING:
+            row = self.store.conn.execute(
+                "SELECT id FROM features WHERE key = ?", (canonical,)
+            ).fetchone()
+            index = None if row is None else row[0]
+            self.__cache.put(canonical, index)
+        return index
+
+    def __contains__(self, key):
+        return self._lookup(key) is not None
+
+    def __getitem__(self, key):
+        index = self._lookup(key)
+        if index is None:
+            raise KeyError(key)
+        return index
+
+
+class SqliteLabelSeqDict:
+    """label_seq_dict backed by FeatureStore.
+
+    Lists are sorted with weight when they are read, and sorted lists
+    are kept in memory until weight changes.
+
+    Attributes:
+        store : FeatureStore :
+            store to look up.
+
+        cache_size : int :
+            the number of lists kept in memory.
+    """
+
+    def __init__(self, store, cache_size=100000):
+        self.store = store
+        self.cache_size = cache_size
+        self.__cache = LRUCache(cache_size)
+        self.__weight = None
+        self.__len = store.conn.execute(
+            "SELECT COUNT(DISTINCT context) FROM label_seq"
+        ).fetchone()[0]
+
+    def __getstate__(self):
+        return {
+            "store": self.store,
+            "cache_size": self.cache_size,
+            "weight": self.__weight,
+            "len": self.__len,
+        }
+
+    def __setstate__(self, state):
+        self.store = state["store"]
+        self.cache_size = state["cache_size"]
+        self.__weight = state["weight"]
+        self.__len = state["len"]
+        self.__cache = LRUCache(self.cache_size)
+
+    def __len__(self):
+        return self.__len
+
+    def _lookup(self, context):
+        value = self.__cache.get(context)
+        if value is None:
+            value = self.store.conn.execute(
+                "SELECT id, label FROM label_seq WHERE context = ? ORDER BY rowid",
+                (context,),
+            ).fetchall()
+            if self.__weight is not None:
+                value.sort(key=lambda x: self.__weight[x[0]], reverse=True)
+            self.__cache.put(context, value)
+        return value
+
+    def __contains__(self, context):
+        return len(self._lookup(context)) > 0
+
+    def __getitem__(self, context):
+        value = self._lookup(context)
+        if not value:
+            raise KeyError(context)
+        return value
+
+    def sort_by_weight(self, weight):
+        self.__weight = weight
+        self.__cache.clear()
+
+
+class SqliteCandidates:
+    """candidates backed by FeatureStore.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def __len__(self):
+        return self.store.conn.execute("SELECT COUNT(*) FROM candidates").fetchone()[0]
+
+    def __contains__(self, name):
+        row = self.store.conn.execute(
+            "SELECT 1 FROM candidates WHERE name = ?", (name,)
+        ).fetchone()
+        return row is not None
+
+
+def open_feature_store(db_path, cache_size=100000):
+    """open feature store built by build_feature_store.
+
+    Returns:
+        function_keys, candidates, label_seq_dict
+    """
+    store = FeatureStore(db_path)
+    return (
+        SqliteFeatureKeys(store, cache_size),
+        SqliteCandidates(store),
+        SqliteLabelSeqDict(store, cache_size),
+    )
+
+
+def build_feature_store(input_path, db_path, cache_size=100000, dedup=False):
+    """parse JSON files into on-disk feature store.
+
+    Feature IDs are assigned in order of first appearance like
+    utils.parse_JSON. Features already in the store keep their IDs.
+
+    Args:
+        input_path (str or list) : directory, JSON file or list of JSON files.
+        db_path (str) : path of sqlite file.
+        cache_size (int) : the number of lookups kept in memory.
+        dedup (bool) : same as utils.parse_JSON.
+
+    Returns:
+        function_keys, programs, candidates, label_seq_dict
+            same as utils.parse_JSON.
+    """
+    store = FeatureStore(db_path)
+    store.create()
+    conn = store.conn
+    next_id = conn.execute("SELECT COUNT(*) FROM features").fetchone()[0]
+    collector = utils.ProgramCollector(dedup)
+
+    for file_path in tqdm(utils.list_json_files(input_path)):
+        with open(file_path, "r") as f:
+            program = json.load(f)
+
+        collector.add(file_path, program)
+
+        conn.executemany(
+            "INSERT OR IGNORE INTO candidates VALUES (?)",
+            ((utils.get_varname(val),) for val in program["y_names"]),
+        )
+        for key, obj in program.items():
+            if key == "y_names":
+                continue
+            x = obj["xName"]
+            y = obj["yName"]
+            seq = obj["sequence"]
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO features VALUES (?, ?)",
+                (Triplet(x, seq, y).canonical(), next_id),
+            )
+            if cur.rowcount == 0:
+                continue
+
+            # update label_seq with new feature
+            if obj["type"] == "var-var":
+                t_list = [(x + DIVIDER + seq, y), (y + DIVIDER + seq, x)]
+            else:
+                t_list = [(y + DIVIDER + seq, x)]
+            conn.executemany(
+                "INSERT INTO label_seq VALUES (?, ?, ?)",
+                ((context, next_id, label) for context, label in t_list),
+            )
+            next_id += 1
+    conn.commit()
+    store.close()
+
+    function_keys, candidates, label_seq_dict = open_feature_store(db_path, cache_size)
+    return function_keys, collector.programs(), candidates, label_seq_dict
@@ -0,0 +1,189 @@
+import hashlib
+import json
+import zlib
+
+import numpy as np
+from tqdm import tqdm
+
+import utils as utils
+from utils import DIVIDER, Triplet
+
+
+def stable_hash(text):
+    """hash of string which is same across processes and runs.
+    """
+    return zlib.crc32(text.encode("utf-8"))
+
+
+def fingerprint(text):
+    """second hash of string, independent of stable_hash. never 0.
+    """
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+    return (int.from_bytes(digest, "little") & ((1 << 63) - 1)) or 1
+
+
+class HashedFeatureKeys:
+    """Feature map which hashes Triplet into fixed width.
+
+    Used in place of function_keys dict. Each Triplet is mapped to a
+    slot of weight vector, so memory does not grow with corpus. A slot
+    belongs to the first feature added to it, whose fingerprint is kept,
+    and other features hashed to the slot are not features.
+
+    Attributes:
+        width : int :
+            the number of slots of weight vector.
+
+        fingerprints : np.ndarray :
+            fingerprint of feature of each slot, 0 for empty slot.
+    """
+
+    def __init__(self, width):
+        self.width = width
+        self.fingerprints = np.zeros(width, dtype=np.int64)
+
+    def _slot(self, key):
+        canonical = key.canonical()
+        return stable_hash(canonical) % self.width, fingerprint(canonical)
+
+    def __len__(self):
+        return self.width
+
+    def add(self, key):
+        """add feature.
+
+        Returns:
+            int : slot of key, or None if slot belongs to other feature.
+        """
+        slot, fp = self._slot(key)
+        if self.fingerprints[slot] == 0:
+            self.fingerprints[slot] = fp
+        elif self.fingerprints[slot] != fp:
+            return None
+        return slot
+
+    def __contains__(self, key):
+        slot, fp = self._slot(key)
+        return self.fingerprints[slot] == fp
+
+    def __getitem__(self, key):
+        slot, fp = self._slot(key)
+        if self.fingerprints[slot] != fp:
+            raise KeyError(key)
+        return slot
+
+
+class HashedLabelSeqIndex:
+    """Bounded candidate index used in place of label_seq_dict.
+
+    Contexts ("name区seq") are hashed into fixed number of buckets.
+    Each bucket keeps at most bucket_size (index, label) pairs together
+    with fingerprint of their context, and the least frequent pair is
+    replaced when full (space-saving). Lookup returns only pairs of the
+    same fingerprint, so contexts sharing a bucket are kept apart.
+
+    Attributes:
+        num_buckets : int :
+            the number of buckets.
+
+        bucket_size : int :
+            the number of (index, label) kept in a bucket.
+    """
+
+    def __init__(self, num_buckets, bucket_size):
+        self.num_buckets = num_buckets
+        self.bucket_size = bucket_size
+        # counts of (fingerprint, index, label) for each bucket
+        self.__counts = [None] * num_buckets
+        # (fingerprint, index, label) sorted with weight for each bucket
+        self.__sorted = [None] * num_buckets
+
+    def _bucket(self, context):
+        return stable_hash(context) % self.num_buckets
+
+    def __len__(self):
+        return len({
+            (b, fp) for b, counts in enumerate(self.__counts) if counts for fp, _, _ in counts
+        })
+
+    def __contains__(self, context):
+        counts = self.__counts[self._bucket(context)]
+        if not counts:
+            return False
+        fp = fingerprint(context)
+        return any(entry[0] == fp for entry in counts)
+
+    def __getitem__(self, context):
+        b = self._bucket(context)
+        if self.__sorted[b] is None:
+            counts = self.__counts[b] or {}
+            self.__sorted[b] = sorted(counts, key=counts.get, reverse=True)
+        fp = fingerprint(context)
+        return [(index, label) for entry_fp, index, label in self.__sorted[b] if entry_fp == fp]
+
+    def add(self, context, index, label):
+        b = self._bucket(context)
+        counts = self.__counts[b]
+        if counts is None:
+            counts = self.__counts[b] = {}
+        self.__sorted[b] = None
+
+        entry = (fingerprint(context), index, label)
+        if entry in counts:
+            counts[entry] += 1
+        elif len(counts) < self.bucket_size:
+            counts[entry] = 1
+        else:
+            # replace the least frequent entry
+            victim = min(counts, key=counts.get)
+            counts[entry] = counts.pop(victim) + 1
+
+    def sort_by_weight(self, weight):
+        for b, counts in enumerate(self.__counts):
+            if not counts:
+                continue
+            entries = sorted(counts, key=counts.get, reverse=True)
+            entries.sort(key=lambda x: weight[x[1]], reverse=True)
+            self.__sorted[b] = entries
+
+
+def parse_JSON_hashed(input_path, width, num_buckets=2 ** 18, bucket_size=32, dedup=False):
+    """parse JSON files into hashed features in one streaming pass.
+
+    Args:
+        input_path (str or list) : directory, JSON file or list of JSON files.
+        width (int) : the number of slots of weight vector.
+        num_buckets (int) : the number of buckets of candidate index.
+        bucket_size (int) : the number of candidates kept in a bucket.
+        dedup (bool) : same as utils.parse_JSON.
+
+    Returns:
+        function_keys, programs, candidates, label_seq_dict
+            same as utils.parse_JSON. candidates is empty since it is
+            not used in inference.
+    """
+    function_keys = HashedFeatureKeys(width)
+    label_seq_dict = HashedLabelSeqIndex(num_buckets, bucket_size)
+    collector = utils.ProgramCollector(dedup)
+
+    for file_path in tqdm(utils.list_json_files(input_path)):
+        with open(file_path, "r") as f:
+            program = json.load(f)
+
+        collector.add(file_path, program)
+
+        for key, obj in program.items():
+            if key == "y_names":
+                continue
+            x = obj["xName"]
+            y = obj["yName"]
+            seq = obj["sequence"]
+            index = function_keys.add(Triplet(x, seq, y))
+            if index is None:
+                # slot is taken by other feature
+                continue
+            if obj["type"] == "var-var":
+                label_seq_dict.add(x + DIVIDER + seq, index, y)
+            label_seq_dict.add(y + DIVIDER + seq, index, x)
+
+    return function_keys, collector.programs(), {}, label_seq_dict
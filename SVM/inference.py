@@ -1,37 +1,57 @@
 import argparse
-import copy
-import os
 import sys
-from multiprocessing import Pool
 
-import numpy as np
-import pytest
 from tqdm import tqdm
 
+import instrumentation
 import utils as utils
+from executors import BACKENDS, get_executor
+from inference_cache import InferenceCache, count_correct, infer_with_cache
 from SVM import FeatureFucntion
-from utils import DIVIDER, parse_JSON
+from utils import parse_JSON
 
 
 def main(args):
+    if args.stats_json:
+        instrumentation.enable()
     print("building SVM ...")
     svm = FeatureFucntion.load_pickles(args.pickles_dir)
 
     print("parsing jsons to infer")
     _, programs, _, _ = parse_JSON(args.json_file)
 
+    cache = None
+    if args.cache_dir:
+        cache = InferenceCache(args.cache_dir, max_entries=args.cache_size)
+
+    params = {"init_y": args.init_y}
+    if args.beam_width:
+        params = {"beam_width": args.beam_width}
+
     print("make inference")
-    with Pool() as pool:
-        res = list(tqdm(pool.imap_unordered(svm.inference_only_correct_number, programs), total=len(programs)))
-    val, length = (sum(x) for x in zip(*res))
+    with get_executor(args.backend, args.workers, model=svm) as pool:
+        res = infer_with_cache(svm, tqdm(programs, total=len(programs)), cache=cache, pool=pool, **params)
+    val, length = count_correct(res)
 
     print("correct percentage -> {:.2%}".format(val * 1.0 / length))
+    if cache is not None:
+        print(cache.report())
+        cache.close()
+    if args.stats_json:
+        instrumentation.dump_json(args.stats_json, argv=sys.argv)
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="make inference")
     parser.add_argument("-p", "--pickles", required=True, dest="pickles_dir")
     parser.add_argument("-j", "--json", required=True, dest="json_file")
+    parser.add_argument("--init", choices=["context"], default=None, dest="init_y", help="initial labelling of inference")
+    parser.add_argument("--beam-width", type=int, default=None, dest="beam_width", help="use beam search inference with this width")
+    parser.add_argument("--backend", choices=BACKENDS, default="process", help="executor to infer with")
+    parser.add_argument("--workers", type=int, default=None, help="the number of workers. default: os.cpu_count()")
+    parser.add_argument("--cache-dir", default=None, dest="cache_dir")
+    parser.add_argument("--cache-size", type=int, default=100000, dest="cache_size")
+    parser.add_argument("--stats-json", default=None, dest="stats_json", help="write instrumentation counters and timers into this file")
     args = parser.parse_args()
 
     main(args)
@@ -0,0 +1,238 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from functools import partial
+
+import executors
+import instrumentation
+import utils as utils
+
+CACHE_FILE = "inference_cache.sqlite"
+
+
+def model_fingerprint(svm):
+    """compute fingerprint of trained model.
+
+    Args:
+        svm (FeatureFucntion) : model to fingerprint.
+
+    Returns:
+        str : hex digest of weight and feature keys.
+    """
+    h = hashlib.sha1()
+    h.update(str(len(svm.function_keys)).encode("utf-8"))
+    if isinstance(svm.function_keys, dict):
+        for key, index in svm.function_keys.items():
+            h.update(f"{key}{utils.DIVIDER}{index}".encode("utf-8"))
+    h.update(svm.weight.tobytes())
+    return h.hexdigest()
+
+
+def cache_key(program_hash, fingerprint, params):
+    """build key of cache from program, model and inference parameters.
+    """
+    canonical = json.dumps([program_hash, fingerprint, params], sort_keys=True)
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+
+class InferenceCache:
+    """On-disk cache for infered labels, safe to share between threads.
+
+    Attributes:
+        path : str :
+            path of sqlite file.
+
+        max_entries : int :
+            the number of entries to keep. Least recently used entries are
+            evicted when exceeded.
+
+        hits, misses : int :
+            the number of cache hit/miss in this run.
+    """
+
+    def __init__(self, cache_dir, max_entries=100000):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, CACHE_FILE)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.__lock = threading.Lock()
+        # wait for other processes sharing the cache. connection is
+        # guarded by lock, since Pool reads tasks in its own thread
+        self.__conn = sqlite3.connect(self.path, timeout=60, check_same_thread=False)
+        self.__conn.execute(
+            "CREATE TABLE IF NOT EXISTS results "
+            "(key TEXT PRIMARY KEY, labels TEXT, atime REAL)"
+        )
+        self.__conn.execute(
+            "CREATE INDEX IF NOT EXISTS results_atime ON results (atime)"
+        )
+        self.__conn.commit()
+        self.__size = self.__conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def __len__(self):
+        return self.__size
+
+    def get(self, key):
+        with self.__lock:
+            return self._get(key)
+
+    def _get(self, key):
+        row = self.__conn.execute(
+            "SELECT labels FROM results WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.__conn.execute(
+            "UPDATE results SET atime = ? WHERE key = ?", (time.time(), key)
+        )
+        return json.loads(row[0])
+
+    def put(self, key, labels):
+        with self.__lock:
+            self._put(key, labels)
+
+    def _put(self, key, labels):
+        exists = self.__conn.execute(
+            "SELECT 1 FROM results WHERE key = ?", (key,)
+        ).fetchone()
+        self.__conn.execute(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?)",
+            (key, json.dumps(labels, ensure_ascii=False), time.time()),
+        )
+        if exists is None:
+            self.__size += 1
+        if self.__size > self.max_entries:
+            self._evict(self.__size - self.max_entries)
+
+    def _evict(self, n):
+        self.__conn.execute(
+            "DELETE FROM results WHERE key IN "
+            "(SELECT key FROM results ORDER BY atime ASC LIMIT ?)",
+            (n,),
+        )
+        self.evictions += n
+        self.__size -= n
+
+    def commit(self):
+        with self.__lock:
+            self.__conn.commit()
+
+    def close(self):
+        with self.__lock:
+            self.__conn.commit()
+            self.__conn.close()
+
+    def report(self):
+        total = self.hits + self.misses
+        rate = self.hits * 1.0 / total if total else 0.0
+        return "cache hit -> {}, miss -> {}, hit rate -> {:.2%}, evicted -> {}, entries -> {}".format(
+            self.hits, self.misses, rate, self.evictions, self.__size
+        )
+
+
+def _infer_one(inference, item):
+    key, program = item
+    return key, program["y_names"], inference(program)
+
+
+def infer_with_cache(svm, programs, cache=None, pool=None, beam_width=None, **kwargs):
+    """make inference for programs, checking cache first.
+
+    Programs are streamed: cache-missed ones are fed to pool as they are
+    read, and results are written back to cache as they arrive.
+
+    Args:
+        svm (FeatureFucntion) : model to infer with.
+        programs (iterable of dict) : programs to infer.
+        cache (InferenceCache) : cache to use. if None, every program is infered.
+        pool (multiprocessing.Pool) : pool to infer cache-missed programs with,
+            built with executors.get_executor(model=svm).
+        beam_width (int) : if given, svm.beam_inference is used with this width.
+        kwargs : parameters passed to svm.inference (or svm.beam_inference).
+
+    Returns:
+        list of (y_names, y) : correct labels and infered labels for each program.
+            Order of programs is not kept.
+    """
+    results = []
+    # correct labels of programs sharing each key, to infer duplicates only once
+    pending = {}
+    # programs are read in task thread of pool, and results in this thread
+    lock = threading.Lock()
+    fingerprint = model_fingerprint(svm) if cache is not None else None
+    params = dict(
+        NUM_PATH=kwargs.get("NUM_PATH", svm.NUM_PATH),
+        TOP_CANDIDATES=kwargs.get("TOP_CANDIDATES", svm.TOP_CANDIDATES),
+        loss=getattr(kwargs.get("loss", utils.dummy_loss), "__name__", None),
+        init_y=kwargs.get("init_y"),
+        beam_width=beam_width,
+    )
+
+    def missed():
+        for program in programs:
+            if cache is None:
+                yield None, program
+                continue
+
+            key = cache_key(utils.program_hash(program), fingerprint, params)
+            with lock:
+                if key in pending:
+                    cache.hits += 1
+                    pending[key].append(program["y_names"])
+                    continue
+                y = cache.get(key)
+                if y is not None:
+                    results.append((program["y_names"], y))
+                    continue
+                pending[key] = [program["y_names"]]
+            yield key, program
+
+    # model is not pickled with each program, see executors.ModelMethod
+    if beam_width is None:
+        inference = executors.ModelMethod(svm, "inference", **kwargs)
+    else:
+        inference = executors.ModelMethod(svm, "beam_inference", BEAM_WIDTH=beam_width, **kwargs)
+    infer_one = partial(_infer_one, inference)
+    if pool is None:
+        infered = map(infer_one, missed())
+    else:
+        infered = instrumentation.absorb(pool.imap_unordered(instrumentation.collected(infer_one), missed()))
+
+    for key, y_names, y in infered:
+        with lock:
+            if cache is None:
+                results.append((y_names, y))
+                continue
+            cache.put(key, y)
+            for y_names in pending.pop(key):
+                results.append((y_names, y))
+
+    if cache is not None:
+        cache.commit()
+    return results
+
+
+def count_correct(results):
+    """count correctly infered labels.
+
+    Args:
+        results (list of (y_names, y)) : output of infer_with_cache.
+
+    Returns:
+        (int, int) : the number of correct labels and all labels.
+    """
+    val = 0
+    length = 0
+    for y_names, y in results:
+        for a, b in zip(y_names, y):
+            if a == b:
+                val += 1
+        length += len(y)
+    return val, length
@@ -0,0 +1,158 @@
+import json
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+
+# switched with enable(); instrumented code does nothing while False
+ENABLED = False
+
+_counters = Counter()
+_seconds = defaultdict(float)
+_calls = Counter()
+# counters are updated from threads of ThreadPool too
+_lock = threading.Lock()
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    def __init__(self, name):
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        with _lock:
+            _seconds[self.name] += elapsed
+            _calls[self.name] += 1
+        return False
+
+
+def enable(flag=True):
+    global ENABLED
+    ENABLED = flag
+
+
+def count(name, n=1):
+    if ENABLED:
+        with _lock:
+            _counters[name] += n
+
+
+def timer(name):
+    """context manager adding elapsed time of the block to timer name.
+    """
+    if ENABLED:
+        return _Timer(name)
+    return _NULL_TIMER
+
+
+def reset():
+    _counters.clear()
+    _seconds.clear()
+    _calls.clear()
+
+
+def snapshot():
+    """counters and timers recorded in this process.
+
+    Returns:
+        dict : {"counters": {name: n}, "timers": {name: {"seconds", "calls"}}}
+    """
+    return {
+        "counters": dict(_counters),
+        "timers": {
+            name: {"seconds": _seconds[name], "calls": _calls[name]}
+            for name in _seconds
+        },
+    }
+
+
+def merge(stats):
+    """add snapshot taken in other process to this process.
+    """
+    with _lock:
+        _counters.update(stats["counters"])
+        for name, value in stats["timers"].items():
+            _seconds[name] += value["seconds"]
+            _calls[name] += value["calls"]
+
+
+class _Collected:
+    """wrapper of function run in Pool worker, returning its stats with result.
+    """
+
+    def __init__(self, func):
+        self.func = func
+        self.pid = os.getpid()
+
+    def __call__(self, *args, **kwargs):
+        if os.getpid() == self.pid:
+            # thread or serial executor records into this process directly
+            return self.func(*args, **kwargs), None
+        # worker may be forked before enable(), so switch it on here
+        enable(True)
+        reset()
+        res = self.func(*args, **kwargs)
+        return res, snapshot()
+
+
+def collected(func):
+    """wrap func to be mapped by Pool, so that its stats come back to parent.
+
+    Use with absorb:
+        absorb(pool.imap(collected(func), tasks))
+
+    If instrumentation is disabled, func is returned as it is.
+    """
+    if ENABLED:
+        return _Collected(func)
+    return func
+
+
+def absorb(results):
+    """unwrap results of collected function, merging stats of workers.
+    """
+    if not ENABLED:
+        yield from results
+        return
+    for res, stats in results:
+        if stats is not None:
+            merge(stats)
+        yield res
+
+
+def summary():
+    """snapshot with mean time per call of each timer.
+    """
+    stats = snapshot()
+    for value in stats["timers"].values():
+        value["mean"] = value["seconds"] / value["calls"] if value["calls"] else 0.0
+    return stats
+
+
+def dump_json(path, **extra):
+    """write summary into JSON file.
+
+    Args:
+        path (str) : output path.
+        extra : other values written with summary (e.g. command line).
+    """
+    stats = summary()
+    stats.update(extra)
+    with open(path, "w") as f:
+        json.dump(stats, f, indent=2, sort_keys=True)
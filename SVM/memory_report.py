@@ -0,0 +1,147 @@
+import argparse
+import json
+import os
+import pickle
+
+import numpy as np
+
+import executors
+import utils as utils
+from SVM import FeatureFucntion
+from utils import Triplet, parse_JSON
+
+DISP_UNIT = {0: "bytes", 1: "KB", 2: "MB", 3: "GB"}
+
+
+def _attributes(obj):
+    # walk into user objects (Triplet, hashed or sqlite backends)
+    if hasattr(obj, "__dict__"):
+        return vars(obj).values()
+    return ()
+
+
+def _array_base(array):
+    # view does not own its data, so count array it refers to
+    if array.base is not None:
+        return (array.base,)
+    return ()
+
+
+HANDLERS = {np.ndarray: _array_base, object: _attributes}
+
+
+def object_size(obj):
+    return utils.compute_object_size(obj, HANDLERS)
+
+
+def component_sizes(svm, program=None):
+    """bytes of each structure of model.
+
+    Each structure is measured alone, so objects shared between them
+    (e.g. label strings) are counted in each of them.
+
+    Args:
+        svm (FeatureFucntion) : model.
+        program (dict) : sample program.
+
+    Returns:
+        dict : name -> bytes.
+    """
+    sizes = {}
+    sizes["function_keys"] = object_size(svm.function_keys)
+    if isinstance(svm.function_keys, dict):
+        triplets = [key for key in svm.function_keys if isinstance(key, Triplet)]
+        sizes["triplets"] = object_size(triplets) - object_size([None] * len(triplets))
+    sizes["label_seq_dict"] = object_size(svm.label_seq_dict)
+    sizes["candidates"] = object_size(svm.candidates)
+    sizes["weight"] = object_size(svm.weight)
+    if program is not None:
+        sizes["sample_program"] = object_size(program)
+    sizes["model"] = object_size(svm)
+    return sizes
+
+
+def duplication_estimate(svm, processes, program=None):
+    """estimate memory used by model copies in Pool workers.
+
+    subgrad, subgrad_minibatch and infer_with_cache build their pools
+    with get_executor(model=svm), so the model is pickled once for each
+    worker by Pool initializer, and tasks carry only
+    executors.ModelMethod and a program. Every worker still holds its
+    own unpickled copy besides the one in parent.
+
+    Args:
+        svm (FeatureFucntion) : model.
+        processes (int) : the number of Pool workers.
+        program (dict) : sample program of task.
+
+    Returns:
+        dict : initializer_bytes (sent once to each worker), task_bytes
+            (sent with each task, without program if not given),
+            per_worker_bytes and total_bytes (parent and all workers).
+    """
+    model_bytes = object_size(svm)
+    pickled = pickle.dumps(svm, protocol=pickle.HIGHEST_PROTOCOL)
+    per_worker = object_size(pickle.loads(pickled))
+    task = executors.ModelMethod(svm, "weighted_star_mmsc", loss=utils.naive_loss)
+    if program is not None:
+        task = (task, (program, 1))
+    return {
+        "processes": processes,
+        "initializer_bytes": len(pickled),
+        "task_bytes": len(pickle.dumps(task, protocol=pickle.HIGHEST_PROTOCOL)),
+        "per_worker_bytes": per_worker,
+        "total_bytes": model_bytes + processes * per_worker,
+    }
+
+
+def format_size(size, unit):
+    return "{:.3f} {}".format(size / 1024 ** unit, DISP_UNIT[unit])
+
+
+def main(args):
+    if args.pickles_dir:
+        print("loading SVM ...")
+        svm = FeatureFucntion.load_pickles(args.pickles_dir)
+        programs = None
+    else:
+        print("parsing JSON files ...")
+        function_keys, programs, candidates, label_seq_dict = parse_JSON(args.json_files)
+        svm = FeatureFucntion(function_keys, candidates, label_seq_dict)
+
+    program = None
+    if args.sample:
+        _, samples, _, _ = parse_JSON(args.sample)
+        program = next(iter(samples))
+    elif programs is not None:
+        program = next(iter(programs))
+
+    processes = args.processes or os.cpu_count()
+    report = {
+        "num_features": len(svm.function_keys),
+        "components": component_sizes(svm, program),
+        "duplication": duplication_estimate(svm, processes, program),
+    }
+
+    for name, size in report["components"].items():
+        print("{:<20}{}".format(name, format_size(size, args.unit)))
+    for name in ("initializer_bytes", "task_bytes", "per_worker_bytes", "total_bytes"):
+        print("{:<20}{}".format(name, format_size(report["duplication"][name], args.unit)))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="report memory used by model structures")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("-p", "--pickles", dest="pickles_dir", help="directory of trained model")
+    group.add_argument("-j", "--json", dest="json_files", help="corpus to build model from")
+    parser.add_argument("-s", "--sample", default=None, help="JSON file of sample program")
+    parser.add_argument("--processes", type=int, default=None, help="the number of Pool workers. default: os.cpu_count()")
+    parser.add_argument("--unit", type=int, choices=[0, 1, 2, 3], default=1, help="0: bytes, 1: KB, 2: MB, 3: GB")
+    parser.add_argument("-o", "--output", default=None, help="write report into this JSON file")
+    args = parser.parse_args()
+
+    main(args)
@@ -0,0 +1,179 @@
+import numpy as np
+
+import utils as utils
+
+
+class StepSequence:
+    """Projected subgradient step with learning rate from a generator.
+
+    Learning rate advances only when advance is called, e.g. when
+    subgrad finds no improvement.
+
+    Attributes:
+        stepsize_sequence : generator :
+            generator of learning rate (utils.simple_sequence etc.).
+
+        averaging : bool :
+            if True, keep Polyak average of iterates in average.
+    """
+
+    def __init__(self, stepsize_sequence, averaging=False):
+        self.stepsize_sequence = stepsize_sequence
+        self.averaging = averaging
+        self.learning_rate = None
+        self.average = None
+        self.num_steps = 0
+        # the number of values taken from stepsize_sequence
+        self.num_draws = 0
+        self.lower = None
+        self.upper = None
+
+    def reset(self, weight, lower, upper):
+        """start optimization from weight, projected into [lower, upper].
+        """
+        self.lower = lower
+        self.upper = upper
+        self.num_steps = 0
+        self.average = weight.copy()
+        self.advance()
+
+    def advance(self):
+        self.learning_rate = next(self.stepsize_sequence)
+        self.num_draws += 1
+
+    def state_dict(self):
+        """state to resume optimization. generator itself is not included.
+        """
+        return {
+            "learning_rate": self.learning_rate,
+            "num_draws": self.num_draws,
+            "num_steps": self.num_steps,
+            "average": self.average,
+            "lower": self.lower,
+            "upper": self.upper,
+        }
+
+    def load_state_dict(self, state):
+        """restore state. stepsize_sequence is advanced to the saved position,
+        so a fresh generator must be given to constructor.
+        """
+        while self.num_draws < state["num_draws"]:
+            self.advance()
+        self.learning_rate = state["learning_rate"]
+        self.num_steps = state["num_steps"]
+        self.average = state["average"]
+        self.lower = state["lower"]
+        self.upper = state["upper"]
+
+    def _direction(self, grad):
+        return self.learning_rate * grad
+
+    def step(self, weight, grad):
+        """return new weight moved against grad and projected.
+        """
+        new_weight = utils.projection(weight - self._direction(grad), self.lower, self.upper)
+        self.num_steps += 1
+        if self.averaging:
+            self.average += (new_weight - self.average) / (self.num_steps + 1)
+        return new_weight
+
+    def result(self, weight):
+        """weight to use after optimization.
+        """
+        if self.averaging:
+            return self.average
+        return weight
+
+
+class Momentum(StepSequence):
+    """Projected subgradient step with heavy-ball momentum.
+
+    Attributes:
+        mu : float :
+            decay of velocity.
+    """
+
+    def __init__(self, stepsize_sequence, mu=0.9, averaging=False):
+        super().__init__(stepsize_sequence, averaging=averaging)
+        self.mu = mu
+        self.velocity = None
+
+    def reset(self, weight, lower, upper):
+        super().reset(weight, lower, upper)
+        self.velocity = np.zeros_like(weight)
+
+    def state_dict(self):
+        state = super().state_dict()
+        state["velocity"] = self.velocity
+        return state
+
+    def load_state_dict(self, state):
+        super().load_state_dict(state)
+        self.velocity = state["velocity"]
+
+    def _direction(self, grad):
+        self.velocity = self.mu * self.velocity + self.learning_rate * grad
+        return self.velocity
+
+
+class AdaGrad(StepSequence):
+    """Projected subgradient step with per-feature learning rate.
+
+    Learning rate of each feature is eta / sqrt(sum of squared gradient),
+    so rarely seen features keep large steps.
+
+    Attributes:
+        eta : float :
+            base learning rate.
+
+        eps : float :
+            small value to avoid division by zero.
+    """
+
+    def __init__(self, eta=0.1, eps=1e-8, averaging=False):
+        super().__init__(None, averaging=averaging)
+        self.eta = eta
+        self.eps = eps
+        self.sum_squared = None
+
+    def reset(self, weight, lower, upper):
+        super().reset(weight, lower, upper)
+        self.sum_squared = np.zeros_like(weight)
+
+    def advance(self):
+        self.learning_rate = self.eta
+        self.num_draws += 1
+
+    def state_dict(self):
+        state = super().state_dict()
+        state["sum_squared"] = self.sum_squared
+        return state
+
+    def load_state_dict(self, state):
+        super().load_state_dict(state)
+        self.sum_squared = state["sum_squared"]
+
+    def _direction(self, grad):
+        self.sum_squared += grad * grad
+        return self.eta * grad / (np.sqrt(self.sum_squared) + self.eps)
+
+
+def get_optimizer(name, stepsize_sequence, averaging=False):
+    """build optimizer from name.
+
+    Args:
+        name (str) : one of "step", "momentum", "adagrad".
+        stepsize_sequence (generator) : generator of learning rate.
+            For "adagrad", its first value is used as eta.
+        averaging (bool) : if True, use Polyak average of iterates.
+    """
+    optimizer_list = ["step", "momentum", "adagrad"]
+    if name not in optimizer_list:
+        raise ValueError("optimizer is wrong. optimizer should belong to {}".format(optimizer_list))
+
+    if name == "step":
+        return StepSequence(stepsize_sequence, averaging=averaging)
+    elif name == "momentum":
+        return Momentum(stepsize_sequence, averaging=averaging)
+    else:
+        return AdaGrad(next(stepsize_sequence), averaging=averaging)
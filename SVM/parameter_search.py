@@ -1,81 +1,35 @@
 import argparse
-import os
-from multiprocessing import Pool
 
 import numpy as np
-from sklearn.model_selection import KFold
-from tqdm import tqdm
 
-import utils
-from SVM import FeatureFucntion
-from utils import parse_JSON
-
-
-def get_stepsize_sequence(seq_type, value):
-    seq_type_list = ["simple", "sqrt"]
-    if seq_type not in seq_type_list:
-        raise ValueError("seq_type is wrong. seq_type should belong to {}".format(seq_type_list))
-
-    if seq_type == "simple":
-        return utils.simple_sequence(value)
-    elif seq_type == "sqrt":
-        return utils.sqrt_sequence(value)
-    else:
-        raise Exception("Something went wrong")
+from cross_validation import Corpus, config_key, cross_validate, summarize, write_table
 
 
 def main(args):
-    json_files = [
-        os.path.join(args.json_files, x)
-        for x in os.listdir(args.json_files)
-        if not x.startswith(".") and x[-5:] == ".json"
-    ]
-    json_files = np.array(json_files)
-    kf = KFold(n_splits=10)
+    print("parsing JSON files ...")
+    corpus = Corpus(args.json_files)
 
     # experiment for parameter.
-    para_map = {}
-    for GUNMA in np.arange(0.1, 1.0, 0.1):
-        print("GUNMA is {}".format(GUNMA))
-        val = 0
-        length = 0
-        for i, v in enumerate(kf.split(json_files)):
-            if args.s and i > 0:
-                break
-            # step_seq = utils.simple_sequence(GUNMA)
-            print(f"using {args.sequence} sequence")
-            step_seq = get_stepsize_sequence(args.sequence, GUNMA)
-            train = v[0]
-            test = v[1]
-            print("start {} fold".format(i))
-            train_datas = list(json_files[train])
-            function_keys, programs, candidates, label_seq_dict = parse_JSON(train_datas)
-
-            svm = FeatureFucntion(function_keys, candidates, label_seq_dict)
-
-            svm.subgrad(
-                programs,
-                step_seq,
-                # utils.simple_sequence(0.03),
-                utils.naive_loss,
-                iterations=30,
-                BETA=0.5,
-            )
-
-            test_datas = list(json_files[test])
-            _, test_programs, _, _ = parse_JSON(test_datas)
-            with Pool() as pool:
-                res = pool.map(svm.inference_only_correct_number, test_programs)
-
-            tmp_val, tmp_length = (sum(x) for x in zip(*res))
-            if i == 0:
-                print("svm.weight -> {}".format(svm.weight[:40]))
-            val += tmp_val
-            length += tmp_length
-
-        correct_per = val * 1.0 / length
-        print("score -> {}".format(correct_per))
-        para_map[str(GUNMA)] = correct_per
+    print(f"using {args.sequence} sequence")
+    configs = [
+        {"sequence": args.sequence, "step": float(GUNMA), "BETA": 0.5}
+        for GUNMA in np.arange(0.1, 1.0, 0.1)
+    ]
+    rows = cross_validate(
+        corpus,
+        configs,
+        iterations=30,
+        max_folds=1 if args.s else None,
+        max_workers=args.jobs,
+        processes=args.processes,
+        cache_dir=args.cache_dir,
+        cache_size=args.cache_size,
+    )
+    if args.table:
+        write_table(rows, args.table)
+
+    scores = summarize(rows)
+    para_map = {str(config["step"]): scores[config_key(config)] for config in configs}
     print("The Best  GUNMA -> {}".format(max(para_map, key=para_map.get)))
     print(para_map)
 
@@ -85,7 +39,11 @@ if __name__ == "__main__":
     parser.add_argument("-j", "--json", required=True, dest="json_files")
     parser.add_argument("-s", action="store_true")
     parser.add_argument("--sequence", choices=["simple", "sqrt"], required=True)
-    # parser.add_argument("-p", "--pickles", required=False, dest="pickles_dir")
+    parser.add_argument("--jobs", type=int, default=1, help="the number of fold x parameter jobs run at once")
+    parser.add_argument("--processes", type=int, default=1, help="the number of worker processes of each job")
+    parser.add_argument("--table", default=None, help="write result of every job into this csv file")
+    parser.add_argument("--cache-dir", default=None, dest="cache_dir")
+    parser.add_argument("--cache-size", type=int, default=100000, dest="cache_size")
     args = parser.parse_args()
 
     main(args)
@@ -0,0 +1,87 @@
+import argparse
+import json
+import sys
+import time
+
+# numpy, scipy and the model are imported in main, after arguments are
+# parsed, so that --help and errors of arguments are quick.
+
+
+def load_model(pickles_dir):
+    """load model saved by FeatureFucntion.save_mapped, or svm.pickle if there is none.
+    """
+    from SVM import FeatureFucntion
+
+    if FeatureFucntion.has_mapped(pickles_dir):
+        return FeatureFucntion.load_mapped(pickles_dir)
+    return FeatureFucntion.load_pickles(pickles_dir)
+
+
+def predict(svm, paths, init_y=None):
+    """infer labels of JSON files one by one.
+
+    Yields:
+        (str, list) : path and inferred labels aligned with y_names.
+    """
+    for path in paths:
+        with open(path, "r") as f:
+            program = json.load(f)
+        yield path, svm.inference(program, init_y=init_y)
+
+
+def convert(pickles_dir):
+    from SVM import FeatureFucntion
+
+    svm = FeatureFucntion.load_pickles(pickles_dir)
+    svm.save_mapped(pickles_dir)
+
+
+def main(args):
+    start = time.perf_counter()
+    if args.convert:
+        convert(args.pickles_dir)
+        print("saved mapped model in {}".format(args.pickles_dir), file=sys.stderr)
+        return
+
+    import utils as utils
+
+    svm = load_model(args.pickles_dir)
+    loaded = time.perf_counter()
+
+    out = open(args.output, "w") if args.output else sys.stdout
+    first = None
+    num_programs = 0
+    try:
+        for path, y in predict(svm, utils.list_json_files(args.json_file), init_y=args.init_y):
+            out.write(json.dumps({"path": path, "y": y}, ensure_ascii=False) + "\n")
+            out.flush()
+            num_programs += 1
+            if first is None:
+                first = time.perf_counter()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    end = time.perf_counter()
+    if args.timing and first is not None:
+        print(
+            "load {:.3f}s, first result {:.3f}s, {} programs in {:.3f}s".format(
+                loaded - start, first - start, num_programs, end - start
+            ),
+            file=sys.stderr,
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="infer labels of programs with little start-up time")
+    parser.add_argument("-p", "--pickles", required=True, dest="pickles_dir")
+    parser.add_argument("-j", "--json", default=None, dest="json_file", help="JSON file or directory of them")
+    parser.add_argument("--init", choices=["context"], default=None, dest="init_y", help="initial labelling of inference")
+    parser.add_argument("-o", "--output", default=None, help="write JSON lines into this file instead of stdout")
+    parser.add_argument("--convert", action="store_true", help="save svm.pickle of -p as mapped model and exit")
+    parser.add_argument("--timing", action="store_true", help="report load time and time to first result on stderr")
+    args = parser.parse_args()
+    if not args.convert and args.json_file is None:
+        parser.error("-j is required unless --convert is given")
+
+    main(args)
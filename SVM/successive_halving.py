@@ -0,0 +1,132 @@
+import argparse
+
+from cross_validation import Corpus, config_key, make_folds, run_jobs, summarize, write_table
+
+
+def successive_halving(corpus, configs, *, min_iterations=3, max_iterations=30, min_folds=1, max_folds=10, eta=3, n_splits=10, max_workers=1, processes=1, warm_start=True):
+    """search best config by successive halving.
+
+    Every config is trained with few iterations on few folds first, and
+    only top 1/eta of them are promoted to next rung, which has eta times
+    more iterations and folds.
+
+    Args:
+        corpus (cross_validation.Corpus) : corpus to search on.
+        configs (list of dict) : configs for cross_validation.run_job.
+        min_iterations, max_iterations (int) : iterations of first and last rung.
+        min_folds, max_folds (int) : the number of folds of first and last rung.
+        eta (int) : ratio of promotion.
+        warm_start (bool) : if True, promoted config continues from
+            its weight of previous rung on the same fold, and from its
+            position in step sequence, so that learning rate does not
+            restart from first one.
+
+    Returns:
+        dict : best config.
+        list of dict : rows of result table.
+    """
+    folds = make_folds(corpus, n_splits)
+    max_folds = min(max_folds, len(folds))
+    survivors = list(configs)
+    # (config key, fold) -> row of last rung, which has weight
+    trained = {}
+    all_rows = []
+    rung = 0
+
+    while True:
+        iterations = min(max_iterations, min_iterations * eta ** rung)
+        num_folds = min(max_folds, min_folds * eta ** rung)
+        print(f"rung {rung}: {len(survivors)} configs, {iterations} iterations, {num_folds} folds")
+
+        jobs = []
+        rows = []
+        for config in survivors:
+            for fold in range(num_folds):
+                parent = trained.get((config_key(config), fold)) if warm_start else None
+                if parent is not None and parent["iterations"] >= iterations:
+                    # already trained enough on this fold
+                    rows.append(dict(parent, rung=rung))
+                    continue
+
+                train, test = folds[fold]
+                jobs.append({
+                    "config": config,
+                    "fold": fold,
+                    "train": train,
+                    "test": test,
+                    "iterations": iterations - parent["iterations"] if parent else iterations,
+                    "processes": processes,
+                    "init_weight": parent["weight"] if parent else None,
+                    "num_draws": parent["num_draws"] if parent else 1,
+                })
+
+        for row in run_jobs(corpus, jobs, max_workers=max_workers):
+            parent = trained.get((row["config"], row["fold"])) if warm_start else None
+            if parent is not None:
+                row["iterations"] += parent["iterations"]
+            row["rung"] = rung
+            rows.append(row)
+
+        trained = {(row["config"], row["fold"]): row for row in rows}
+        all_rows.extend(rows)
+
+        scores = summarize(rows)
+        survivors.sort(key=lambda x: scores[config_key(x)], reverse=True)
+        for config in survivors:
+            print("{} -> {}".format(config_key(config), scores[config_key(config)]))
+
+        if len(survivors) == 1 or (iterations == max_iterations and num_folds == max_folds):
+            break
+        survivors = survivors[:max(1, len(survivors) // eta)]
+        rung += 1
+
+    return survivors[0], all_rows
+
+
+def main(args):
+    print("parsing JSON files ...")
+    corpus = Corpus(args.json_files)
+
+    configs = []
+    for value in args.values:
+        config = {"sequence": args.sequence, "step": args.step, "BETA": 0.5}
+        config[args.param] = value
+        configs.append(config)
+
+    best, rows = successive_halving(
+        corpus,
+        configs,
+        min_iterations=args.min_iterations,
+        max_iterations=args.max_iterations,
+        min_folds=args.min_folds,
+        max_folds=1 if args.s else args.max_folds,
+        eta=args.eta,
+        max_workers=args.jobs,
+        processes=args.processes,
+        warm_start=not args.no_warm_start,
+    )
+    if args.table:
+        write_table(rows, args.table)
+    print("The Best  {} -> {}".format(args.param, best[args.param]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="search parameter by successive halving")
+    parser.add_argument("-j", "--json", required=True, dest="json_files")
+    parser.add_argument("-s", action="store_true")
+    parser.add_argument("--param", choices=["step", "init_weight_proportion"], default="step")
+    parser.add_argument("--values", type=float, nargs="+", default=[0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9])
+    parser.add_argument("--sequence", choices=["simple", "sqrt"], default="sqrt")
+    parser.add_argument("--step", type=float, default=0.1, help="step size when --param is not step")
+    parser.add_argument("--eta", type=int, default=3)
+    parser.add_argument("--min-iterations", type=int, default=3, dest="min_iterations")
+    parser.add_argument("--max-iterations", type=int, default=30, dest="max_iterations")
+    parser.add_argument("--min-folds", type=int, default=1, dest="min_folds")
+    parser.add_argument("--max-folds", type=int, default=10, dest="max_folds")
+    parser.add_argument("--no-warm-start", action="store_true", dest="no_warm_start")
+    parser.add_argument("--jobs", type=int, default=1, help="the number of fold x parameter jobs run at once")
+    parser.add_argument("--processes", type=int, default=None, help="the number of worker processes of each job")
+    parser.add_argument("--table", default=None, help="write result of every job into this csv file")
+    args = parser.parse_args()
+
+    main(args)
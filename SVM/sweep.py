@@ -0,0 +1,148 @@
+import argparse
+import itertools
+import json
+import time
+
+import numpy as np
+
+import instrumentation
+from SVM import FeatureFucntion
+from utils import parse_JSON
+
+# counters of instrumentation which count evaluated candidates
+CANDIDATE_COUNTERS = ["inference.candidates_evaluated", "beam_inference.candidates_evaluated"]
+
+
+def make_configs(num_paths, top_candidates, inits=(None,), beam_widths=()):
+    """grid of inference configs.
+
+    Returns:
+        list of dict : greedy configs (NUM_PATH x TOP_CANDIDATES x init_y)
+            followed by beam configs (BEAM_WIDTH x TOP_CANDIDATES).
+    """
+    configs = []
+    for num_path, top, init_y in itertools.product(num_paths, top_candidates, inits):
+        configs.append({"method": "greedy", "NUM_PATH": num_path, "TOP_CANDIDATES": top, "init_y": init_y})
+    for width, top in itertools.product(beam_widths, top_candidates):
+        configs.append({"method": "beam", "BEAM_WIDTH": width, "TOP_CANDIDATES": top})
+    return configs
+
+
+def inference_function(svm, config):
+    params = {key: value for key, value in config.items() if key != "method"}
+    if config["method"] == "beam":
+        return lambda x: svm.beam_inference(x, **params)
+    return lambda x: svm.inference(x, **params)
+
+
+def evaluate_config(svm, programs, config):
+    """accuracy, latency and candidates evaluated of one config.
+
+    Programs are infered one by one in this process, so latency is not
+    disturbed by other work. Latency is timed with instrumentation
+    disabled, and candidates are counted in a second, untimed pass.
+
+    Returns:
+        dict : config with accuracy, mean_latency, p95_latency (sec/program)
+            and candidates_per_program.
+    """
+    infer = inference_function(svm, config)
+    was_enabled = instrumentation.ENABLED
+    instrumentation.enable(False)
+    val = 0
+    length = 0
+    latencies = []
+    for program in programs:
+        start = time.perf_counter()
+        y = infer(program)
+        latencies.append(time.perf_counter() - start)
+        for a, b in zip(program["y_names"], y):
+            if a == b:
+                val += 1
+        length += len(y)
+
+    # counters of caller are put back after counting
+    saved = instrumentation.snapshot()
+    instrumentation.enable()
+    instrumentation.reset()
+    for program in programs:
+        infer(program)
+    counters = instrumentation.snapshot()["counters"]
+    instrumentation.reset()
+    instrumentation.merge(saved)
+    instrumentation.enable(was_enabled)
+    candidates = sum(counters.get(name, 0) for name in CANDIDATE_COUNTERS)
+
+    return dict(
+        config,
+        accuracy=val * 1.0 / length if length else 0.0,
+        mean_latency=float(np.mean(latencies)),
+        p95_latency=float(np.percentile(latencies, 95)),
+        candidates_per_program=candidates * 1.0 / len(programs),
+    )
+
+
+def pareto_frontier(rows, latency="mean_latency"):
+    """rows not dominated by others in (higher accuracy, lower latency).
+
+    Returns:
+        list of dict : frontier sorted by latency.
+    """
+    frontier = []
+    best_accuracy = -1.0
+    for row in sorted(rows, key=lambda r: (r[latency], -r["accuracy"])):
+        if row["accuracy"] > best_accuracy:
+            frontier.append(row)
+            best_accuracy = row["accuracy"]
+    return frontier
+
+
+def sweep(svm, programs, configs):
+    return [evaluate_config(svm, programs, config) for config in configs]
+
+
+def format_config(row):
+    keys = ["NUM_PATH", "BEAM_WIDTH", "TOP_CANDIDATES", "init_y"]
+    return " ".join("{}={}".format(key, row[key]) for key in keys if key in row)
+
+
+def main(args):
+    print("building SVM ...")
+    svm = FeatureFucntion.load_pickles(args.pickles_dir)
+
+    print("parsing jsons to infer")
+    _, programs, _, _ = parse_JSON(args.json_file)
+    programs = list(programs)[:args.limit]
+
+    inits = [None if init == "none" else init for init in args.inits]
+    configs = make_configs(args.num_paths, args.top_candidates, inits, args.beam_widths)
+    rows = sweep(svm, programs, configs)
+    frontier = pareto_frontier(rows, args.latency)
+
+    print("{:<8}{:<48}{:>10}{:>12}{:>12}{:>12}".format("method", "config", "accuracy", "mean sec", "p95 sec", "candidates"))
+    for row in rows:
+        mark = "*" if row in frontier else " "
+        print("{:<8}{:<48}{:>10.2%}{:>12.4f}{:>12.4f}{:>12.1f} {}".format(
+            row["method"], format_config(row), row["accuracy"], row["mean_latency"],
+            row["p95_latency"], row["candidates_per_program"], mark,
+        ))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"rows": rows, "frontier": frontier}, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="sweep inference parameters for accuracy and latency")
+    parser.add_argument("-p", "--pickles", required=True, dest="pickles_dir")
+    parser.add_argument("-j", "--json", required=True, dest="json_file", help="held-out programs")
+    parser.add_argument("--num-paths", type=int, nargs="+", default=[1, 5, 10, 20], dest="num_paths")
+    parser.add_argument("--top-candidates", type=int, nargs="+", default=[4, 8, 16, 32], dest="top_candidates")
+    parser.add_argument("--inits", nargs="+", choices=["none", "context"], default=["none"], help="initial labelling of greedy inference")
+    parser.add_argument("--beam-widths", type=int, nargs="*", default=[], dest="beam_widths")
+    parser.add_argument("--latency", choices=["mean_latency", "p95_latency"], default="mean_latency", help="latency of Pareto frontier")
+    parser.add_argument("--limit", type=int, default=None, help="the number of programs to use")
+    parser.add_argument("-o", "--output", default=None, help="write rows and frontier into this json file")
+    args = parser.parse_args()
+
+    main(args)
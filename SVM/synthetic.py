@@ -0,0 +1,142 @@
+import argparse
+import json
+import os
+import random
+from itertools import accumulate
+
+from utils import DIVIDER
+
+SEQUENCES = ["((", "!", "$", ".2$", ",%!", "&&", "((||", "!((", "$$.", ".1("]
+LITERALS = ["length", "push", "then", "0", "1", "true", "null", "prototype"]
+
+
+def make_vocabulary(size):
+    """variable names name0, name1, ...
+    """
+    return ["name{}".format(i) for i in range(size)]
+
+
+def generate_program(rng, num_vars=12, num_scopes=3, degree=3, vocabulary=None, literals=LITERALS, sequences=SEQUENCES, var_lit_ratio=0.3, signal=0.8):
+    """generate one program in the format of parse_JSON.
+
+    Names are drawn from vocabulary with skew toward its head, like real
+    identifiers. With probability signal, sequence of an edge is decided
+    by names of its ends, so that a model can learn from the corpus.
+
+    Args:
+        rng (random.Random) : random generator.
+        num_vars (int) : the number of variables.
+        num_scopes (int) : scope ids are 1 .. num_scopes.
+        degree (int) : the average number of edges per variable.
+        vocabulary (list of str) : variable names. needs at least
+            ceil(num_vars / num_scopes) names. default: make_vocabulary(4 * num_vars).
+        literals (list of str) : names of literals of var-lit edges.
+        sequences (list of str) : sequences of edges.
+        var_lit_ratio (float) : ratio of var-lit edges.
+        signal (float) : probability that sequence is decided by names.
+
+    Returns:
+        dict : {"y_names": [...], "0": edge, "1": edge, ...}
+    """
+    if vocabulary is None:
+        vocabulary = make_vocabulary(4 * num_vars)
+    if num_scopes * len(vocabulary) < num_vars:
+        raise ValueError("vocabulary is too small for {} variables in {} scopes".format(num_vars, num_scopes))
+    index_of = {name: i for i, name in enumerate(vocabulary)}
+    # rank-based weight, so that names near head are common
+    cum_weights = list(accumulate(1.0 / (i + 1) for i in range(len(vocabulary))))
+
+    variables = []
+    used = set()
+    while len(variables) < num_vars:
+        scope_id = rng.randint(1, num_scopes)
+        name = rng.choices(vocabulary, cum_weights=cum_weights)[0]
+        if (scope_id, name) in used:
+            continue
+        used.add((scope_id, name))
+        variables.append((scope_id, name))
+
+    def sequence_of(*names):
+        if rng.random() < signal:
+            return sequences[sum(index_of.get(n, len(n)) for n in names) % len(sequences)]
+        return rng.choice(sequences)
+
+    program = {"y_names": [str(scope_id) + DIVIDER + name for scope_id, name in variables]}
+    for k in range(num_vars * degree):
+        x_scope, x_name = variables[rng.randrange(num_vars)]
+        if num_vars < 2 or rng.random() < var_lit_ratio:
+            literal = rng.choice(literals)
+            program[str(k)] = {
+                "type": "var-lit",
+                "xName": x_name,
+                "xScopeId": x_scope,
+                "yName": literal,
+                "sequence": sequence_of(x_name, literal),
+            }
+        else:
+            y_scope, y_name = variables[rng.randrange(num_vars)]
+            while (y_scope, y_name) == (x_scope, x_name):
+                y_scope, y_name = variables[rng.randrange(num_vars)]
+            program[str(k)] = {
+                "type": "var-var",
+                "xName": x_name,
+                "xScopeId": x_scope,
+                "yName": y_name,
+                "yScopeId": y_scope,
+                "sequence": sequence_of(x_name, y_name),
+            }
+    return program
+
+
+def generate_corpus(output_dir, num_programs, seed=0, **kwargs):
+    """write num_programs synthetic programs into output_dir as 0.json, 1.json, ...
+
+    Args:
+        output_dir (str) : directory to write in.
+        num_programs (int) : the number of programs.
+        seed (int) : seed of random generator.
+        kwargs : parameters of generate_program.
+
+    Returns:
+        list of str : paths of written files.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    rng = random.Random(seed)
+    paths = []
+    for i in range(num_programs):
+        path = os.path.join(output_dir, "{}.json".format(i))
+        with open(path, "w") as f:
+            json.dump(generate_program(rng, **kwargs), f, ensure_ascii=False)
+        paths.append(path)
+    return paths
+
+
+def main(args):
+    vocabulary = make_vocabulary(args.vocabulary) if args.vocabulary else None
+    generate_corpus(
+        args.output_dir,
+        args.num_programs,
+        seed=args.seed,
+        num_vars=args.num_vars,
+        num_scopes=args.num_scopes,
+        degree=args.degree,
+        vocabulary=vocabulary,
+        var_lit_ratio=args.var_lit_ratio,
+        signal=args.signal,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="generate synthetic programs")
+    parser.add_argument("-o", "--output", required=True, dest="output_dir")
+    parser.add_argument("-n", "--num-programs", type=int, default=100, dest="num_programs")
+    parser.add_argument("--num-vars", type=int, default=12, dest="num_vars")
+    parser.add_argument("--num-scopes", type=int, default=3, dest="num_scopes")
+    parser.add_argument("--degree", type=int, default=3)
+    parser.add_argument("--vocabulary", type=int, default=None, help="the number of variable names")
+    parser.add_argument("--var-lit-ratio", type=float, default=0.3, dest="var_lit_ratio")
+    parser.add_argument("--signal", type=float, default=0.8)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    main(args)
@@ -0,0 +1,64 @@
+import itertools
+import json
+import pickle
+import resource
+import time
+
+
+def peak_rss():
+    """peak resident set size in KB of this process and of its finished children.
+
+    Returns:
+        (int, int) : (self, children). ru_maxrss is KB on Linux.
+    """
+    return (
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+
+
+def pickled_size(obj):
+    """the number of bytes obj takes when sent to Pool worker.
+    """
+    return len(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def sampled_size(items, n, sample=16):
+    """estimate of total pickled size of n items from first sample of them.
+
+    Only the sample is consumed, so items can be a lazy iterator.
+    """
+    sizes = [pickled_size(item) for item in itertools.islice(items, sample)]
+    if not sizes:
+        return 0
+    return int(sum(sizes) / len(sizes) * n)
+
+
+class Telemetry:
+    """JSON lines writer of per-iteration training records.
+
+    Each record is written and flushed at once, so that the file can be
+    followed while training runs.
+
+    Attributes:
+        path : str :
+            output path. Records are appended.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.__file = open(path, "a")
+        self.__start = time.time()
+
+    def record(self, **fields):
+        """write one record with elapsed time from construction and peak RSS.
+        """
+        rss_self, rss_children = peak_rss()
+        fields["elapsed"] = time.time() - self.__start
+        fields["peak_rss_kb"] = rss_self
+        fields["peak_rss_children_kb"] = rss_children
+        self.__file.write(json.dumps(fields, sort_keys=True) + "\n")
+        self.__file.flush()
+
+    def close(self):
+        self.__file.close()
@@ -6,34 +6,142 @@ import sys
 import numpy as np
 import pytest
 
+import instrumentation
 import utils as utils
+from compact import compact
+from distributed import AUTHKEY_ENV, Coordinator, generate_authkey, make_shards, parse_address
+from executors import BACKENDS
+from feature_store import build_feature_store
+from hashing import parse_JSON_hashed
+from optimizers import get_optimizer
 from SVM import FeatureFucntion
 from utils import DIVIDER, parse_JSON
 
 
 def main(args):
-    # parse json files
-    print("parsing JSON files ...")
-    function_keys, programs, candidates, label_seq_dict = parse_JSON(args.json_files)
+    if args.stats_json:
+        instrumentation.enable()
+    if args.pickles_dir:
+        print("extending SVM ...")
+        svm = FeatureFucntion.load_pickles(args.pickles_dir)
+        programs = svm.extend(args.json_files)
+        if args.base_json:
+            # train on old programs too, without parsing them again
+            programs = utils.program_gen(utils.list_json_files(args.base_json) + programs.program_paths)
+        if args.dedup:
+            programs = utils.dedup_programs(programs.program_paths)
+            print(f"{programs.total} programs, {len(programs)} unique")
+    else:
+        # parse json files
+        print("parsing JSON files ...")
+        if args.hash_width:
+            function_keys, programs, candidates, label_seq_dict = parse_JSON_hashed(
+                args.json_files,
+                args.hash_width,
+                num_buckets=args.hash_buckets,
+                bucket_size=args.bucket_size,
+                dedup=args.dedup,
+            )
+        elif args.feature_store:
+            function_keys, programs, candidates, label_seq_dict = build_feature_store(
+                args.json_files, args.feature_store, dedup=args.dedup
+            )
+        else:
+            function_keys, programs, candidates, label_seq_dict = parse_JSON(args.json_files, dedup=args.dedup)
+        if args.dedup:
+            print(f"{programs.total} programs, {len(programs)} unique")
+        if args.compact:
+            candidates, label_seq_dict = compact(candidates, label_seq_dict)
 
-    print("building SVM ...")
-    svm = FeatureFucntion(function_keys, candidates, label_seq_dict)
+        print("building SVM ...")
+        svm = FeatureFucntion(function_keys, candidates, label_seq_dict)
+
+    step_seq = utils.sqrt_sequence(0.1)
+    optimizer = get_optimizer(args.optimizer, step_seq, averaging=args.averaging)
 
     print("start lerning!")
-    svm.subgrad(
-        programs,
-        utils.sqrt_sequence(0.1),
-        utils.naive_loss,
-        iterations=100,
-        save_dir=args.output_dir,
-    )
+    if args.batch_size:
+        svm.subgrad_minibatch(
+            programs,
+            step_seq,
+            utils.naive_loss,
+            batch_size=args.batch_size,
+            epochs=args.epochs,
+            save_dir=args.output_dir,
+            warm_start=bool(args.pickles_dir),
+            optimizer=optimizer,
+            processes=args.processes,
+            backend=args.backend,
+        )
+    else:
+        coordinator = None
+        if args.coordinator:
+            authkey = args.authkey
+            if not authkey:
+                authkey = generate_authkey()
+                print(f"authkey of workers: {authkey}")
+            coordinator = Coordinator(
+                svm, make_shards(programs, args.shards), authkey, address=parse_address(args.coordinator)
+            )
+            print(f"waiting for {args.workers} workers on {coordinator.address} ...")
+            coordinator.wait_for_workers(args.workers)
+        svm.subgrad(
+            programs,
+            step_seq,
+            utils.naive_loss,
+            iterations=100,
+            save_dir=args.output_dir,
+            warm_start=bool(args.pickles_dir),
+            optimizer=optimizer,
+            checkpoint_dir=args.checkpoint_dir,
+            checkpoint_interval=args.checkpoint_interval,
+            resume=args.resume,
+            processes=args.processes,
+            backend=args.backend,
+            telemetry_path=args.telemetry,
+            coordinator=coordinator,
+        )
+        if coordinator is not None:
+            coordinator.close()
+    if args.mapped:
+        svm.save_mapped(args.output_dir)
+    if args.stats_json:
+        instrumentation.dump_json(args.stats_json, argv=sys.argv)
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="train to get weight")
     parser.add_argument("-j", "--json", required=True, dest="json_files")
     parser.add_argument("-o", "--output", required=True, dest="output_dir")
-    # parser.add_argument("-p", "--pickles", required=False, dest="pickles_dir")
+    parser.add_argument("--dedup", action="store_true", help="train on unique programs weighted by multiplicity")
+    parser.add_argument("--hash-width", type=int, default=None, dest="hash_width", help="hash features into weight of this width")
+    parser.add_argument("--hash-buckets", type=int, default=2 ** 18, dest="hash_buckets")
+    parser.add_argument("--bucket-size", type=int, default=32, dest="bucket_size")
+    parser.add_argument("--feature-store", default=None, dest="feature_store", help="keep features in this sqlite file")
+    parser.add_argument("--compact", action="store_true", help="keep label_seq_dict and candidates in flat arrays")
+    parser.add_argument("-p", "--pickles", required=False, dest="pickles_dir", help="extend this model with json files")
+    parser.add_argument("--base-json", default=None, dest="base_json", help="json files the model was built from, trained together with -p")
+    parser.add_argument("--batch-size", type=int, default=None, dest="batch_size", help="train with mini-batches of this size")
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--averaging", action="store_true", help="use Polyak average of iterates")
+    parser.add_argument("--optimizer", choices=["step", "momentum", "adagrad"], default="step")
+    parser.add_argument("--mapped", action="store_true", help="also save model for fast loading by predict.py")
+    parser.add_argument("--checkpoint-dir", default=None, dest="checkpoint_dir")
+    parser.add_argument("--checkpoint-interval", type=int, default=1, dest="checkpoint_interval")
+    parser.add_argument("--backend", choices=BACKENDS, default="process", help="executor of local workers")
+    parser.add_argument("--processes", type=int, default=None, help="the number of local workers. default: os.cpu_count()")
+    parser.add_argument("--coordinator", default=None, help="host:port to serve workers of distributed.py on")
+    parser.add_argument("--authkey", default=os.environ.get(AUTHKEY_ENV), help=f"secret shared with workers. default: ${AUTHKEY_ENV}, or random one which is printed")
+    parser.add_argument("--workers", type=int, default=1, help="the number of workers to wait for before training")
+    parser.add_argument("--shards", type=int, default=64, help="the number of shards of corpus for workers")
+    parser.add_argument("--telemetry", default=None, help="append per-iteration JSON lines of subgrad into this file")
+    parser.add_argument("--stats-json", default=None, dest="stats_json", help="write instrumentation counters and timers into this file")
+    parser.add_argument("--resume", action="store_true", help="continue from checkpoint in --checkpoint-dir")
     args = parser.parse_args()
+    if args.compact and (args.hash_width or args.feature_store):
+        parser.error("--compact can not be used with --hash-width or --feature-store")
+    if args.pickles_dir and (args.hash_width or args.feature_store or args.compact):
+        # extend keeps features of the model as they are
+        parser.error("-p can not be used with --hash-width, --feature-store or --compact")
 
     main(args)
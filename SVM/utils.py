@@ -1,4 +1,5 @@
 import bisect
+import hashlib
 import json
 import math
 import os
@@ -39,26 +40,35 @@ class Triplet:
     def __hash__(self):
         return hash(self.x) ^ hash(self.y) ^ hash(self.seq) ^ hash(self.seq[::-1])
 
+    def canonical(self):
+        """string which is same for equal triplets, stable across processes.
+        """
+        forward = f"{self.x}{DIVIDER}{self.seq}{DIVIDER}{self.y}"
+        backward = f"{self.y}{DIVIDER}{self.seq[::-1]}{DIVIDER}{self.x}"
+        return min(forward, backward)
+
     def __eq__(self, other):
         b1 = (self.x == other.x and self.y == other.y and self.seq == other.seq)
         b2 = (self.x == other.y and self.y == other.x and self.seq == other.seq[::-1])
         return b1 or b2
 
 
-def parse_JSON(input_path):
-    function_keys = defaultdict(int)
-    program_paths = []
-    candidates = {}
-    label_seq_dict = {}
+def list_json_files(input_path):
+    """list JSON file paths.
 
+    Args:
+        input_path (str or list) : directory, JSON file or list of JSON files.
+
+    Returns:
+        list of str : paths of JSON files.
+    """
     if isinstance(input_path, list):
         # when input path is list of json path.
-        json_files = input_path
-        input_path = ""
+        return input_path
     elif os.path.isdir(input_path):
         # when path is directory path
-        json_files = [
-            x
+        return [
+            os.path.join(input_path, x)
             for x in os.listdir(input_path)
             if not x.startswith(".") and x[-5:] == ".json"
         ]
@@ -66,17 +76,35 @@ def parse_JSON(input_path):
         # when path is file path
         if input_path[-5:] != ".json":
             raise Exception("input file is not json!")
-        json_files = [input_path]
-        input_path = ""
+        return [input_path]
+    raise Exception("input path does not exist!")
+
+
+def parse_JSON(input_path, dedup=False):
+    """parse JSON files into features and programs.
+
+    Args:
+        input_path (str or list) : directory, JSON file or list of JSON files.
+        dedup (bool) : if True, structurally identical programs are kept only
+            once and returned programs carry the multiplicity as weights.
+
+    Returns:
+        function_keys, programs, candidates, label_seq_dict
+    """
+    function_keys = defaultdict(int)
+    collector = ProgramCollector(dedup)
+    candidates = {}
+    label_seq_dict = {}
+
+    json_files = list_json_files(input_path)
 
     # temporaly map for obj type
     tmp_map = {}
-    for filename in tqdm(json_files):
-        file_path = os.path.join(input_path, filename)
+    for file_path in tqdm(json_files):
         with open(file_path, "r") as f:
             jsonData = json.load(f)
         program = jsonData
-        program_paths.append(file_path)
+        collector.add(file_path, program)
 
         for key2 in program:
             if key2 == "y_names":
@@ -104,37 +132,159 @@ def parse_JSON(input_path):
         function_keys[key] = i
 
         # update label_seq_dict
-        obj = tmp_map[key]
-        x = obj["xName"]
-        y = obj["yName"]
-        seq = obj["sequence"]
-        if obj["type"] == "var-var":  # when edge is var-var
-            x_seq = x + DIVIDER + seq
-            y_seq = y + DIVIDER + seq
-            t_list = [(x_seq, y), (y_seq, x)]
-        else:  # when edge is var-lit
-            y_seq = y + DIVIDER + seq
-            t_list = [(y_seq, x)]
+        add_label_seq(label_seq_dict, tmp_map[key], i)
 
-        for value in t_list:
-            if value[0] in label_seq_dict:
-                label_seq_dict[value[0]].append((i, value[1]))
-            else:
-                label_seq_dict[value[0]] = [(i, value[1])]
+    return function_keys, collector.programs(), candidates, label_seq_dict
 
-    programs = program_gen(program_paths)
 
-    return function_keys, programs, candidates, label_seq_dict
+def add_label_seq(label_seq_dict, obj, index):
+    """add feature of edge obj to label_seq_dict.
+    """
+    x = obj["xName"]
+    y = obj["yName"]
+    seq = obj["sequence"]
+    if obj["type"] == "var-var":  # when edge is var-var
+        x_seq = x + DIVIDER + seq
+        y_seq = y + DIVIDER + seq
+        t_list = [(x_seq, y), (y_seq, x)]
+    else:  # when edge is var-lit
+        y_seq = y + DIVIDER + seq
+        t_list = [(y_seq, x)]
+
+    for value in t_list:
+        if value[0] in label_seq_dict:
+            label_seq_dict[value[0]].append((index, value[1]))
+        else:
+            label_seq_dict[value[0]] = [(index, value[1])]
+
+
+def extend_JSON(function_keys, candidates, label_seq_dict, input_path):
+    """parse only new JSON files and extend features built by parse_JSON.
+
+    Features already known keep their IDs, and new features get fresh IDs
+    after them in order of first appearance. function_keys, candidates and
+    label_seq_dict are updated in place.
+
+    Args:
+        function_keys, candidates, label_seq_dict : output of parse_JSON.
+        input_path (str or list) : directory, JSON file or list of new JSON files.
+
+    Returns:
+        programs (program_gen) : new programs.
+        num_new (int) : the number of new features.
+    """
+    program_paths = []
+    new_keys = {}
+    # temporaly map for obj type
+    tmp_map = {}
+    for file_path in tqdm(list_json_files(input_path)):
+        with open(file_path, "r") as f:
+            program = json.load(f)
+        program_paths.append(file_path)
+
+        for key2 in program:
+            if key2 == "y_names":
+                for val in program[key2]:
+                    varname = get_varname(val)
+                    if not(varname in candidates):
+                        candidates[varname] = 0
+                continue
+
+            obj = program[key2]
+            key_name = Triplet(obj["xName"], obj["sequence"], obj["yName"])
+            if key_name in function_keys:
+                continue
+            new_keys[key_name] = None
+            tmp_map[key_name] = obj
+
+    offset = len(function_keys)
+    for i, key in enumerate(new_keys, offset):
+        function_keys[key] = i
+        add_label_seq(label_seq_dict, tmp_map[key], i)
+
+    return program_gen(program_paths), len(new_keys)
+
+
+def dedup_programs(program_paths):
+    """keep structurally identical programs only once, as parse_JSON with dedup.
+
+    Args:
+        program_paths (list) : paths of JSON files.
+
+    Returns:
+        program_gen : unique programs with multiplicity as weights.
+    """
+    collector = ProgramCollector(dedup=True)
+    for file_path in program_paths:
+        with open(file_path, "r") as f:
+            collector.add(file_path, json.load(f))
+    return collector.programs()
+
+
+class ProgramCollector:
+    """Paths of programs read one by one, for program_gen.
+
+    If dedup, structurally identical programs (same program_hash) are
+    kept only once, with the multiplicity as weight.
+
+    Attributes:
+        program_paths : list :
+            paths of kept programs.
+
+        weights : list :
+            multiplicity of each kept program, used when dedup.
+    """
+
+    def __init__(self, dedup=False):
+        self.dedup = dedup
+        self.program_paths = []
+        self.weights = []
+        # program hash -> index in program_paths
+        self.__index = {}
+
+    def add(self, file_path, program):
+        if self.dedup:
+            digest = program_hash(program)
+            if digest in self.__index:
+                # identical program is trained once with multiplicity
+                self.weights[self.__index[digest]] += 1
+                return
+            self.__index[digest] = len(self.program_paths)
+        self.program_paths.append(file_path)
+        self.weights.append(1)
+
+    def programs(self):
+        if self.dedup:
+            return program_gen(self.program_paths, weights=self.weights)
+        return program_gen(self.program_paths)
 
 
 class program_gen:
-    def __init__(self, program_paths):
+    """Lazy loader of programs.
+
+    Attributes:
+        program_paths : list :
+            paths of JSON files.
+
+        weights : list or None :
+            multiplicity of each program when corpus is deduplicated.
+    """
+
+    def __init__(self, program_paths, weights=None):
         self.program_paths = program_paths
         self.len = len(program_paths)
+        self.weights = weights
 
     def __len__(self):
         return len(self.program_paths)
 
+    @property
+    def total(self):
+        """the number of programs including duplicates."""
+        if self.weights is None:
+            return len(self.program_paths)
+        return sum(self.weights)
+
     def __iter__(self):
         for path in self.program_paths:
             with open(path, "r") as f:
@@ -142,6 +292,37 @@ class program_gen:
             yield jsonData
 
 
+def program_hash(program):
+    """compute canonical hash of program graph.
+
+    Args:
+        program (dict) : program parsed from JSON.
+
+    Returns:
+        str : hex digest of program graph.
+
+    Note:
+        Edge keys ("0", "1", ...) and the order of edges are ignored, so
+        programs which differ only in edge numbering get same hash.
+        The order of y_names is kept since infered labels are aligned with it.
+    """
+    edges = []
+    for key, obj in program.items():
+        if key == "y_names":
+            continue
+        edges.append((
+            obj["type"],
+            obj["xName"],
+            str(obj["xScopeId"]),
+            obj["yName"],
+            str(obj.get("yScopeId", "")),
+            obj["sequence"],
+        ))
+    edges.sort()
+    canonical = json.dumps([program["y_names"], edges], ensure_ascii=False)
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+
 def remove_number(y):
     tmp = []
     for st in y:
@@ -240,10 +421,7 @@ def relabel_edges(edges, old_name, old_scope_id, new_name):
 def projection(weight, under, upper):
     """projection weight into correct domain
     """
-    for i, x in enumerate(weight):
-        tmp = max(under, min(upper, x))
-        weight[i] = tmp
-    return weight
+    return np.clip(weight, under, upper, out=weight)
 
 
 def compute_object_size(o, handlers={}):
@@ -295,9 +473,9 @@ def compute_object_size(o, handlers={}):
     return sizeof(o)
 
 
-def show_objects_size(threshold, unit=2):
+def show_objects_size(threshold, unit=2, namespace=None):
     """
-    show size of variable in globals()
+    show size of variables in namespace
 
     Args:
         threshold : int, float
@@ -306,9 +484,13 @@ def show_objects_size(threshold, unit=2):
 
         unit : int
             unit for display.
+            0: bytes
             1: KB
             2: MB
             3: GB
+
+        namespace : dict
+            variables to show. if None, globals() of the caller.
     Returns:
         None
 
@@ -317,11 +499,13 @@ def show_objects_size(threshold, unit=2):
         >> show_objects_size(0.1, unit=3)
     """
 
-    disp_unit = {0: 'bites', 1: 'KB', 2: 'MB', 3: 'GB'}
+    disp_unit = {0: 'bytes', 1: 'KB', 2: 'MB', 3: 'GB'}
+    if namespace is None:
+        namespace = sys._getframe(1).f_globals
     # 処理中に変数が変動しないように固定
-    globals_copy = globals().copy()
-    for object_name in globals_copy.keys():
-        size = compute_object_size(eval(object_name))
+    namespace_copy = dict(namespace)
+    for object_name, obj in namespace_copy.items():
+        size = compute_object_size(obj) / 1024 ** unit
         if size > threshold:
             print('{:<15}{:.3f} {}'.format(object_name, size, disp_unit[unit]))
 
@@ -365,6 +549,19 @@ def sqrt_sequence(c):
         t += 1.0
 
 
+def get_stepsize_sequence(seq_type, value):
+    seq_type_list = ["simple", "sqrt"]
+    if seq_type not in seq_type_list:
+        raise ValueError("seq_type is wrong. seq_type should belong to {}".format(seq_type_list))
+
+    if seq_type == "simple":
+        return simple_sequence(value)
+    elif seq_type == "sqrt":
+        return sqrt_sequence(value)
+    else:
+        raise Exception("Something went wrong")
+
+
 ####################################################################
 ###############  generator for initial token       #################
 ####################################################################
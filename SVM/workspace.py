@@ -0,0 +1,119 @@
+import utils as utils
+from utils import DIVIDER, Triplet
+
+# sentinel for weight of edge whose endpoint was relabelled
+_STALE = object()
+
+
+class Workspace:
+    """per-call state of inference on a read-only program.
+
+    Edge endpoints are resolved to variable indices once, and current
+    labels are kept here instead of relabelling the program, so the same
+    program can be used from several threads at once.
+
+    Attributes:
+        y : list :
+            current labels like "1区name", aligned with x["y_names"].
+
+        names : list :
+            current variable names (without scope id) of y.
+
+        scope_ids : list :
+            scope id (int) of each variable.
+
+        edges : list :
+            (x index, y index or None, literal or None, sequence) for each
+            edge of program, in order of program.
+
+        incident : list :
+            for each variable, indices of its edges in order of program.
+            same edges as FeatureFucntion._build_edges finds by name.
+
+        weights : list :
+            weight of each edge with current labels (None if it is not a
+            feature), or _STALE if not looked up since an endpoint changed.
+            Weight of model must not change while workspace is used.
+    """
+
+    def __init__(self, x, y):
+        """
+        Args:
+            x (dict) : program. not modified.
+            y (list) : initial labels aligned with x["y_names"].
+        """
+        y_names = x["y_names"]
+        index_of = {v: k for k, v in enumerate(y_names)}
+        self.y = list(y)
+        self.names = [utils.get_varname(v) for v in self.y]
+        self.scope_ids = [int(utils.get_scopeid(v)) for v in y_names]
+        self.edges = []
+        self.incident = [[] for _ in y_names]
+        self.weights = []
+        # for each edge, endpoint labels -> weight, to restore weight
+        # when tried candidate is undone
+        self.__memo = []
+
+        for key, obj in x.items():
+            if key == "y_names":
+                continue
+            xi = index_of[str(obj["xScopeId"]) + DIVIDER + obj["xName"]]
+            if obj["type"] == "var-var":
+                yi = index_of[str(obj["yScopeId"]) + DIVIDER + obj["yName"]]
+                edge = (xi, yi, None, obj["sequence"])
+            else:
+                yi = None
+                edge = (xi, None, obj["yName"], obj["sequence"])
+            self.incident[xi].append(len(self.edges))
+            if yi is not None and yi != xi:
+                self.incident[yi].append(len(self.edges))
+            self.edges.append(edge)
+            self.weights.append(_STALE)
+            self.__memo.append({})
+
+    def set_name(self, i, name):
+        """label variable i with name in its scope.
+        """
+        if self.names[i] != name:
+            for e in self.incident[i]:
+                self.weights[e] = _STALE
+        self.names[i] = name
+        self.y[i] = str(self.scope_ids[i]) + DIVIDER + name
+
+    def key(self, e):
+        """feature of edge e with current labels.
+        """
+        xi, yi, literal, seq = self.edges[e]
+        return Triplet(self.names[xi], seq, literal if yi is None else self.names[yi])
+
+    def edge_weight(self, e, eval):
+        """weight of edge e with current labels, looked up with eval only once.
+
+        Args:
+            eval : FeatureFucntion.eval.
+        """
+        val = self.weights[e]
+        if val is _STALE:
+            xi, yi, literal, seq = self.edges[e]
+            labels = (self.names[xi], literal if yi is None else self.names[yi])
+            memo = self.__memo[e]
+            if labels in memo:
+                val = memo[labels]
+            else:
+                val = eval(Triplet(labels[0], seq, labels[1]))
+                memo[labels] = val
+            self.weights[e] = val
+        return val
+
+    def connected(self, i):
+        """contexts "name区seq" of variable i seen from its neighbors.
+        """
+        res = []
+        for e in self.incident[i]:
+            xi, yi, literal, seq = self.edges[e]
+            if xi == i:
+                other = literal if yi is None else self.names[yi]
+            else:
+                other = self.names[xi]
+            res.append(other + DIVIDER + seq)
+        return res
@@ -0,0 +1,56 @@
+import os
+import sys
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), "SVM"))
+
+import pickle
+
+import numpy as np
+import pytest
+
+from compact import CompactCandidates, CompactLabelSeqDict, LabelTable, compact
+from utils import DIVIDER
+
+
+@pytest.fixture(scope="function")
+def label_seq_dict():
+    yield {
+        "t" + DIVIDER + "$": [(0, "parts"), (1, "regex"), (2, "url")],
+        "i" + DIVIDER + "((": [(3, "parts"), (4, "j")],
+    }
+
+
+def test_same_entries(label_seq_dict):
+    index = CompactLabelSeqDict.from_dict(label_seq_dict)
+    assert len(index) == 2
+    for context, value in label_seq_dict.items():
+        assert context in index
+        assert list(index[context]) == value
+        assert index[context][:2] == value[:2]
+    assert "x" + DIVIDER + "$" not in index
+
+
+def test_sort_by_weight_is_stable(label_seq_dict):
+    index = CompactLabelSeqDict.from_dict(label_seq_dict)
+    weight = np.array([0.1, 0.5, 0.1, 0.2, 0.9])
+    index.sort_by_weight(weight)
+    for value in label_seq_dict.values():
+        value.sort(key=lambda x: weight[x[0]], reverse=True)
+    for context, value in label_seq_dict.items():
+        assert list(index[context]) == value
+
+
+def test_pickle(label_seq_dict):
+    candidates, index = compact({"parts": 0, "k": 0}, label_seq_dict)
+    candidates, index = pickle.loads(pickle.dumps((candidates, index)))
+    assert index["i" + DIVIDER + "(("][0] == (3, "parts")
+    assert "k" in candidates
+    assert "url" not in candidates
+
+
+def test_candidates_share_table():
+    table = LabelTable(["a"])
+    candidates = CompactCandidates.from_names(["b", "a", "b"], table)
+    assert len(candidates) == 2
+    assert sorted(candidates) == ["a", "b"]
+    assert table.labels == ["a", "b"]
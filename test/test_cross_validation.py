@@ -0,0 +1,48 @@
+import os
+import sys
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), "SVM"))
+
+import multiprocessing
+
+import pytest
+
+import utils as utils
+from cross_validation import Corpus, make_folds, run_jobs
+from synthetic import generate_corpus
+
+
+@pytest.fixture(scope="module")
+def corpus(tmp_path_factory):
+    corpus_dir = str(tmp_path_factory.mktemp("corpus"))
+    generate_corpus(corpus_dir, 10, seed=0, num_vars=6)
+    yield Corpus(corpus_dir)
+
+
+def test_folds_are_disjoint_and_cover_corpus(corpus):
+    folds = make_folds(corpus, n_splits=3)
+    assert len(folds) == 3
+    tests = []
+    for train, test in folds:
+        assert not set(train) & set(test)
+        assert sorted(train + test) == list(range(len(corpus)))
+        tests += test
+    assert sorted(tests) == list(range(len(corpus)))
+
+
+def test_build_vocabulary_same_as_parse_JSON(corpus):
+    for train, _ in make_folds(corpus, n_splits=3):
+        function_keys, _, candidates, label_seq_dict = utils.parse_JSON([corpus.paths[i] for i in train])
+        expected = (dict(function_keys), candidates, label_seq_dict)
+        assert corpus.build_vocabulary(train) == expected
+
+
+def test_run_jobs_with_spawn(corpus):
+    train, test = make_folds(corpus, n_splits=5)[0]
+    jobs = [
+        {"config": {"step": step}, "fold": 0, "train": train, "test": test, "iterations": 1, "processes": 1}
+        for step in [0.1, 0.2]
+    ]
+    rows = run_jobs(corpus, jobs, max_workers=2, mp_context=multiprocessing.get_context("spawn"))
+    assert sorted(row["config"] for row in rows) == ['{"step": 0.1}', '{"step": 0.2}']
+    assert all(row["total"] == sum(len(corpus.names[i]) for i in test) for row in rows)
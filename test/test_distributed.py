@@ -0,0 +1,110 @@
+import os
+import sys
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), "SVM"))
+
+from multiprocessing import Process
+from multiprocessing.connection import Client
+
+import numpy as np
+import pytest
+
+import utils as utils
+from distributed import Coordinator, make_shards, reduce_results, run_worker
+from SVM import FeatureFucntion
+from synthetic import generate_corpus
+
+AUTHKEY = b"test-secret"
+
+
+@pytest.fixture(scope="module")
+def svm_and_programs(tmp_path_factory):
+    corpus_dir = str(tmp_path_factory.mktemp("corpus"))
+    generate_corpus(corpus_dir, 12, seed=0, num_vars=6)
+    function_keys, programs, candidates, label_seq_dict = utils.parse_JSON(corpus_dir)
+    svm = FeatureFucntion(function_keys, candidates, label_seq_dict)
+    yield svm, programs
+
+
+def start_workers(address, n, target=run_worker):
+    workers = [Process(target=target, args=(address, AUTHKEY), daemon=True) for _ in range(n)]
+    for worker in workers:
+        worker.start()
+    return workers
+
+
+def dying_worker(address, authkey):
+    # worker which is lost at its first task
+    conn = Client(address, authkey=authkey)
+    while conn.recv()[0] != "task":
+        pass
+    conn.close()
+
+
+def local_result(svm, programs, only_loss=False):
+    res = [svm.weighted_subgrad_mmsc((program, 1), utils.naive_loss, only_loss=only_loss) for program in programs]
+    return reduce_results(res, only_loss)
+
+
+def test_make_shards_keeps_every_program():
+    shards = make_shards([{"y_names": [str(i)]} for i in range(10)], 3)
+    assert len(shards) == 3
+    assert sorted(p["y_names"][0] for shard in shards for p, _ in shard) == [str(i) for i in range(10)]
+
+
+def test_make_shards_holds_paths(svm_and_programs):
+    _, programs = svm_and_programs
+    shards = make_shards(programs, 5)
+    assert sorted(path for shard in shards for path, _ in shard) == sorted(programs.program_paths)
+
+
+def test_authkey_is_required(monkeypatch, svm_and_programs):
+    svm, programs = svm_and_programs
+    monkeypatch.delenv("SVM_AUTHKEY", raising=False)
+    with pytest.raises(ValueError):
+        Coordinator(svm, make_shards(programs, 2), None)
+    with pytest.raises(ValueError):
+        run_worker(("localhost", 1), "")
+
+
+def test_empty_corpus_is_rejected(svm_and_programs):
+    svm, _ = svm_and_programs
+    assert make_shards([], 3) == []
+    for shards in [[], [[]]]:
+        with pytest.raises(ValueError):
+            Coordinator(svm, shards, AUTHKEY)
+
+
+def test_same_as_local(svm_and_programs):
+    svm, programs = svm_and_programs
+    coordinator = Coordinator(svm, make_shards(programs, 5), AUTHKEY)
+    workers = start_workers(coordinator.address, 2)
+    assert coordinator.wait_for_workers(2, timeout=30)
+    try:
+        grad, sum_loss, wrong, total = coordinator.compute(svm.weight, utils.naive_loss)
+        expected = local_result(svm, programs)
+        assert np.allclose(grad, expected[0])
+        assert total == expected[3]
+        assert coordinator.compute(svm.weight, utils.naive_loss, only_loss=True) == pytest.approx(
+            local_result(svm, programs, only_loss=True))
+    finally:
+        coordinator.close()
+        for worker in workers:
+            worker.join(10)
+
+
+def test_lost_worker_is_replaced(svm_and_programs):
+    svm, programs = svm_and_programs
+    coordinator = Coordinator(svm, make_shards(programs, 6), AUTHKEY)
+    workers = start_workers(coordinator.address, 1, target=dying_worker)
+    workers += start_workers(coordinator.address, 1)
+    assert coordinator.wait_for_workers(2, timeout=30)
+    try:
+        res = coordinator.compute(svm.weight, utils.naive_loss)
+        assert res[3] == local_result(svm, programs)[3]
+        assert coordinator.lost == 1
+        assert len(coordinator.workers) == 1
+    finally:
+        coordinator.close()
+        for worker in workers:
+            worker.join(10)
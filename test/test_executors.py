@@ -0,0 +1,84 @@
+import os
+import sys
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), "SVM"))
+
+import numpy as np
+import pytest
+
+import instrumentation
+import utils as utils
+from executors import ModelMethod, get_executor
+from inference_cache import infer_with_cache
+from SVM import FeatureFucntion
+from synthetic import generate_corpus
+
+
+@pytest.fixture(scope="module")
+def svm_and_programs(tmp_path_factory):
+    corpus_dir = str(tmp_path_factory.mktemp("corpus"))
+    generate_corpus(corpus_dir, 6, seed=0, num_vars=8)
+    function_keys, programs, candidates, label_seq_dict = utils.parse_JSON(corpus_dir)
+    svm = FeatureFucntion(function_keys, candidates, label_seq_dict)
+    svm.weight = np.random.RandomState(0).rand(len(function_keys))
+    yield svm, list(programs)
+
+
+def test_get_executor_wrong_backend():
+    with pytest.raises(ValueError):
+        get_executor("gpu")
+
+
+@pytest.mark.parametrize("backend", ["thread", "serial"])
+def test_backends_give_same_gradient(svm_and_programs, backend):
+    svm, programs = svm_and_programs
+    items = [(program, 1) for program in programs]
+    func = lambda item: svm.weighted_subgrad_mmsc(item, loss=utils.naive_loss)
+    expected = [func(item) for item in items]
+    with get_executor(backend, 2) as pool:
+        res = pool.map(func, items)
+    for (grad, *rest), (expected_grad, *expected_rest) in zip(res, expected):
+        np.testing.assert_array_equal(grad, expected_grad)
+        assert rest == expected_rest
+
+
+@pytest.mark.parametrize("backend", ["process", "thread", "serial"])
+def test_model_method_gives_same_gradient(svm_and_programs, backend):
+    svm, programs = svm_and_programs
+    items = [(program, 1) for program in programs]
+    func = ModelMethod(svm, "weighted_subgrad_mmsc", loss=utils.naive_loss)
+    expected = [func(item) for item in items]
+    with get_executor(backend, 2, model=svm) as pool:
+        res = pool.map(func, items)
+    for (grad, *rest), (expected_grad, *expected_rest) in zip(res, expected):
+        np.testing.assert_array_equal(grad, expected_grad)
+        assert rest == expected_rest
+
+
+@pytest.mark.parametrize("beam_width", [None, 4])
+def test_infer_with_cache_on_process_pool(svm_and_programs, beam_width):
+    svm, programs = svm_and_programs
+    expected = infer_with_cache(svm, programs, beam_width=beam_width)
+    with get_executor("process", 2, model=svm) as pool:
+        res = infer_with_cache(svm, programs, pool=pool, beam_width=beam_width)
+    assert sorted(res) == sorted(expected)
+
+
+def test_thread_counts_are_merged_once():
+    instrumentation.enable()
+    instrumentation.reset()
+    try:
+        with get_executor("thread", 4) as pool:
+            res = list(instrumentation.absorb(
+                pool.map(instrumentation.collected(_count_one), range(100))
+            ))
+        assert res == list(range(100))
+        assert instrumentation.snapshot()["counters"]["test.calls"] == 100
+    finally:
+        instrumentation.reset()
+        instrumentation.enable(False)
+
+
+def _count_one(i):
+    instrumentation.count("test.calls")
+    return i
@@ -0,0 +1,80 @@
+import os
+import sys
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), "SVM"))
+
+import pickle
+
+import numpy as np
+import pytest
+
+import executors
+import utils as utils
+from feature_store import build_feature_store
+from SVM import FeatureFucntion
+from synthetic import generate_corpus
+
+
+@pytest.fixture(scope="module")
+def corpus_dir(tmp_path_factory):
+    corpus_dir = str(tmp_path_factory.mktemp("corpus"))
+    generate_corpus(corpus_dir, 6, seed=0, num_vars=6)
+    yield corpus_dir
+
+
+@pytest.fixture(scope="function")
+def store(corpus_dir, tmp_path):
+    files = sorted(utils.list_json_files(corpus_dir))
+    yield files, build_feature_store(files, str(tmp_path / "features.sqlite"))
+
+
+def test_feature_ids_same_as_parse_JSON(store):
+    files, (function_keys, programs, candidates, _) = store
+    expected_keys, expected_programs, expected_candidates, _ = utils.parse_JSON(files)
+    assert len(function_keys) == len(expected_keys)
+    for key, index in expected_keys.items():
+        assert key in function_keys
+        assert function_keys[key] == index
+    assert utils.Triplet("no", "such", "feature") not in function_keys
+    assert len(candidates) == len(expected_candidates)
+    assert all(name in candidates for name in expected_candidates)
+    assert programs.program_paths == expected_programs.program_paths
+
+
+def test_label_seq_sorted_by_weight(store):
+    files, (function_keys, _, candidates, label_seq_dict) = store
+    _, _, _, expected = utils.parse_JSON(files)
+    svm = FeatureFucntion(function_keys, candidates, label_seq_dict)
+    weight = np.random.RandomState(0).rand(len(function_keys))
+    svm.weight = weight
+    for context, value in expected.items():
+        entries = label_seq_dict[context]
+        assert sorted(entries) == sorted(value)
+        assert [weight[index] for index, _ in entries] == sorted((weight[index] for index, _ in value), reverse=True)
+
+
+def test_pickle_round_trip(store):
+    files, (function_keys, _, candidates, label_seq_dict) = store
+    svm = FeatureFucntion(function_keys, candidates, label_seq_dict)
+    svm.weight = np.random.RandomState(0).rand(len(function_keys))
+    copied = pickle.loads(pickle.dumps(svm))
+    _, programs, _, _ = utils.parse_JSON(files)
+    for program in programs:
+        assert copied.inference(program) == svm.inference(program)
+    context = next(iter(utils.parse_JSON(files)[3]))
+    assert copied.label_seq_dict[context] == label_seq_dict[context]
+
+
+def test_model_is_not_pickled_with_tasks(store):
+    files, (function_keys, _, candidates, label_seq_dict) = store
+    svm = FeatureFucntion(function_keys, candidates, label_seq_dict)
+    method = executors.ModelMethod(svm, "weighted_star_mmsc", loss=utils.naive_loss)
+    assert len(pickle.dumps(method)) < len(pickle.dumps(svm.weight))
+    _, programs, _, _ = utils.parse_JSON(files)
+    items = [(program, 1) for program in programs]
+    with executors.get_executor("process", 2, model=svm) as pool:
+        res = pool.map(method, items)
+    for (grad, *rest), item in zip(res, items):
+        expected = method(item)
+        np.testing.assert_array_equal(grad, expected[0])
+        assert rest == list(expected[1:])
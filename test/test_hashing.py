@@ -0,0 +1,90 @@
+import os
+import sys
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), "SVM"))
+
+import numpy as np
+import pytest
+
+import utils as utils
+from hashing import HashedFeatureKeys, HashedLabelSeqIndex, parse_JSON_hashed
+from synthetic import generate_corpus
+from utils import DIVIDER, Triplet
+
+
+@pytest.fixture(scope="function")
+def index():
+    index = HashedLabelSeqIndex(num_buckets=1, bucket_size=2)
+    yield index
+
+
+def test_hashed_keys_equal_for_reversed_triplet():
+    keys = HashedFeatureKeys(1 << 20)
+    keys.add(Triplet("a", "((!", "b"))
+    assert keys[Triplet("a", "((!", "b")] == keys[Triplet("b", "!((", "a")]
+
+
+def test_hashed_keys_bounded():
+    keys = HashedFeatureKeys(7)
+    assert len(keys) == 7
+    slots = [keys.add(Triplet(str(i), "$", "x")) for i in range(100)]
+    assert all(0 <= slot < 7 for slot in slots if slot is not None)
+
+
+def test_hashed_keys_reject_colliding_feature():
+    keys = HashedFeatureKeys(1)
+    assert keys.add(Triplet("a", "$", "b")) == 0
+    assert keys.add(Triplet("c", "$", "d")) is None
+    assert Triplet("a", "$", "b") in keys
+    assert Triplet("c", "$", "d") not in keys
+    with pytest.raises(KeyError):
+        keys[Triplet("c", "$", "d")]
+
+
+def test_index_replaces_least_frequent(index):
+    context = "t" + DIVIDER + "$"
+    index.add(context, 0, "parts")
+    index.add(context, 0, "parts")
+    index.add(context, 1, "regex")
+    index.add(context, 2, "url")
+    labels = [label for _, label in index[context]]
+    assert labels == ["parts", "url"]
+
+
+def test_index_keeps_contexts_of_bucket_apart():
+    index = HashedLabelSeqIndex(num_buckets=1, bucket_size=8)
+    index.add("t" + DIVIDER + "$", 0, "parts")
+    index.add("s" + DIVIDER + "$", 1, "regex")
+    assert index["t" + DIVIDER + "$"] == [(0, "parts")]
+    assert index["s" + DIVIDER + "$"] == [(1, "regex")]
+    assert "u" + DIVIDER + "$" not in index
+    assert index["u" + DIVIDER + "$"] == []
+    assert len(index) == 2
+
+
+def test_collisions_with_tiny_width(tmp_path):
+    corpus_dir = str(tmp_path / "corpus")
+    generate_corpus(corpus_dir, 4, seed=0, num_vars=8)
+    function_keys, _, _, label_seq_dict = utils.parse_JSON(corpus_dir)
+    hashed_keys, _, _, hashed_index = parse_JSON_hashed(corpus_dir, 4, num_buckets=2, bucket_size=1000)
+
+    # every candidate of a context is a true (feature, label) pair of the context
+    key_of = {index: key for key, index in function_keys.items()}
+    for context in label_seq_dict:
+        expected = {
+            (hashed_keys[key_of[index]], label)
+            for index, label in label_seq_dict[context]
+            if key_of[index] in hashed_keys
+        }
+        assert set(hashed_index[context]) <= expected
+    assert len(hashed_index) <= len(label_seq_dict)
+    # at most one feature owns each slot
+    assert sum(key in hashed_keys for key in function_keys) <= 4
+
+
+def test_index_sort_by_weight(index):
+    context = "t" + DIVIDER + "$"
+    index.add(context, 0, "parts")
+    index.add(context, 1, "regex")
+    index.sort_by_weight(np.array([0.1, 0.9]))
+    assert index[context][0] == (1, "regex")
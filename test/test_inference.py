@@ -0,0 +1,135 @@
+import os
+import sys
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), "SVM"))
+
+import itertools
+import json
+import random
+
+import numpy as np
+import pytest
+
+import utils as utils
+from SVM import FeatureFucntion
+from synthetic import generate_corpus
+from utils import DIVIDER
+
+LABELS = ["a", "b", "c", "d"]
+
+
+@pytest.fixture(scope="module")
+def svm_and_programs(tmp_path_factory):
+    corpus_dir = str(tmp_path_factory.mktemp("corpus"))
+    generate_corpus(corpus_dir, 6, seed=0, num_vars=8)
+    function_keys, programs, candidates, label_seq_dict = utils.parse_JSON(corpus_dir)
+    svm = FeatureFucntion(function_keys, candidates, label_seq_dict)
+    svm.weight = np.random.RandomState(0).rand(len(function_keys))
+    yield svm, list(programs)
+
+
+def assert_valid_labels(y, x):
+    # one label for each variable, in its scope, and unique
+    assert len(y) == len(x["y_names"])
+    assert [utils.get_scopeid(label) for label in y] == [utils.get_scopeid(name) for name in x["y_names"]]
+    assert not utils.duplicate_any(y)
+
+
+def test_initial_labels_unique_in_scope(svm_and_programs):
+    svm, programs = svm_and_programs
+    for program in programs:
+        y = svm.initial_labels(program)
+        assert_valid_labels(y, program)
+        # labels come from contexts, not only placeholders
+        assert any(utils.get_varname(label) in svm.candidates for label in y)
+
+
+def test_initial_labels_keep_seed(svm_and_programs):
+    svm, programs = svm_and_programs
+    for program in programs:
+        seed = list(program["y_names"][:2]) + [None] * (len(program["y_names"]) - 2)
+        y = svm.initial_labels(program, seed=seed)
+        assert_valid_labels(y, program)
+        assert y[:2] == seed[:2]
+
+
+def test_inference_from_context_labels(svm_and_programs):
+    svm, programs = svm_and_programs
+    for program in programs:
+        y = svm.inference(program, init_y="context")
+        assert_valid_labels(y, program)
+    with pytest.raises(ValueError):
+        svm.inference(programs[0], init_y="random")
+
+
+def small_program(rng, num_vars):
+    """program whose variables all have a literal context, so that
+    candidates of every variable are all of LABELS."""
+    names = []
+    for _ in range(num_vars):
+        scope_id = rng.choice([1, 2])
+        names.append((scope_id, rng.choice([n for n in LABELS if (scope_id, n) not in names])))
+    program = {"y_names": [str(s) + DIVIDER + n for s, n in names]}
+    for scope_id, name in names:
+        program[str(len(program))] = {
+            "type": "var-lit", "xName": name, "xScopeId": scope_id, "yName": "L", "sequence": ".",
+        }
+    for _ in range(2 * num_vars):
+        i, j = rng.sample(range(num_vars), 2)
+        program[str(len(program))] = {
+            "type": "var-var", "xName": names[i][1], "xScopeId": names[i][0],
+            "yName": names[j][1], "yScopeId": names[j][0], "sequence": rng.choice(["$", "(("]),
+        }
+    return program
+
+
+@pytest.fixture(scope="module")
+def small_svm(tmp_path_factory):
+    # every pair of LABELS is a feature, and every label is a candidate of "L区."
+    corpus_dir = tmp_path_factory.mktemp("small")
+    program = {"y_names": ["1" + DIVIDER + n for n in LABELS]}
+    for name in LABELS:
+        program[str(len(program))] = {"type": "var-lit", "xName": name, "xScopeId": 1, "yName": "L", "sequence": "."}
+    for x_name, y_name in itertools.permutations(LABELS, 2):
+        for seq in ["$", "(("]:
+            program[str(len(program))] = {
+                "type": "var-var", "xName": x_name, "xScopeId": 1, "yName": y_name, "yScopeId": 1, "sequence": seq,
+            }
+    with open(str(corpus_dir / "0.json"), "w") as f:
+        json.dump(program, f)
+    function_keys, _, candidates, label_seq_dict = utils.parse_JSON(str(corpus_dir))
+    yield FeatureFucntion(function_keys, candidates, label_seq_dict)
+
+
+def exhaustive_search(svm, x):
+    best = None
+    scope_ids = [utils.get_scopeid(name) for name in x["y_names"]]
+    for names in itertools.product(LABELS, repeat=len(scope_ids)):
+        y = [s + DIVIDER + n for s, n in zip(scope_ids, names)]
+        if utils.duplicate_any(y):
+            continue
+        score_v = svm.score(y, x)
+        if best is None or score_v > best:
+            best = score_v
+    return best
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_wide_beam_matches_exhaustive_search(small_svm, seed):
+    rng = random.Random(seed)
+    small_svm.weight = np.random.RandomState(seed).randn(len(small_svm.function_keys))
+    for num_vars in [2, 3, 4]:
+        x = small_program(rng, num_vars)
+        y = small_svm.beam_inference(x, BEAM_WIDTH=10 ** 4, TOP_CANDIDATES=len(LABELS))
+        assert_valid_labels(y, x)
+        assert small_svm.score(y, x) == pytest.approx(exhaustive_search(small_svm, x))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_beam_not_below_greedy(small_svm, seed):
+    rng = random.Random(seed)
+    small_svm.weight = np.random.RandomState(seed).rand(len(small_svm.function_keys))
+    for num_vars in [2, 3, 4]:
+        x = small_program(rng, num_vars)
+        y = small_svm.beam_inference(x, BEAM_WIDTH=10 ** 4, TOP_CANDIDATES=len(LABELS))
+        assert small_svm.score(y, x) >= small_svm.score(small_svm.inference(x), x) - 1e-9
@@ -0,0 +1,99 @@
+import os
+import sys
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), "SVM"))
+
+from multiprocessing.pool import ThreadPool
+
+import pytest
+
+import utils as utils
+from inference_cache import InferenceCache, cache_key, infer_with_cache
+
+program = {
+    "y_names": ["1区a", "1区b"],
+    "0": {"type": "var-var", "xName": "a", "xScopeId": 1, "yName": "b", "yScopeId": 1, "sequence": "(("},
+    "1": {"type": "var-lit", "xName": "a", "xScopeId": 1, "yName": "length", "sequence": "."},
+}
+
+renumbered = {
+    "y_names": ["1区a", "1区b"],
+    "0": program["1"],
+    "1": program["0"],
+}
+
+
+@pytest.fixture(scope="function")
+def cache(tmp_path):
+    cache = InferenceCache(str(tmp_path), max_entries=2)
+    yield cache
+    cache.close()
+
+
+def test_program_hash_ignores_edge_numbering():
+    assert utils.program_hash(program) == utils.program_hash(renumbered)
+
+
+def test_program_hash_keeps_y_names_order():
+    swapped = dict(program, y_names=["1区b", "1区a"])
+    assert utils.program_hash(program) != utils.program_hash(swapped)
+
+
+def test_cache_hit_and_miss(cache):
+    key = cache_key(utils.program_hash(program), "model", {})
+    assert cache.get(key) is None
+    cache.put(key, ["1区a", "1区b"])
+    assert cache.get(key) == ["1区a", "1区b"]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_cache_evicts_least_recently_used(cache):
+    cache.put("k0", ["0"])
+    cache.put("k1", ["1"])
+    cache.get("k0")
+    cache.put("k2", ["2"])
+    assert len(cache) == 2
+    assert cache.get("k1") is None
+    assert cache.get("k0") == ["0"]
+
+
+class EchoModel:
+    """model which infers y_names, recording how many programs were read.
+    """
+
+    NUM_PATH = 1
+    TOP_CANDIDATES = 1
+
+    def __init__(self):
+        self.read = 0
+        self.read_at_inference = []
+
+    def programs(self, programs):
+        for program in programs:
+            self.read += 1
+            yield program
+
+    def inference(self, x, **kwargs):
+        self.read_at_inference.append(self.read)
+        return list(x["y_names"])
+
+
+def test_infer_with_cache_streams_programs():
+    svm = EchoModel()
+    programs = [dict(program, y_names=["1区" + str(i)]) for i in range(5)]
+    res = infer_with_cache(svm, svm.programs(programs))
+    assert svm.read_at_inference == [1, 2, 3, 4, 5]
+    assert sorted(res) == sorted((p["y_names"], p["y_names"]) for p in programs)
+
+
+def test_infer_with_cache_duplicates_on_thread_pool(tmp_path, monkeypatch):
+    monkeypatch.setattr("inference_cache.model_fingerprint", lambda svm: "model")
+    svm = EchoModel()
+    programs = [dict(program, y_names=["1区" + str(i % 3)]) for i in range(9)]
+    cache = InferenceCache(str(tmp_path))
+    with ThreadPool(2) as pool:
+        res = infer_with_cache(svm, svm.programs(programs), cache=cache, pool=pool)
+    assert sorted(res) == sorted((p["y_names"], p["y_names"]) for p in programs)
+    assert len(svm.read_at_inference) == 3
+    assert (cache.hits, cache.misses, len(cache)) == (6, 3, 3)
+    cache.close()
@@ -0,0 +1,78 @@
+import os
+import sys
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), "SVM"))
+
+from multiprocessing import Pool
+from types import SimpleNamespace
+
+import pytest
+
+import instrumentation
+
+
+def work(n):
+    instrumentation.count("work", n)
+    with instrumentation.timer("work"):
+        pass
+    return n
+
+
+@pytest.fixture(scope="function")
+def enabled():
+    instrumentation.reset()
+    instrumentation.enable()
+    yield
+    instrumentation.enable(False)
+    instrumentation.reset()
+
+
+def test_disabled_records_nothing():
+    instrumentation.reset()
+    work(3)
+    assert instrumentation.snapshot() == {"counters": {}, "timers": {}}
+
+
+def test_aggregated_across_workers(enabled):
+    with Pool(2) as pool:
+        res = list(instrumentation.absorb(pool.imap(instrumentation.collected(work), range(5))))
+    stats = instrumentation.snapshot()
+    assert sorted(res) == list(range(5))
+    assert stats["counters"]["work"] == 10
+    assert stats["timers"]["work"]["calls"] == 5
+
+
+def test_collected_keeps_parent_stats(enabled):
+    instrumentation.count("work", 1)
+    list(instrumentation.absorb(map(instrumentation.collected(work), [2])))
+    assert instrumentation.snapshot()["counters"]["work"] == 3
+
+
+def test_sweep_times_without_instrumentation(monkeypatch):
+    import sweep
+
+    enabled_while_timed = []
+
+    def timed():
+        enabled_while_timed.append(instrumentation.ENABLED)
+        return 0.0
+
+    def infer(program):
+        instrumentation.count("inference.candidates_evaluated", 3)
+        return program["y_names"]
+
+    monkeypatch.setattr(sweep, "time", SimpleNamespace(perf_counter=timed))
+    monkeypatch.setattr(sweep, "inference_function", lambda svm, config: infer)
+    programs = [{"y_names": ["1区a", "1区b"]}] * 4
+    instrumentation.reset()
+    instrumentation.count("caller.calls", 2)
+    instrumentation.count("inference.candidates_evaluated", 5)
+    before = instrumentation.snapshot()
+    row = sweep.evaluate_config(None, programs, {"method": "greedy"})
+    assert enabled_while_timed == [False] * 8
+    assert row["candidates_per_program"] == 3
+    assert row["accuracy"] == 1.0
+    assert not instrumentation.ENABLED
+    # counters of caller are kept
+    assert instrumentation.snapshot() == before
+    instrumentation.reset()
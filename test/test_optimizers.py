@@ -0,0 +1,46 @@
+import os
+import sys
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), "SVM"))
+
+import numpy as np
+import pytest
+
+import utils as utils
+from optimizers import AdaGrad, StepSequence, get_optimizer
+
+
+def test_projection_clips_in_place():
+    weight = np.array([-1.0, 0.25, 2.0])
+    res = utils.projection(weight, 0, 0.5)
+    assert res is weight
+    assert np.all(weight == np.array([0.0, 0.25, 0.5]))
+
+
+def test_step_sequence_advances_only_when_asked():
+    optimizer = StepSequence(utils.simple_sequence(1.0))
+    optimizer.reset(np.zeros(2), 0, 10)
+    weight = optimizer.step(np.zeros(2), np.array([-1.0, -2.0]))
+    assert np.all(weight == np.array([1.0, 2.0]))
+    optimizer.advance()
+    weight = optimizer.step(weight, np.array([-1.0, -2.0]))
+    assert np.all(weight == np.array([1.5, 3.0]))
+
+
+def test_step_sequence_averaging():
+    optimizer = StepSequence(utils.simple_sequence(1.0), averaging=True)
+    optimizer.reset(np.zeros(1), 0, 10)
+    weight = optimizer.step(np.zeros(1), np.array([-2.0]))
+    assert optimizer.result(weight)[0] == pytest.approx(1.0)
+
+
+def test_adagrad_per_feature_step():
+    optimizer = AdaGrad(eta=0.1)
+    optimizer.reset(np.zeros(2), -10, 10)
+    weight = optimizer.step(np.zeros(2), np.array([-1.0, -100.0]))
+    assert weight[0] == pytest.approx(weight[1])
+
+
+def test_get_optimizer_wrong_name():
+    with pytest.raises(ValueError):
+        get_optimizer("newton", utils.simple_sequence(1.0))
@@ -0,0 +1,31 @@
+import os
+import sys
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), "SVM"))
+
+import numpy as np
+
+import utils as utils
+from predict import load_model, predict
+from SVM import FeatureFucntion
+from synthetic import generate_corpus
+
+
+def test_mapped_model_infers_same(tmp_path):
+    corpus_dir = str(tmp_path / "corpus")
+    model_dir = str(tmp_path / "model")
+    generate_corpus(corpus_dir, 4, seed=0, num_vars=8)
+    function_keys, programs, candidates, label_seq_dict = utils.parse_JSON(corpus_dir)
+    svm = FeatureFucntion(function_keys, candidates, label_seq_dict)
+    svm.weight = np.random.RandomState(0).rand(len(function_keys))
+    svm.save_mapped(model_dir)
+
+    assert FeatureFucntion.has_mapped(model_dir)
+    mapped = load_model(model_dir)
+    assert isinstance(mapped.weight, np.memmap)
+    np.testing.assert_array_equal(mapped.weight, svm.weight)
+    assert mapped.label_seq_dict == svm.label_seq_dict
+
+    paths = programs.program_paths
+    for (path, y), program in zip(predict(mapped, paths), programs):
+        assert y == svm.inference(program)
@@ -0,0 +1,87 @@
+import os
+import sys
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), "SVM"))
+
+import pytest
+
+import successive_halving
+import utils as utils
+from cross_validation import Corpus, config_key, make_folds, run_jobs
+from SVM import FeatureFucntion
+from synthetic import generate_corpus
+
+
+@pytest.fixture(scope="module")
+def corpus(tmp_path_factory):
+    corpus_dir = str(tmp_path_factory.mktemp("corpus"))
+    generate_corpus(corpus_dir, 10, seed=0, num_vars=6)
+    yield Corpus(corpus_dir)
+
+
+def fake_run_jobs(calls):
+    # accuracy is step of config, and each iteration draws one learning rate
+    def run(corpus, jobs, max_workers=1):
+        calls.append(jobs)
+        return [{
+            "config": config_key(job["config"]),
+            "fold": job["fold"],
+            "iterations": job["iterations"],
+            "correct": job["config"]["step"] * 100,
+            "total": 100,
+            "weight": "weight of {}".format(job["config"]["step"]),
+            "num_draws": job["num_draws"] + job["iterations"],
+        } for job in jobs]
+    return run
+
+
+def test_promotion_order(corpus, monkeypatch):
+    calls = []
+    monkeypatch.setattr(successive_halving, "run_jobs", fake_run_jobs(calls))
+    configs = [{"step": step} for step in [0.3, 0.9, 0.1, 0.5, 0.7, 0.2, 0.8, 0.4, 0.6]]
+    best, rows = successive_halving.successive_halving(
+        corpus, configs, min_iterations=1, max_iterations=9, min_folds=1, max_folds=3, eta=3, n_splits=3,
+    )
+    assert best == {"step": 0.9}
+    survivors = [sorted({job["config"]["step"] for job in jobs}) for jobs in calls]
+    assert survivors == [sorted(c["step"] for c in configs), [0.7, 0.8, 0.9], [0.9]]
+    # warm-started jobs train only the remaining iterations
+    assert [jobs[0]["iterations"] for jobs in calls] == [1, 3 - 1, 9 - 3]
+    assert sorted({row["rung"] for row in rows}) == [0, 1, 2]
+
+
+def test_warm_start_continues_step_sequence(corpus, monkeypatch):
+    calls = []
+    monkeypatch.setattr(successive_halving, "run_jobs", fake_run_jobs(calls))
+    successive_halving.successive_halving(
+        corpus, [{"step": 0.1}, {"step": 0.2}], min_iterations=2, max_iterations=6,
+        min_folds=1, max_folds=1, eta=2, n_splits=3,
+    )
+    assert [job["num_draws"] for job in calls[0]] == [1, 1]
+    # promoted config continues from weight and learning rate of previous rung
+    assert [job["num_draws"] for job in calls[1]] == [1 + 2]
+    assert calls[1][0]["init_weight"] == "weight of 0.2"
+
+
+def test_run_job_counts_learning_rates(corpus, monkeypatch):
+    rates = []
+
+    # learning rate advances at every iteration, so draws are exact
+    def subgrad(self, programs, step_seq, loss, *, iterations, optimizer, **kwargs):
+        optimizer.reset(self.weight, 0, 1)
+        for _ in range(iterations):
+            rates.append(optimizer.learning_rate)
+            optimizer.advance()
+        return self.weight
+
+    monkeypatch.setattr(FeatureFucntion, "subgrad", subgrad)
+    train, test = make_folds(corpus, n_splits=5)[0]
+    job = {"config": {"step": 1.0, "sequence": "simple"}, "fold": 0, "train": train, "test": test, "iterations": 2, "processes": 1}
+    first = run_jobs(corpus, [job])[0]
+    # one draw at start and one for each iteration
+    assert first["num_draws"] == 1 + 2
+    second = run_jobs(corpus, [dict(job, init_weight=first["weight"], num_draws=first["num_draws"])])[0]
+    assert second["num_draws"] == first["num_draws"] + 2
+    # resumed job continues with learning rates after those used before
+    expected = utils.get_stepsize_sequence("simple", 1.0)
+    assert rates == [next(expected) for _ in range(4)]
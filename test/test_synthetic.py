@@ -0,0 +1,41 @@
+import os
+import sys
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), "SVM"))
+
+import random
+
+import pytest
+
+import utils as utils
+from synthetic import generate_corpus, generate_program, make_vocabulary
+from utils import DIVIDER
+
+
+def test_program_format():
+    program = generate_program(random.Random(0), num_vars=10, num_scopes=2, degree=3)
+    y_names = program["y_names"]
+    assert len(y_names) == 10
+    assert not utils.duplicate_any(y_names)
+    assert len(program) - 1 == 30
+    for key, edge in program.items():
+        if key == "y_names":
+            continue
+        assert str(edge["xScopeId"]) + DIVIDER + edge["xName"] in y_names
+        if edge["type"] == "var-var":
+            assert str(edge["yScopeId"]) + DIVIDER + edge["yName"] in y_names
+        else:
+            assert edge["type"] == "var-lit"
+            assert "yScopeId" not in edge
+
+
+def test_vocabulary_too_small():
+    with pytest.raises(ValueError):
+        generate_program(random.Random(0), num_vars=10, num_scopes=2, vocabulary=make_vocabulary(4))
+
+
+def test_corpus_is_parsed(tmp_path):
+    generate_corpus(str(tmp_path), 3, seed=1, num_vars=6)
+    function_keys, programs, candidates, label_seq_dict = utils.parse_JSON(str(tmp_path))
+    assert len(programs) == 3
+    assert len(function_keys) > 0
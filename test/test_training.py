@@ -0,0 +1,239 @@
+import os
+import sys
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), "SVM"))
+
+import shutil
+
+import numpy as np
+import pytest
+
+import utils as utils
+from feature_store import build_feature_store
+from hashing import parse_JSON_hashed
+from optimizers import get_optimizer
+from SVM import FeatureFucntion
+from synthetic import generate_corpus
+
+
+@pytest.fixture(scope="module")
+def corpus_dir(tmp_path_factory):
+    corpus_dir = str(tmp_path_factory.mktemp("corpus"))
+    generate_corpus(corpus_dir, 8, seed=0, num_vars=6)
+    yield corpus_dir
+
+
+def build(corpus_dir, **kwargs):
+    function_keys, programs, candidates, label_seq_dict = utils.parse_JSON(corpus_dir, **kwargs)
+    return FeatureFucntion(function_keys, candidates, label_seq_dict), programs
+
+
+def test_full_batch_minibatch_is_one_subgrad_iteration(corpus_dir):
+    init = np.random.RandomState(0).rand(len(build(corpus_dir)[0].function_keys))
+    svm, programs = build(corpus_dir)
+    svm.weight = init.copy()
+    expected = svm.subgrad(
+        programs, utils.sqrt_sequence(0.1), utils.naive_loss,
+        iterations=1, verbose=False, warm_start=True, backend="serial",
+    )
+    svm, programs = build(corpus_dir)
+    svm.weight = init.copy()
+    res = svm.subgrad_minibatch(
+        programs, utils.sqrt_sequence(0.1), utils.naive_loss,
+        batch_size=len(programs), epochs=1, seed=0, verbose=False, warm_start=True, backend="serial",
+    )
+    assert not np.allclose(expected, init)
+    np.testing.assert_allclose(res, expected)
+
+
+def test_minibatch_is_deterministic_with_seed(corpus_dir):
+    weights = []
+    for _ in range(2):
+        svm, programs = build(corpus_dir)
+        weights.append(svm.subgrad_minibatch(
+            programs, utils.sqrt_sequence(0.1), utils.naive_loss,
+            batch_size=3, epochs=2, seed=0, verbose=False, backend="serial",
+        ))
+    np.testing.assert_array_equal(weights[0], weights[1])
+
+
+def test_minibatch_workers_see_weight_of_batch(corpus_dir):
+    init = np.random.RandomState(0).rand(len(build(corpus_dir)[0].function_keys))
+    weights = []
+    for backend in ["serial", "process"]:
+        svm, programs = build(corpus_dir)
+        svm.weight = init.copy()
+        weights.append(svm.subgrad_minibatch(
+            programs, utils.sqrt_sequence(1.0), utils.naive_loss,
+            batch_size=2, epochs=1, seed=0, verbose=False, warm_start=True, processes=2, backend=backend,
+        ))
+    np.testing.assert_allclose(weights[0], weights[1])
+
+
+def test_gold_matrix_gives_same_gradient_as_subgrad_mmsc(corpus_dir):
+    svm, programs = build(corpus_dir)
+    svm.weight = np.random.RandomState(0).rand(len(svm.function_keys))
+    programs = list(programs)
+    gold = svm.gold_feature_matrix(programs)
+    for i, program in enumerate(programs):
+        multiplicity = i % 3 + 1
+        phi, loss, label_loss, num_labels = svm.weighted_star_mmsc((program, multiplicity), utils.naive_loss)
+        gold_row = gold[i].toarray().ravel()
+        expected = svm.weighted_subgrad_mmsc((program, multiplicity), utils.naive_loss)
+        np.testing.assert_allclose(phi - multiplicity * gold_row, expected[0])
+        assert loss - multiplicity * (gold_row @ svm.weight) == pytest.approx(expected[1])
+        assert (label_loss, num_labels) == expected[2:]
+        assert svm.weighted_star_mmsc((program, multiplicity), utils.naive_loss, only_loss=True) == pytest.approx(loss)
+
+
+class Interrupted(Exception):
+    pass
+
+
+@pytest.mark.parametrize("optimizer", ["step", "momentum", "adagrad"])
+def test_resume_gives_same_weight(corpus_dir, tmp_path, monkeypatch, optimizer):
+    def train(**kwargs):
+        svm, programs = build(corpus_dir)
+        svm.weight = np.random.RandomState(0).rand(len(svm.function_keys)) * 0.5
+        step_seq = utils.sqrt_sequence(0.1)
+        return svm.subgrad(
+            programs, step_seq, utils.naive_loss, iterations=5, verbose=False, backend="serial", warm_start=True,
+            optimizer=get_optimizer(optimizer, step_seq, averaging=True), **kwargs
+        )
+
+    expected = train()
+
+    checkpoint_dir = str(tmp_path / "checkpoint")
+    save = FeatureFucntion._save_checkpoint
+
+    def save_and_die(checkpoint_dir, checkpoint):
+        save(checkpoint_dir, checkpoint)
+        if checkpoint["iteration"] == 3:
+            raise Interrupted()
+
+    monkeypatch.setattr(FeatureFucntion, "_save_checkpoint", staticmethod(save_and_die))
+    with pytest.raises(Interrupted):
+        train(checkpoint_dir=checkpoint_dir)
+    monkeypatch.undo()
+    assert FeatureFucntion.load_checkpoint(checkpoint_dir)["iteration"] == 3
+
+    res = train(checkpoint_dir=checkpoint_dir, resume=True)
+    np.testing.assert_array_equal(res, expected)
+
+
+def test_resume_keeps_order_of_tied_candidates(tmp_path, monkeypatch):
+    corpus_dir = str(tmp_path / "corpus")
+    generate_corpus(corpus_dir, 8, seed=2, num_vars=6)
+
+    # large step pushes many weights to bounds, where they tie
+    def train(**kwargs):
+        svm, programs = build(corpus_dir)
+        svm.weight = np.random.RandomState(0).rand(len(svm.function_keys)) * 0.5
+        weight = svm.subgrad(
+            programs, utils.sqrt_sequence(5.0), utils.naive_loss, iterations=4, verbose=False,
+            backend="serial", warm_start=True, checkpoint_dir=str(tmp_path / "checkpoint"), **kwargs
+        )
+        return weight, svm.label_seq_dict
+
+    expected, expected_label_seq = train()
+
+    save = FeatureFucntion._save_checkpoint
+
+    def save_and_die(checkpoint_dir, checkpoint):
+        save(checkpoint_dir, checkpoint)
+        if checkpoint["iteration"] == 2:
+            raise Interrupted()
+
+    monkeypatch.setattr(FeatureFucntion, "_save_checkpoint", staticmethod(save_and_die))
+    with pytest.raises(Interrupted):
+        train()
+    monkeypatch.undo()
+
+    weight, label_seq = train(resume=True)
+    np.testing.assert_array_equal(weight, expected)
+    assert label_seq == expected_label_seq
+
+
+def test_extend_same_as_parsing_all(tmp_path):
+    old_files, new_files = [], []
+    for seed, files in [(0, old_files), (1, new_files)]:
+        corpus_dir = str(tmp_path / str(seed))
+        generate_corpus(corpus_dir, 4, seed=seed, num_vars=6)
+        files += sorted(utils.list_json_files(corpus_dir))
+
+    svm, _ = build(old_files)
+    svm.weight = np.random.RandomState(0).rand(len(svm.function_keys))
+    old_keys = dict(svm.function_keys)
+    old_weight = svm.weight.copy()
+    programs = svm.extend(new_files)
+    assert programs.program_paths == new_files
+
+    function_keys, _, candidates, label_seq_dict = utils.parse_JSON(old_files + new_files)
+    # existing IDs and weights are kept, and new features get fresh IDs
+    assert dict(svm.function_keys) == dict(function_keys)
+    assert len(svm.function_keys) > len(old_keys)
+    for key, index in old_keys.items():
+        assert svm.function_keys[key] == index
+    np.testing.assert_array_equal(svm.weight[:len(old_keys)], old_weight)
+    np.testing.assert_array_equal(svm.weight[len(old_keys):], 0.25)
+    assert svm.candidates == candidates
+
+    for context, value in label_seq_dict.items():
+        entries = svm.label_seq_dict[context]
+        assert sorted(entries) == sorted(value)
+        weights = [svm.weight[index] for index, _ in entries]
+        assert weights == sorted(weights, reverse=True)
+
+
+def test_dedup_programs_same_as_parse_JSON(corpus_dir):
+    files = sorted(utils.list_json_files(corpus_dir))
+    files = files + files[:3]
+    _, expected, _, _ = utils.parse_JSON(files, dedup=True)
+    programs = utils.dedup_programs(files)
+    assert programs.program_paths == expected.program_paths
+    assert programs.weights == expected.weights
+
+
+def test_parsers_dedup_same_programs(corpus_dir, tmp_path):
+    files = sorted(utils.list_json_files(corpus_dir))
+    files = files + files[:3] + files[:1]
+    _, expected, _, _ = utils.parse_JSON(files, dedup=True)
+    _, hashed, _, _ = parse_JSON_hashed(files, 1 << 16, dedup=True)
+    _, stored, _, _ = build_feature_store(files, str(tmp_path / "features.sqlite"), dedup=True)
+    assert expected.weights == [3, 2, 2] + [1] * (len(files) - 7)
+    for programs in [hashed, stored, utils.dedup_programs(files)]:
+        assert programs.program_paths == expected.program_paths
+        assert programs.weights == expected.weights
+    _, programs, _, _ = utils.parse_JSON(files)
+    assert (programs.program_paths, programs.weights) == (files, None)
+
+
+def test_dedup_gives_same_gradient_and_loss(corpus_dir, tmp_path):
+    files = sorted(utils.list_json_files(corpus_dir))
+    duplicated = str(tmp_path / "duplicated")
+    os.makedirs(duplicated)
+    for i, path in enumerate(files + files[:3] + files[:1]):
+        shutil.copy(path, os.path.join(duplicated, "{}.json".format(i)))
+
+    init = np.random.RandomState(0).rand(len(build(duplicated)[0].function_keys))
+    res = {}
+    for dedup in [False, True]:
+        svm, programs = build(duplicated, dedup=dedup)
+        svm.weight = init.copy()
+        assert programs.total == len(files) + 4
+        weights = programs.weights or [1] * len(programs)
+        grad, sum_loss, wrong, total = (
+            sum(x) for x in zip(*[
+                svm.weighted_subgrad_mmsc(item, utils.naive_loss) for item in zip(programs, weights)
+            ])
+        )
+        trained = svm.subgrad(
+            programs, utils.sqrt_sequence(0.1), utils.naive_loss,
+            iterations=2, verbose=False, warm_start=True, backend="serial",
+        )
+        res[dedup] = (grad, sum_loss, wrong, total, trained)
+    assert len(build(duplicated, dedup=True)[1]) == len(files)
+    np.testing.assert_allclose(res[True][0], res[False][0])
+    assert res[True][1] == pytest.approx(res[False][1])
+    assert res[True][2:4] == res[False][2:4]
+    np.testing.assert_allclose(res[True][4], res[False][4])
@@ -0,0 +1,93 @@
+import os
+import sys
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), "SVM"))
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+import utils as utils
+from SVM import FeatureFucntion
+from synthetic import generate_corpus
+from utils import DIVIDER
+from workspace import Workspace
+
+
+@pytest.fixture(scope="module")
+def svm_and_programs(tmp_path_factory):
+    corpus_dir = str(tmp_path_factory.mktemp("corpus"))
+    generate_corpus(corpus_dir, 6, seed=0, num_vars=8)
+    function_keys, programs, candidates, label_seq_dict = utils.parse_JSON(corpus_dir)
+    svm = FeatureFucntion(function_keys, candidates, label_seq_dict)
+    svm.weight = np.random.RandomState(0).rand(len(function_keys))
+    yield svm, list(programs)
+
+
+def test_workspace_edges():
+    x = {
+        "y_names": ["1" + DIVIDER + "a", "2" + DIVIDER + "b"],
+        "0": {"type": "var-var", "xName": "a", "xScopeId": 1, "yName": "b", "yScopeId": 2, "sequence": "$"},
+        "1": {"type": "var-lit", "xName": "b", "xScopeId": 2, "yName": "length", "sequence": "."},
+    }
+    ws = Workspace(x, x["y_names"])
+    assert ws.incident == [[0], [0, 1]]
+    assert ws.connected(1) == ["a" + DIVIDER + "$", "length" + DIVIDER + "."]
+    ws.set_name(0, "c")
+    assert ws.y[0] == "1" + DIVIDER + "c"
+    assert ws.key(0) == utils.Triplet("c", "$", "b")
+    assert x["0"]["xName"] == "a"
+
+
+def test_edge_weight_cache():
+    x = {
+        "y_names": ["1" + DIVIDER + "a", "2" + DIVIDER + "b"],
+        "0": {"type": "var-var", "xName": "a", "xScopeId": 1, "yName": "b", "yScopeId": 2, "sequence": "$"},
+        "1": {"type": "var-lit", "xName": "b", "xScopeId": 2, "yName": "length", "sequence": "."},
+    }
+    weights = {
+        utils.Triplet("a", "$", "b"): 1.0,
+        utils.Triplet("c", "$", "b"): 2.0,
+        utils.Triplet("b", ".", "length"): 3.0,
+    }
+    looked_up = []
+
+    def eval(key):
+        looked_up.append(key)
+        return weights.get(key)
+
+    ws = Workspace(x, x["y_names"])
+    assert [ws.edge_weight(e, eval) for e in range(2)] == [1.0, 3.0]
+    assert [ws.edge_weight(e, eval) for e in range(2)] == [1.0, 3.0]
+    assert len(looked_up) == 2
+
+    # only edges of relabelled variable are looked up again
+    ws.set_name(0, "c")
+    assert [ws.edge_weight(e, eval) for e in range(2)] == [2.0, 3.0]
+    assert len(looked_up) == 3
+
+    # undone labels are restored without lookup
+    ws.set_name(0, "a")
+    assert ws.edge_weight(0, eval) == 1.0
+    ws.set_name(1, "d")
+    assert [ws.edge_weight(e, eval) for e in range(2)] == [None, None]
+    assert len(looked_up) == 5
+
+
+def test_inference_does_not_modify_program(svm_and_programs):
+    svm, programs = svm_and_programs
+    for program in programs:
+        before = json.dumps(program, sort_keys=True)
+        svm.inference(program, loss=utils.naive_loss)
+        svm.score(svm.inference(program), program, without_weight=True)
+        assert json.dumps(program, sort_keys=True) == before
+
+
+def test_inference_from_threads(svm_and_programs):
+    svm, programs = svm_and_programs
+    expected = [svm.inference(program) for program in programs]
+    with ThreadPoolExecutor(4) as executor:
+        res = list(executor.map(svm.inference, programs * 4))
+    assert res == expected * 4